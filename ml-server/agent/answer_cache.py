@@ -0,0 +1,221 @@
+"""
+Semantic answer cache for the query resolver
+────────────────────────────────────────────
+Near-identical questions ("what events are in Goa next month") are answered
+from cache instead of re-running guardrails, the agent, MCP tools and mem0.
+
+An entry is reused when:
+  • the cosine similarity of the query embeddings ≥ AGENT_ANSWER_CACHE_THRESHOLD
+  • it is younger than AGENT_ANSWER_CACHE_TTL_SECONDS
+  • the caller's context digest (mem0 memories + short-term history) matches
+    the one the answer was produced with — users whose memory context differs
+    never receive someone else's personalised answer
+
+Each entry also records the tool data it was built from (event ids returned
+by search_events, slugs passed to get_event_hotels), so it can be dropped
+when events are re-embedded or a microsite's hotel proposals change.  With
+several workers those invalidations reach all of them (utils/invalidation.py).
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+import numpy as np
+
+from utils import deadline
+from utils.admission import POOL_EMBEDDING, bulkhead
+from utils.clients import get_embeddings
+from utils.invalidation import invalidations
+from utils.metrics import span
+
+logger = logging.getLogger("agent.answer_cache")
+
+
+@dataclass
+class CachedAnswer:
+    query: str
+    answer: str
+    vector: np.ndarray
+    context_digest: str
+    created_at: float
+    event_ids: frozenset = field(default_factory=frozenset)
+    slugs: frozenset = field(default_factory=frozenset)
+    used_search: bool = False
+
+
+def context_digest(*parts: str) -> str:
+    """Stable digest of the per-user context an answer depends on."""
+    h = hashlib.sha1()
+    for part in parts:
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class SemanticAnswerCache:
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        ttl_seconds: float = 900,
+        max_entries: int = 2000,
+        embedding_model: str = "text-embedding-3-small",
+        enabled: bool = True,
+        name: Optional[str] = None,
+    ):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.embedding_model = embedding_model
+        self.enabled = enabled
+        self._entries: list[CachedAnswer] = []
+        self._matrix: Optional[np.ndarray] = None  # stacked unit vectors, rebuilt lazily
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.name = name  # publishes / receives cross-worker invalidations under this name
+        if name:
+            invalidations.subscribe(name, self._apply)
+
+    @classmethod
+    def from_env(cls) -> "SemanticAnswerCache":
+        return cls(
+            threshold=float(os.getenv("AGENT_ANSWER_CACHE_THRESHOLD", "0.95")),
+            ttl_seconds=float(os.getenv("AGENT_ANSWER_CACHE_TTL_SECONDS", "900")),
+            max_entries=int(os.getenv("AGENT_ANSWER_CACHE_MAX_ENTRIES", "2000")),
+            embedding_model=os.getenv("AGENT_ANSWER_CACHE_EMBEDDING_MODEL", "text-embedding-3-small"),
+            enabled=os.getenv("AGENT_ANSWER_CACHE", "1") not in ("0", "false", "False"),
+            name="agent.answer_cache",
+        )
+
+    # ── Embedding ─────────────────────────────────────────────────────
+    async def embed(self, text: str) -> Optional[np.ndarray]:
+        """Embed a query as a unit float32 vector; None if embedding fails."""
+        try:
+            embedder = get_embeddings(self.embedding_model)
+            async with bulkhead(POOL_EMBEDDING):
+                with span("answer_cache.embed"):
+                    vector = np.asarray(
+                        await deadline.call("answer_cache.embed", lambda: embedder.aembed_query(text)),
+                        dtype=np.float32,
+                    )
+        except Exception as e:
+            logger.warning(f"Answer cache embedding failed: {e}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    # ── Lookup / store ────────────────────────────────────────────────
+    def _expire(self, now: float):
+        fresh = [e for e in self._entries if now - e.created_at <= self.ttl_seconds]
+        if len(fresh) != len(self._entries):
+            self._entries = fresh
+            self._matrix = None
+
+    def lookup(self, vector: Optional[np.ndarray], digest: str) -> Optional[CachedAnswer]:
+        if not self.enabled or vector is None:
+            return None
+        invalidations.poll()
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if not self._entries:
+                self.misses += 1
+                return None
+            if self._matrix is None:
+                self._matrix = np.stack([e.vector for e in self._entries])
+            scores = self._matrix @ vector
+            # Best-scoring entry whose context matches the caller's
+            for idx in np.argsort(scores)[::-1]:
+                if scores[idx] < self.threshold:
+                    break
+                entry = self._entries[idx]
+                if entry.context_digest == digest:
+                    self.hits += 1
+                    return entry
+            self.misses += 1
+            return None
+
+    def store(
+        self,
+        query: str,
+        answer: str,
+        vector: Optional[np.ndarray],
+        digest: str,
+        event_ids: Iterable[str] = (),
+        slugs: Iterable[str] = (),
+        used_search: bool = False,
+    ):
+        if not self.enabled or vector is None:
+            return
+        entry = CachedAnswer(
+            query=query,
+            answer=answer,
+            vector=vector,
+            context_digest=digest,
+            created_at=time.monotonic(),
+            event_ids=frozenset(event_ids),
+            slugs=frozenset(slugs),
+            used_search=used_search,
+        )
+        with self._lock:
+            self._expire(entry.created_at)
+            self._entries.append(entry)
+            if len(self._entries) > self.max_entries:
+                self._entries = self._entries[-self.max_entries:]
+            self._matrix = None
+
+    # ── Invalidation ──────────────────────────────────────────────────
+    def _drop(self, predicate) -> int:
+        with self._lock:
+            kept = [e for e in self._entries if not predicate(e)]
+            dropped = len(self._entries) - len(kept)
+            if dropped:
+                self._entries = kept
+                self._matrix = None
+        if dropped:
+            logger.info(f"Answer cache: invalidated {dropped} entries")
+        return dropped
+
+    def _apply(self, op: str, keys: list) -> int:
+        keys = set(keys)
+        if op == "events":
+            return self._drop(lambda e: e.used_search or bool(e.event_ids & keys))
+        if op == "slugs":
+            return self._drop(lambda e: bool(e.slugs & keys))
+        if op == "clear":
+            return self._drop(lambda e: True)
+        return 0
+
+    def _invalidate(self, op: str, keys: Iterable[str] = ()) -> int:
+        keys = list(keys)
+        if self.name:
+            invalidations.publish(self.name, op, keys)
+        return self._apply(op, keys)
+
+    def invalidate_events(self, event_ids: Iterable[str]) -> int:
+        """An event was (re-)embedded: any search-based answer may now differ."""
+        return self._invalidate("events", event_ids)
+
+    def invalidate_slugs(self, slugs: Iterable[str]) -> int:
+        """Hotel proposals for these microsites changed."""
+        return self._invalidate("slugs", slugs)
+
+    def clear(self):
+        self._invalidate("clear")
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+answer_cache = SemanticAnswerCache.from_env()
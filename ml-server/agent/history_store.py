@@ -0,0 +1,264 @@
+"""
+Short-term chat history stores
+──────────────────────────────
+Keeps the last few exchanges per user so follow-up questions have context.
+
+Two backends, selected with AGENT_HISTORY_BACKEND:
+  • memory  — per-process LRU (default).  Bounded by number of users and
+              total characters, idle users expire after a TTL.
+  • sqlite  — file-backed store (WAL mode) shared by every uvicorn worker
+              on the host and preserved across restarts.
+
+Messages are held compactly as (role, content) tuples with a one-letter
+role code and expanded to {"role", "content"} dicts only when read.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+
+from utils.shared_arrays import worker_count
+
+_ROLE_CODES = {"user": "u", "assistant": "a"}
+_ROLE_NAMES = {v: k for k, v in _ROLE_CODES.items()}
+
+
+def _expand(messages) -> list[dict]:
+    return [{"role": _ROLE_NAMES[role], "content": content} for role, content in messages]
+
+
+class HistoryStore(ABC):
+    """Interface shared by all history backends."""
+
+    def __init__(self, max_exchanges: int = 5, ttl_seconds: float = 3600):
+        self.max_messages = max_exchanges * 2  # 2 msgs per exchange
+        self.ttl_seconds = ttl_seconds
+
+    @abstractmethod
+    def get(self, user_id: str) -> list[dict]:
+        """Return the user's recent messages, oldest first."""
+
+    @abstractmethod
+    def append(self, user_id: str, user_msg: str, assistant_msg: str):
+        """Append a user+assistant exchange, evicting the oldest over the limit."""
+
+    @abstractmethod
+    def clear(self, user_id: str):
+        """Forget a user's short-term history."""
+
+
+class InMemoryHistoryStore(HistoryStore):
+    def __init__(
+        self,
+        max_exchanges: int = 5,
+        ttl_seconds: float = 3600,
+        max_users: int = 10_000,
+        max_chars: int = 50_000_000,
+    ):
+        super().__init__(max_exchanges, ttl_seconds)
+        self.max_users = max_users
+        self.max_chars = max_chars
+        # user_id -> (last_access, deque[(role, content)]); ordered oldest-access first
+        self._users: OrderedDict[str, tuple[float, deque]] = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _size(messages) -> int:
+        return sum(len(content) for _, content in messages)
+
+    def _drop(self, user_id: str):
+        _, messages = self._users.pop(user_id)
+        self._chars -= self._size(messages)
+
+    def _evict(self, now: float):
+        """Expire idle users, then evict least-recently-used until under the caps."""
+        while self._users:
+            user_id, (last_access, _) = next(iter(self._users.items()))
+            over_cap = len(self._users) > self.max_users or self._chars > self.max_chars
+            if now - last_access > self.ttl_seconds or over_cap:
+                self._drop(user_id)
+            else:
+                break
+
+    def get(self, user_id: str) -> list[dict]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                return []
+            last_access, messages = entry
+            if now - last_access > self.ttl_seconds:
+                self._drop(user_id)
+                return []
+            self._users[user_id] = (now, messages)
+            self._users.move_to_end(user_id)
+            return _expand(messages)
+
+    def append(self, user_id: str, user_msg: str, assistant_msg: str):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._users.get(user_id)
+            messages = entry[1] if entry else deque(maxlen=self.max_messages)
+            for item in (("u", user_msg), ("a", assistant_msg)):
+                if len(messages) == messages.maxlen:
+                    self._chars -= len(messages[0][1])
+                messages.append(item)
+                self._chars += len(item[1])
+            self._users[user_id] = (now, messages)
+            self._users.move_to_end(user_id)
+            self._evict(now)
+
+    def clear(self, user_id: str):
+        with self._lock:
+            if user_id in self._users:
+                self._drop(user_id)
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+
+class SQLiteHistoryStore(HistoryStore):
+    """History shared across processes through a local SQLite file."""
+
+    # Prune expired / over-cap users every N appends rather than on every write
+    PRUNE_EVERY = 200
+
+    def __init__(
+        self,
+        path: str,
+        max_exchanges: int = 5,
+        ttl_seconds: float = 3600,
+        max_users: int = 100_000,
+    ):
+        super().__init__(max_exchanges, ttl_seconds)
+        self.path = path
+        self.max_users = max_users
+        self._appends = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS chat_users (
+                user_id     TEXT PRIMARY KEY,
+                last_access REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS chat_messages (
+                id      INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                role    TEXT NOT NULL,
+                content TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS chat_messages_user ON chat_messages (user_id, id);
+            CREATE INDEX IF NOT EXISTS chat_users_access ON chat_users (last_access);
+            """
+        )
+
+    def get(self, user_id: str) -> list[dict]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_access FROM chat_users WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            if row is None:
+                return []
+            if now - row[0] > self.ttl_seconds:
+                self._delete_users([user_id])
+                return []
+            self._conn.execute(
+                "UPDATE chat_users SET last_access = ? WHERE user_id = ?", (now, user_id)
+            )
+            rows = self._conn.execute(
+                "SELECT role, content FROM chat_messages WHERE user_id = ? ORDER BY id",
+                (user_id,),
+            ).fetchall()
+        return _expand(rows)
+
+    def append(self, user_id: str, user_msg: str, assistant_msg: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT INTO chat_users (user_id, last_access) VALUES (?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET last_access = excluded.last_access",
+                    (user_id, now),
+                )
+                self._conn.executemany(
+                    "INSERT INTO chat_messages (user_id, role, content) VALUES (?, ?, ?)",
+                    [(user_id, "u", user_msg), (user_id, "a", assistant_msg)],
+                )
+                self._conn.execute(
+                    "DELETE FROM chat_messages WHERE user_id = ? AND id NOT IN "
+                    "(SELECT id FROM chat_messages WHERE user_id = ? ORDER BY id DESC LIMIT ?)",
+                    (user_id, user_id, self.max_messages),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+            self._appends += 1
+            if self._appends % self.PRUNE_EVERY == 0:
+                self._prune(now)
+
+    def _delete_users(self, user_ids: list[str]):
+        if not user_ids:
+            return
+        placeholders = ",".join("?" * len(user_ids))
+        self._conn.execute(f"DELETE FROM chat_messages WHERE user_id IN ({placeholders})", user_ids)
+        self._conn.execute(f"DELETE FROM chat_users WHERE user_id IN ({placeholders})", user_ids)
+
+    def _prune(self, now: float):
+        """Drop expired users, then the least-recently-active beyond max_users."""
+        expired = [
+            r[0] for r in self._conn.execute(
+                "SELECT user_id FROM chat_users WHERE last_access < ?", (now - self.ttl_seconds,)
+            )
+        ]
+        self._delete_users(expired)
+        overflow = [
+            r[0] for r in self._conn.execute(
+                "SELECT user_id FROM chat_users ORDER BY last_access DESC LIMIT -1 OFFSET ?",
+                (self.max_users,),
+            )
+        ]
+        self._delete_users(overflow)
+
+    def clear(self, user_id: str):
+        with self._lock:
+            self._delete_users([user_id])
+
+
+def create_history_store() -> HistoryStore:
+    """Build the history store configured through environment variables."""
+    # Several worker processes can't share an in-memory store
+    default_backend = "sqlite" if worker_count() > 1 else "memory"
+    backend = os.getenv("AGENT_HISTORY_BACKEND", default_backend).lower()
+    max_exchanges = int(os.getenv("AGENT_HISTORY_MAX_EXCHANGES", "5"))
+    ttl_seconds = float(os.getenv("AGENT_HISTORY_TTL_SECONDS", "3600"))
+
+    if backend == "sqlite":
+        path = os.getenv(
+            "AGENT_HISTORY_SQLITE_PATH",
+            os.path.join(os.path.dirname(__file__), "..", "data", "chat_history.sqlite3"),
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        return SQLiteHistoryStore(
+            path,
+            max_exchanges=max_exchanges,
+            ttl_seconds=ttl_seconds,
+            max_users=int(os.getenv("AGENT_HISTORY_MAX_USERS", "100000")),
+        )
+
+    return InMemoryHistoryStore(
+        max_exchanges=max_exchanges,
+        ttl_seconds=ttl_seconds,
+        max_users=int(os.getenv("AGENT_HISTORY_MAX_USERS", "10000")),
+        max_chars=int(os.getenv("AGENT_HISTORY_MAX_CHARS", "50000000")),
+    )
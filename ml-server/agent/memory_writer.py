@@ -0,0 +1,141 @@
+"""
+Write-behind queue for mem0 long-term memory
+─────────────────────────────────────────────
+`memory.add(...)` embeds the exchange and runs LLM fact extraction, which
+takes seconds.  Instead of doing that inside the request, `resolve_query`
+enqueues the exchange here and returns immediately.  A single background
+worker drains the queue:
+
+  • batching     — exchanges queued for the same user within a short window
+                   are merged into one `add` call
+  • back-pressure — the queue is bounded; producers wait briefly for a slot
+                   and the write is dropped (and logged) if none frees up
+  • retry        — failed writes are retried with exponential backoff
+"""
+
+import asyncio
+import logging
+from typing import Callable, Optional
+
+logger = logging.getLogger("agent.memory_writer")
+
+
+class MemoryWriteQueue:
+    def __init__(
+        self,
+        write_fn: Callable[..., object],
+        max_size: int = 1000,
+        batch_size: int = 16,
+        flush_interval: float = 0.5,
+        max_retries: int = 3,
+        retry_backoff: float = 0.5,
+        enqueue_timeout: float = 0.05,
+    ):
+        """
+        Args:
+            write_fn: Blocking callable invoked as ``write_fn(messages=..., user_id=...)``
+                      (``memory.add``).  It is run in a worker thread.
+            max_size: Maximum number of pending exchanges before producers block.
+            batch_size: Maximum exchanges pulled from the queue per flush.
+            flush_interval: Seconds to wait for more exchanges before flushing a batch.
+            max_retries: Retries per user batch before it is dropped.
+            retry_backoff: Base delay (seconds) for exponential backoff between retries.
+            enqueue_timeout: Seconds a producer waits for a free slot when the queue is full.
+        """
+        self._write_fn = write_fn
+        self._max_size = max_size
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._max_retries = max_retries
+        self._retry_backoff = retry_backoff
+        self._enqueue_timeout = enqueue_timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.dropped = 0
+        self.failed = 0
+
+    def _ensure_started(self):
+        """Create the queue + worker lazily on the running event loop."""
+        if self._worker is None or self._worker.done():
+            if self._queue is None:
+                self._queue = asyncio.Queue(maxsize=self._max_size)
+            self._worker = asyncio.create_task(self._run(), name="mem0-write-behind")
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def put(self, user_id: str, messages: list[dict]) -> bool:
+        """Enqueue an exchange for background storage. Returns False if dropped."""
+        self._ensure_started()
+        try:
+            await asyncio.wait_for(
+                self._queue.put((user_id, messages)), timeout=self._enqueue_timeout,
+            )
+            return True
+        except asyncio.TimeoutError:
+            self.dropped += 1
+            logger.warning(
+                f"mem0 write queue full ({self._max_size}) — dropped exchange for user {user_id}"
+            )
+            return False
+
+    async def _next_batch(self) -> list[tuple[str, list[dict]]]:
+        """Block for the first item, then collect more until the batch is full or the window closes."""
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self._flush_interval
+        while len(batch) < self._batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _write_with_retry(self, user_id: str, messages: list[dict]):
+        for attempt in range(self._max_retries + 1):
+            try:
+                await asyncio.to_thread(self._write_fn, messages=messages, user_id=user_id)
+                return
+            except Exception as e:
+                if attempt == self._max_retries:
+                    self.failed += 1
+                    logger.error(f"mem0 add failed for user {user_id} after {attempt + 1} attempts: {e}")
+                    return
+                delay = self._retry_backoff * (2 ** attempt)
+                logger.warning(f"mem0 add failed for user {user_id} (attempt {attempt + 1}), retrying in {delay}s: {e}")
+                await asyncio.sleep(delay)
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+
+            # Merge exchanges per user, preserving arrival order
+            per_user: dict[str, list[dict]] = {}
+            for user_id, messages in batch:
+                per_user.setdefault(user_id, []).extend(messages)
+
+            try:
+                for user_id, messages in per_user.items():
+                    await self._write_with_retry(user_id, messages)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def close(self, timeout: float = 10.0):
+        """Flush pending writes (bounded by *timeout*) and stop the worker."""
+        if self._worker is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"mem0 write queue shutdown timed out with {self.pending} pending exchanges")
+        self._worker.cancel()
+        try:
+            await self._worker
+        except (asyncio.CancelledError, Exception):
+            pass
+        self._worker = None
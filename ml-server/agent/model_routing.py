@@ -0,0 +1,133 @@
+"""
+Model routing for the agent pipeline
+────────────────────────────────────
+Each stage of an agent turn has its own model (env overrides in brackets):
+
+  guardrail  input / output safety classifiers   gpt-4.1-nano  [AGENT_MODEL_GUARDRAIL]
+  memory     mem0 fact extraction                gpt-4.1-mini  [AGENT_MODEL_MEMORY]
+  simple     single lookups for the assistant    gpt-4.1-mini  [AGENT_MODEL_SIMPLE]
+  complex    multi-step / planning questions     gpt-4.1       [AGENT_MODEL_COMPLEX]
+
+route_query() picks simple or complex for the main assistant with cheap
+rules, no model call.  Comparisons, plans, itineraries, budgets, several
+questions at once and long messages go to complex; short single lookups
+("hotels for <slug>", "events in Pune", "show me the first one") and
+greetings go to simple; anything else to complex.  A simple run that fails
+in the model (too many turns, malformed tool call) is retried once on the
+complex model.  AGENT_MODEL_ROUTING=0 sends every turn to complex.
+
+Per route: mlserver_agent_route_total{route}, latency
+mlserver_agent_route_seconds{route,model} and estimated spend
+mlserver_agent_cost_usd_total{route,model}.  The spend uses
+MODEL_PRICES (USD per 1M input / cached input / output tokens);
+AGENT_MODEL_PRICES='{"model": [in, cached, out]}' adds or overrides prices.
+"""
+
+import json
+import logging
+import os
+import re
+
+from prometheus_client import Counter, Histogram
+
+logger = logging.getLogger("agent.model_routing")
+
+ROUTE_GUARDRAIL = "guardrail"
+ROUTE_MEMORY = "memory"
+ROUTE_SIMPLE = "simple"
+ROUTE_COMPLEX = "complex"
+
+MODELS = {
+    ROUTE_GUARDRAIL: os.getenv("AGENT_MODEL_GUARDRAIL", "gpt-4.1-nano"),
+    ROUTE_MEMORY: os.getenv("AGENT_MODEL_MEMORY", "gpt-4.1-mini"),
+    ROUTE_SIMPLE: os.getenv("AGENT_MODEL_SIMPLE", "gpt-4.1-mini"),
+    ROUTE_COMPLEX: os.getenv("AGENT_MODEL_COMPLEX", "gpt-4.1"),
+}
+ROUTING_ENABLED = os.getenv("AGENT_MODEL_ROUTING", "1") == "1"
+SIMPLE_MAX_WORDS = int(os.getenv("AGENT_ROUTE_SIMPLE_MAX_WORDS", "25"))
+
+# USD per 1M tokens: input, cached input, output
+MODEL_PRICES: dict[str, tuple[float, float, float]] = {
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+}
+try:
+    MODEL_PRICES.update({k: tuple(v) for k, v in json.loads(os.getenv("AGENT_MODEL_PRICES", "{}")).items()})
+except (ValueError, TypeError) as e:
+    logger.warning(f"⚠️  Ignoring invalid AGENT_MODEL_PRICES: {e}")
+
+ROUTED = Counter(
+    "mlserver_agent_route_total",
+    "Agent turns by route (simple, complex, escalated)",
+    ["route"],
+)
+ROUTE_LATENCY = Histogram(
+    "mlserver_agent_route_seconds",
+    "Model run latency per route and model",
+    ["route", "model"],
+    buckets=(0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0, 20.0, 30.0, 60.0),
+)
+COST = Counter(
+    "mlserver_agent_cost_usd_total",
+    "Estimated model spend per route and model (from reported token usage)",
+    ["route", "model"],
+)
+
+
+def model_for(route: str) -> str:
+    if route in (ROUTE_SIMPLE, ROUTE_COMPLEX) and not ROUTING_ENABLED:
+        return MODELS[ROUTE_COMPLEX]
+    return MODELS[route]
+
+
+# ──────────────────────────────────────────────
+# Router
+# ──────────────────────────────────────────────
+
+_COMPLEX_RE = re.compile(
+    r"\b(compare|comparison|versus|vs\.?|difference|better|best\s+(?:option|choice|way)|plan|planning|"
+    r"itinerary|schedule|budget|cheapest|optimi[sz]e|trade-?offs?|pros\s+and\s+cons|"
+    r"step[-\s]by[-\s]step|both|all\s+of\s+(?:them|these)|each\s+of|combine|multiple|several|"
+    r"and\s+then|after\s+that|as\s+well\s+as|why|explain)\b",
+    re.IGNORECASE,
+)
+_SIMPLE_RE = re.compile(
+    r"^\s*(?:hi|hello|hey|thanks|thank\s+you|ok(?:ay)?|bye)\b|"
+    r"\b(hotels?|rooms?|stay|accommodation|events?|seminars?|conferences?|weddings?|concerts?|"
+    r"workshops?|expos?|show|find|search|list|what|when|where)\b",
+    re.IGNORECASE,
+)
+
+
+def route_query(query: str) -> str:
+    """'simple' for a short single lookup, 'complex' for anything that needs planning."""
+    if not ROUTING_ENABLED:
+        return ROUTE_COMPLEX
+    words = query.split()
+    if len(words) > SIMPLE_MAX_WORDS or query.count("?") > 1 or _COMPLEX_RE.search(query):
+        return ROUTE_COMPLEX
+    return ROUTE_SIMPLE if _SIMPLE_RE.search(query) else ROUTE_COMPLEX
+
+
+# ──────────────────────────────────────────────
+# Accounting
+# ──────────────────────────────────────────────
+
+def estimate_cost(model: str, usage) -> float:
+    """USD for an agents.Usage on *model* (0 when the model has no price)."""
+    prices = MODEL_PRICES.get(model)
+    if prices is None or usage is None:
+        return 0.0
+    cached = getattr(getattr(usage, "input_tokens_details", None), "cached_tokens", 0) or 0
+    fresh = max(0, (usage.input_tokens or 0) - cached)
+    return (fresh * prices[0] + cached * prices[1] + (usage.output_tokens or 0) * prices[2]) / 1_000_000
+
+
+def observe_run(route: str, model: str, seconds: float, usage=None):
+    ROUTE_LATENCY.labels(route, model).observe(seconds)
+    cost = estimate_cost(model, usage)
+    if cost:
+        COST.labels(route, model).inc(cost)
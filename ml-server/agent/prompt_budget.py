@@ -0,0 +1,183 @@
+"""
+Prompt token budget for the agent
+─────────────────────────────────
+Each agent turn sends the system instructions, the user's mem0 memories,
+the recent chat history and the question.  The history goes only as input
+messages, not into the instructions, and memories and history are trimmed
+to a token budget:
+
+  • memories  mem0 returns them most relevant first; whole memories are
+              kept, duplicates dropped, up to AGENT_PROMPT_MEMORY_TOKENS
+              (default 400)
+  • history   the newest exchanges (question + answer together) are kept up
+              to AGENT_PROMPT_HISTORY_TOKENS (default 1500); if even the
+              latest exchange is over budget, its answer is truncated
+              (and the question too, if it alone is over)
+
+Tokens are counted with tiktoken (o200k_base, the gpt-4o / gpt-4.1
+encoding) once warm-up has loaded it; until then, or when the encoding
+can't be downloaded, as ≈ 4 characters per token.
+
+Metrics: mlserver_agent_prompt_tokens{part} per turn,
+mlserver_agent_prompt_trimmed_tokens_total{part} and the model-reported
+mlserver_agent_llm_tokens_total{kind} (input, cached_input, output).
+"""
+
+import logging
+import os
+import threading
+from typing import Optional
+
+from prometheus_client import Counter, Histogram
+
+logger = logging.getLogger("agent.prompt_budget")
+
+ENCODING = "o200k_base"
+MEMORY_TOKENS = int(os.getenv("AGENT_PROMPT_MEMORY_TOKENS", "400"))
+HISTORY_TOKENS = int(os.getenv("AGENT_PROMPT_HISTORY_TOKENS", "1500"))
+# Per-message framing the chat format adds around each content string
+MESSAGE_OVERHEAD_TOKENS = 4
+_CHARS_PER_TOKEN = 4
+
+PROMPT_TOKENS = Histogram(
+    "mlserver_agent_prompt_tokens",
+    "Prompt tokens per agent turn, by part (system, memory, history, query)",
+    ["part"],
+    buckets=(50, 100, 250, 500, 1000, 1500, 2000, 3000, 5000, 8000, 16000),
+)
+TRIMMED_TOKENS = Counter(
+    "mlserver_agent_prompt_trimmed_tokens_total",
+    "Tokens dropped from agent prompts by the budget, by part",
+    ["part"],
+)
+LLM_TOKENS = Counter(
+    "mlserver_agent_llm_tokens_total",
+    "Tokens reported by the model for agent runs (input, cached_input, output)",
+    ["kind"],
+)
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def load_encoding():
+    """Load the tiktoken encoding (blocking — downloads it on first use; warm-up runs this)."""
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                import tiktoken
+                _encoding = tiktoken.get_encoding(ENCODING)
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Cut *text* to at most *max_tokens* tokens, marking the cut with an ellipsis."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    keep = max(0, max_tokens - 1)
+    if _encoding is not None:
+        head = _encoding.decode(_encoding.encode(text, disallowed_special=())[:keep])
+    else:
+        head = text[:keep * _CHARS_PER_TOKEN]
+    return head.rstrip() + "…"
+
+
+# ──────────────────────────────────────────────
+# Trimming
+# ──────────────────────────────────────────────
+
+def trim_memories(memories: list[str], budget: int = MEMORY_TOKENS) -> list[str]:
+    """Most relevant first: keep whole, distinct memories while they fit."""
+    kept, seen, used, dropped = [], set(), 0, 0
+    for memory in memories:
+        key = " ".join(memory.lower().split())
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        tokens = count_tokens(memory) + 2  # "- " prefix + newline
+        if used + tokens > budget:
+            dropped += tokens
+            continue
+        kept.append(memory)
+        used += tokens
+    if dropped:
+        TRIMMED_TOKENS.labels("memory").inc(dropped)
+    return kept
+
+
+def _message_tokens(message: dict) -> int:
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+def trim_history(history: list[dict], budget: int = HISTORY_TOKENS) -> list[dict]:
+    """Keep the newest exchanges that fit; an over-long latest exchange is truncated, answer first."""
+    # Group into exchanges (a user message and the replies after it), newest first
+    exchanges: list[list[dict]] = []
+    for message in history:
+        if message["role"] == "user" or not exchanges:
+            exchanges.append([message])
+        else:
+            exchanges[-1].append(message)
+
+    kept: list[list[dict]] = []
+    used = 0
+    for exchange in reversed(exchanges):
+        tokens = sum(_message_tokens(m) for m in exchange)
+        if used + tokens <= budget:
+            kept.append(exchange)
+            used += tokens
+            continue
+        if not kept:  # always keep the latest question, with as much of the answer as fits
+            head, rest = exchange[0], exchange[1:]
+            room = budget - _message_tokens(head) - MESSAGE_OVERHEAD_TOKENS * len(rest)
+            if rest and room > 0:
+                share = room // len(rest)
+                rest = [{**m, "content": truncate_tokens(m["content"], share)} for m in rest]
+            else:  # no answer yet, or the question alone is over budget
+                head = {**head, "content": truncate_tokens(head["content"], budget - MESSAGE_OVERHEAD_TOKENS)}
+                rest = []
+            kept.append([head] + rest)
+            used += sum(_message_tokens(m) for m in kept[-1])
+        break
+
+    trimmed = [m for exchange in reversed(kept) for m in exchange]
+    total = sum(_message_tokens(m) for m in history)
+    if total > used:
+        TRIMMED_TOKENS.labels("history").inc(total - used)
+    return trimmed
+
+
+# ──────────────────────────────────────────────
+# Reporting
+# ──────────────────────────────────────────────
+
+def observe_prompt(instructions: str, memory_context: str, history: list[dict], query: str) -> int:
+    """Record this turn's prompt size per part; returns the total."""
+    memory = count_tokens(memory_context)
+    parts = {
+        "system": count_tokens(instructions) - memory,
+        "memory": memory,
+        "history": sum(_message_tokens(m) for m in history),
+        "query": count_tokens(query) + MESSAGE_OVERHEAD_TOKENS,
+    }
+    for part, tokens in parts.items():
+        PROMPT_TOKENS.labels(part).observe(tokens)
+    return sum(parts.values())
+
+
+def observe_usage(usage) -> Optional[int]:
+    """Record the model-reported usage of an agent run (agents.Usage); returns input tokens."""
+    if usage is None or not usage.input_tokens:
+        return None
+    cached = getattr(getattr(usage, "input_tokens_details", None), "cached_tokens", 0) or 0
+    LLM_TOKENS.labels("input").inc(usage.input_tokens)
+    LLM_TOKENS.labels("cached_input").inc(cached)
+    LLM_TOKENS.labels("output").inc(usage.output_tokens or 0)
+    return usage.input_tokens
@@ -8,19 +8,35 @@ Takes a user_id and natural-language question, uses:
 """
 
 import os
+import re
+import json
 import asyncio
-from collections import deque
+import logging
+import threading
+import time
 from dotenv import load_dotenv
 
 # Load env from parent ml-server/.env
 load_dotenv(os.path.join(os.path.dirname(__file__), "..", ".env"))
 
 from openai import OpenAI
-from agents import Agent, Runner, GuardrailFunctionOutput, InputGuardrail, OutputGuardrail
+from agents import (
+    Agent, Runner, RunHooks, GuardrailFunctionOutput, InputGuardrail, OutputGuardrail,
+    InputGuardrailTripwireTriggered, MaxTurnsExceeded, ModelBehaviorError, RunContextWrapper,
+    ToolCallItem, ToolCallOutputItem,
+)
 from agents.mcp import MCPServerStdio
-from mem0 import Memory
 from pydantic import BaseModel
 
+from agent import model_routing, prompt_budget
+from agent.answer_cache import answer_cache, context_digest
+from agent.history_store import create_history_store
+from agent.memory_writer import MemoryWriteQueue
+from utils import deadline
+from utils.metrics import observe_stage, span
+
+logger = logging.getLogger("agent.query_resolver")
+
 # ─────────────────────────────────────────────
 # Config
 # ─────────────────────────────────────────────
@@ -31,6 +47,10 @@ QDRANT_HOST = QDRANT_URL.replace("http://", "").replace("https://", "").split(":
 QDRANT_PORT = int(QDRANT_URL.split(":")[-1]) if ":" in QDRANT_URL.rsplit("/", 1)[-1] else 6333
 
 MCP_SERVER_PATH = os.path.join(os.path.dirname(__file__), "..", "mcp-server", "event.py")
+# The MCP tools bound their own upstream calls by the same value (mcp-server/event.py)
+MCP_TOOL_TIMEOUT_SECONDS = float(os.getenv("MCP_TOOL_TIMEOUT_SECONDS", "15"))
+# Start the agent run before the input guardrail has passed (a blocked query still pays for the run)
+SPECULATIVE_RUN = os.getenv("AGENT_SPECULATIVE_RUN", "0") == "1"
 
 # ─────────────────────────────────────────────
 # mem0 – per-user conversation memory
@@ -47,7 +67,7 @@ mem0_config = {
     "llm": {
         "provider": "openai",
         "config": {
-            "model": "gpt-4.1",
+            "model": model_routing.model_for(model_routing.ROUTE_MEMORY),
             "api_key": OPENAI_API_KEY,
         },
     },
@@ -60,28 +80,78 @@ mem0_config = {
     },
 }
 
-memory = Memory.from_config(mem0_config)
+_memory = None
+_memory_lock = threading.Lock()
+
+
+def get_memory():
+    """Create the mem0 client on first use (connects to Qdrant + OpenAI).
+    A failed attempt is not cached, so the next call retries."""
+    global _memory
+    if _memory is None:
+        with _memory_lock:
+            if _memory is None:
+                from mem0 import Memory
+                _memory = Memory.from_config(mem0_config)
+    return _memory
+
+
+def _memory_add(**kwargs):
+    with span("mem0.add"):
+        return get_memory().add(**kwargs)
+
+
+# Long-term writes happen off the request path (see agent/memory_writer.py)
+memory_writer = MemoryWriteQueue(
+    _memory_add,
+    max_size=int(os.getenv("MEM0_WRITE_QUEUE_SIZE", "1000")),
+    batch_size=int(os.getenv("MEM0_WRITE_BATCH_SIZE", "16")),
+    flush_interval=float(os.getenv("MEM0_WRITE_FLUSH_INTERVAL", "0.5")),
+    max_retries=int(os.getenv("MEM0_WRITE_MAX_RETRIES", "3")),
+)
+
+
+async def _search_memories(user_id: str, query: str) -> str:
+    """Retrieve relevant long-term memories without blocking the event loop.
+    If mem0 is unavailable the agent still answers, just without memory."""
+    try:
+        with span("mem0.search"):
+            memories = await deadline.call_sync(
+                "mem0.search",
+                lambda: get_memory().search(query=query, user_id=user_id, limit=5),
+                hedge=False,
+            )
+    except Exception as e:
+        logger.warning(f"mem0 search failed, continuing without memory: {e}")
+        memories = None
+    # mem0 returns the most relevant first; keep what fits the memory token budget
+    texts = [mem.get("memory", "") for mem in (memories or {}).get("results") or []]
+    memory_lines = [f"- {text}" for text in prompt_budget.trim_memories(texts)]
+    return "\n".join(memory_lines) if memory_lines else "No prior interactions."
 
 # ─────────────────────────────────────────────
 # Short-term chat history — last 5 exchanges per user
+# (bounded / shared store, see agent/history_store.py)
 # ─────────────────────────────────────────────
-MAX_HISTORY = 5
-_chat_history: dict[str, deque] = {}  # user_id -> deque of {role, content}
+history_store = create_history_store()
 
 
 def _get_history(user_id: str) -> list[dict]:
-    """Return the current chat history for a user as a list of messages."""
-    if user_id not in _chat_history:
-        _chat_history[user_id] = deque(maxlen=MAX_HISTORY * 2)  # 2 msgs per exchange
-    return list(_chat_history[user_id])
+    """Return the current chat history for a user, trimmed to the history token budget (blocking)."""
+    return prompt_budget.trim_history(history_store.get(user_id))
+
+
+def _history_text(history: list[dict]) -> str:
+    if not history:
+        return "No recent messages."
+    return "\n".join(
+        f"{'User' if msg['role'] == 'user' else 'Assistant'}: {msg['content']}" for msg in history
+    )
 
 
 def _append_history(user_id: str, user_msg: str, assistant_msg: str):
-    """Append a user+assistant exchange, auto-evicting oldest when over limit."""
-    if user_id not in _chat_history:
-        _chat_history[user_id] = deque(maxlen=MAX_HISTORY * 2)
-    _chat_history[user_id].append({"role": "user", "content": user_msg})
-    _chat_history[user_id].append({"role": "assistant", "content": assistant_msg})
+    """Append a user+assistant exchange, auto-evicting oldest when over limit (blocking)."""
+    history_store.append(user_id, user_msg, assistant_msg)
 
 
 # ─────────────────────────────────────────────
@@ -92,9 +162,23 @@ class GuardrailResult(BaseModel):
     reason: str
 
 
+GUARDRAIL_MODEL = model_routing.model_for(model_routing.ROUTE_GUARDRAIL)
+
+
+async def _run_guardrail(agent: Agent, input_data, context) -> GuardrailResult:
+    started = time.perf_counter()
+    result = await Runner.run(agent, input_data, context=context)
+    model_routing.observe_run(
+        model_routing.ROUTE_GUARDRAIL, GUARDRAIL_MODEL,
+        time.perf_counter() - started, result.context_wrapper.usage,
+    )
+    return result.final_output_as(GuardrailResult)
+
+
 # Input guardrail – block harmful, off-topic, or prompt-injection attempts
 input_guardrail_agent = Agent(
     name="InputGuardrail",
+    model=GUARDRAIL_MODEL,
     instructions="""
 You are a safety classifier for SyncStay, an event management platform.
 Determine if the user's message is safe and relevant.
@@ -113,8 +197,8 @@ Respond with is_safe=true if allowed, is_safe=false with a reason if blocked.
 
 
 async def input_guardrail_fn(ctx, agent, input_text):
-    result = await Runner.run(input_guardrail_agent, input_text, context=ctx.context)
-    output = result.final_output_as(GuardrailResult)
+    with span("guardrail.input"):
+        output = await _run_guardrail(input_guardrail_agent, input_text, ctx.context)
     return GuardrailFunctionOutput(
         output_info=output,
         tripwire_triggered=not output.is_safe,
@@ -124,6 +208,7 @@ async def input_guardrail_fn(ctx, agent, input_text):
 # Output guardrail – ensure response quality
 output_guardrail_agent = Agent(
     name="OutputGuardrail",
+    model=GUARDRAIL_MODEL,
     instructions="""
 You are an output quality checker for SyncStay event assistant.
 
@@ -146,9 +231,24 @@ When in doubt, mark is_safe=true.
 )
 
 
+input_guardrail = InputGuardrail(guardrail_function=input_guardrail_fn)
+
+
+async def _check_input(input_messages: list[dict]):
+    """Run the input guardrail up front so it overlaps with the mem0 search.
+    Raises InputGuardrailTripwireTriggered exactly like the Runner would."""
+    result = await input_guardrail.run(
+        agent=input_guardrail_agent,
+        input=input_messages,
+        context=RunContextWrapper(context=None),
+    )
+    if result.output.tripwire_triggered:
+        raise InputGuardrailTripwireTriggered(result)
+
+
 async def output_guardrail_fn(ctx, agent, output_text):
-    result = await Runner.run(output_guardrail_agent, output_text, context=ctx.context)
-    output = result.final_output_as(GuardrailResult)
+    with span("guardrail.output"):
+        output = await _run_guardrail(output_guardrail_agent, output_text, ctx.context)
     return GuardrailFunctionOutput(
         output_info=output,
         tripwire_triggered=not output.is_safe,
@@ -159,10 +259,109 @@ async def output_guardrail_fn(ctx, agent, output_text):
 # MCP server connection
 # ─────────────────────────────────────────────
 sync_stay_mcp = MCPServerStdio(
-    params={"command": "python", "args": [MCP_SERVER_PATH]}
+    # Pass our environment on: the stdio client otherwise starts the tools with
+    # only a minimal one, dropping MCP_TOOL_TIMEOUT_SECONDS / MCP_COMPACT_OUTPUT
+    params={"command": "python", "args": [MCP_SERVER_PATH], "env": dict(os.environ)},
+    cache_tools_list=True,
+    # Slightly above the tools' own timeout so their error text reaches the agent
+    client_session_timeout_seconds=MCP_TOOL_TIMEOUT_SECONDS + 1,
 )
 
 
+class MCPConnection:
+    """
+    Keeps one MCP stdio session open for all requests.
+
+    A single owner task enters and exits the connection, since the stdio
+    client's cancel scopes must be exited by the task that entered them.
+    Requests share the session, and the next request reconnects if the
+    subprocess dies.
+    """
+
+    def __init__(self, server: MCPServerStdio):
+        self.server = server
+        self._task: asyncio.Task | None = None
+        self._ready: asyncio.Future | None = None
+        self._stop: asyncio.Event | None = None
+
+    async def _own(self):
+        try:
+            async with self.server:
+                self._ready.set_result(self.server)
+                await self._stop.wait()
+        except BaseException as e:
+            if not self._ready.done():
+                self._ready.set_exception(e)
+            raise
+
+    async def get(self) -> MCPServerStdio:
+        if self._task is None or self._task.done():
+            loop = asyncio.get_running_loop()
+            self._ready = loop.create_future()
+            self._stop = asyncio.Event()
+            self._task = asyncio.create_task(self._own(), name="mcp-connection")
+        return await asyncio.shield(self._ready)
+
+    async def close(self):
+        if self._task is None:
+            return
+        self._stop.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=5)
+        except (asyncio.TimeoutError, Exception):
+            self._task.cancel()
+        self._task = None
+
+
+mcp_connection = MCPConnection(sync_stay_mcp)
+
+
+# ─────────────────────────────────────────────
+# MCP tool call timing
+# ─────────────────────────────────────────────
+class ToolTimingHooks(RunHooks):
+    """Record each tool call's latency as stage `mcp.<tool name>`."""
+
+    def __init__(self):
+        self._started: dict[str, list[float]] = {}
+
+    async def on_tool_start(self, context, agent, tool):
+        self._started.setdefault(tool.name, []).append(time.perf_counter())
+
+    async def on_tool_end(self, context, agent, tool, result):
+        starts = self._started.get(tool.name)
+        if starts:
+            observe_stage(f"mcp.{tool.name}", time.perf_counter() - starts.pop(0))
+
+
+# ─────────────────────────────────────────────
+# Tool data fingerprint (for answer cache invalidation)
+# ─────────────────────────────────────────────
+_OBJECT_ID_RE = re.compile(r"\b[0-9a-f]{24}\b")
+
+
+def _tool_fingerprint(result) -> tuple[set[str], set[str], bool]:
+    """Collect the event ids / microsite slugs the agent's tool calls touched."""
+    event_ids: set[str] = set()
+    slugs: set[str] = set()
+    used_search = False
+    for item in result.new_items:
+        if isinstance(item, ToolCallItem):
+            name = getattr(item.raw_item, "name", "")
+            if name == "search_events":
+                used_search = True
+            elif name == "get_event_hotels":
+                try:
+                    args = json.loads(getattr(item.raw_item, "arguments", "") or "{}")
+                except ValueError:
+                    args = {}
+                if args.get("event_slug"):
+                    slugs.add(args["event_slug"])
+        elif isinstance(item, ToolCallOutputItem):
+            event_ids.update(_OBJECT_ID_RE.findall(str(item.output)))
+    return event_ids, slugs, used_search
+
+
 # ─────────────────────────────────────────────
 # Main Agent
 # ─────────────────────────────────────────────
@@ -186,83 +385,149 @@ GUIDELINES:
 8. If the question is not about events, politely redirect to event-related topics.
 9. When a user asks about hotels, booking options, accommodation, or room availability for an event,
    use the get_event_hotels tool with the event's microsite slug (the customSlug field from search results).
-10. The search_events tool now returns a slug and micrositeUrl for each event. Use the slug directly
-    when calling get_event_hotels — do NOT try to construct it yourself.
+10. The search_events tool returns a slug for each event. Use the slug directly when calling
+    get_event_hotels — do NOT try to construct it yourself.
 11. Present hotel results clearly with hotel name, rooms, pricing, amenities, and any special offers.
 12. ALWAYS include the event page link (/microsite/<slug>) in your response so users can
     click through to view the full event page and make bookings.
 
 MEMORY CONTEXT (from past conversations with this user):
 {memory_context}
-
-RECENT CONVERSATION (last few messages for short-term context):
-{chat_history}
 """
 
 
+async def _run_agent(agent: Agent, route: str, input_messages: list[dict]):
+    """Run the assistant; a simple-route run the small model fumbles is retried on the complex model."""
+    started = time.perf_counter()
+    try:
+        result = await Runner().run(agent, input_messages, hooks=ToolTimingHooks())
+    except (MaxTurnsExceeded, ModelBehaviorError) as e:
+        model_routing.observe_run(route, agent.model, time.perf_counter() - started)
+        complex_model = model_routing.model_for(model_routing.ROUTE_COMPLEX)
+        if route != model_routing.ROUTE_SIMPLE or agent.model == complex_model:
+            raise
+        logger.info(f"Escalating to {complex_model} after {type(e).__name__} on {agent.model}")
+        model_routing.ROUTED.labels("escalated").inc()
+        return await _run_agent(agent.clone(model=complex_model), model_routing.ROUTE_COMPLEX, input_messages)
+    model_routing.observe_run(route, agent.model, time.perf_counter() - started, result.context_wrapper.usage)
+    return result
+
+
+async def _run_guarded(run, guardrail_task: asyncio.Task):
+    """Run the agent once the input guardrail passed — or, with
+    AGENT_SPECULATIVE_RUN=1, while it finishes, a tripwire cancelling the run."""
+    if not SPECULATIVE_RUN:
+        try:
+            await guardrail_task
+        except BaseException:
+            run.close()
+            raise
+        return await run
+    run_task = asyncio.create_task(run)
+    try:
+        await guardrail_task
+    except BaseException:
+        run_task.cancel()
+        # A run that already failed: retrieve its exception so asyncio doesn't log it as lost
+        run_task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        raise
+    return await run_task
+
+
 async def resolve_query(user_id: str, query: str) -> str:
     """
     Main entry point — takes user_id and query, returns the agent's answer.
 
     Flow:
-      1. Retrieve user's past memory from mem0
-      2. Build agent with memory context + MCP tools + guardrails
-      3. Run the agent
-      4. Store the conversation in mem0
-      5. Return the response
+      1. Load short-term chat history (trimmed to its token budget)
+      2. Retrieve user's past memory from mem0, concurrently with the input guardrail
+      3. Return a cached answer for a near-identical question in the same
+         context, once the input guardrail has passed it
+      4. Build agent with memory context + MCP tools + output guardrail,
+         on the model routed for this question (agent/model_routing.py)
+      5. Run the agent once the input guardrail passed (with
+         AGENT_SPECULATIVE_RUN=1 alongside it, cancelled if it trips)
+      6. Cache the answer, queue the conversation for mem0 (write-behind)
+         and return the response
     """
 
-    # 1. Retrieve relevant memories for this user
-    memories = memory.search(query=query, user_id=user_id, limit=5)
-    memory_lines = []
-    if memories and memories.get("results"):
-        for mem in memories["results"]:
-            memory_lines.append(f"- {mem.get('memory', '')}")
-
-    memory_context = "\n".join(memory_lines) if memory_lines else "No prior interactions."
-
-    # 2. Build short-term chat history string
-    history = _get_history(user_id)
-    if history:
-        history_lines = []
-        for msg in history:
-            prefix = "User" if msg["role"] == "user" else "Assistant"
-            history_lines.append(f"{prefix}: {msg['content']}")
-        chat_history_str = "\n".join(history_lines)
-    else:
-        chat_history_str = "No recent messages."
-
-    # 3. Build the agent with context, MCP, and guardrails
+    # 1. Short-term chat history — sent once, as input messages
+    history = await asyncio.to_thread(_get_history, user_id)
+    chat_history_str = _history_text(history)
+
+    input_messages = history + [{"role": "user", "content": query}]
+
+    # 2. Retrieve memories + embed the query for the answer cache while
+    #    the input guardrail runs
+    memory_task = asyncio.create_task(_search_memories(user_id, query))
+    vector_task = asyncio.create_task(answer_cache.embed(query)) if answer_cache.enabled else None
+    guardrail_task = asyncio.create_task(_check_input(input_messages))
+    try:
+        memory_context = await memory_task
+        query_vector = await vector_task if vector_task else None
+    except BaseException:
+        for task in (memory_task, vector_task, guardrail_task):
+            if task:
+                task.cancel()
+        raise
+
+    # 3. Serve a near-identical question asked in the same context from cache
+    digest = context_digest(memory_context, chat_history_str)
+    cached = answer_cache.lookup(query_vector, digest)
+    if cached is not None:
+        # A blocked question must not get an answer cached for an allowed one
+        await guardrail_task
+        await asyncio.to_thread(_append_history, user_id, query, cached.answer)
+        await memory_writer.put(
+            user_id,
+            [
+                {"role": "user", "content": query},
+                {"role": "assistant", "content": cached.answer},
+            ],
+        )
+        return cached.answer
+
+    # 4. Build the agent with context, MCP, and guardrails, on the routed model
+    try:
+        mcp_server = await mcp_connection.get()
+    except BaseException:
+        guardrail_task.cancel()
+        raise
+    instructions = SYSTEM_INSTRUCTIONS.format(memory_context=memory_context)
+    prompt_budget.observe_prompt(instructions, memory_context, history, query)
+    route = model_routing.route_query(query)
+    model_routing.ROUTED.labels(route).inc()
     agent = Agent(
         name="SyncStayAssistant",
-        instructions=SYSTEM_INSTRUCTIONS.format(
-            memory_context=memory_context,
-            chat_history=chat_history_str,
-        ),
-        mcp_servers=[sync_stay_mcp],
-        input_guardrails=[InputGuardrail(guardrail_function=input_guardrail_fn)],
+        model=model_routing.model_for(route),
+        instructions=instructions,
+        mcp_servers=[mcp_server],
         output_guardrails=[OutputGuardrail(guardrail_function=output_guardrail_fn)],
     )
 
-    # 4. Build input as conversation history + current query for the agent
-    input_messages = history + [{"role": "user", "content": query}]
-
-    # 5. Run the agent with MCP connection active
-    async with sync_stay_mcp:
-        runner = Runner()
-        result = await runner.run(agent, input_messages)
-        response = result.final_output
+    # 5. Run the agent over the shared MCP connection once the input guardrail passed
+    with span("agent.run"):
+        result = await _run_guarded(_run_agent(agent, route, input_messages), guardrail_task)
+    response = result.final_output
+    prompt_budget.observe_usage(result.context_wrapper.usage)
 
     # 6. Append to short-term history queue (auto-evicts oldest)
-    _append_history(user_id, query, response)
+    await asyncio.to_thread(_append_history, user_id, query, response)
+
+    # 7. Cache the answer with the tool data it was built from
+    event_ids, slugs, used_search = _tool_fingerprint(result)
+    answer_cache.store(
+        query, response, query_vector, digest,
+        event_ids=event_ids, slugs=slugs, used_search=used_search,
+    )
 
-    # 7. Store in mem0 for long-term memory
-    memory.add(
-        messages=[
+    # 8. Queue for mem0 long-term memory (written in the background)
+    await memory_writer.put(
+        user_id,
+        [
             {"role": "user", "content": query},
             {"role": "assistant", "content": response},
         ],
-        user_id=user_id,
     )
 
     return response
@@ -5,8 +5,12 @@ Mount this in index.py to expose POST /agent/query
 
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import Optional
-from agents import InputGuardrailTripwireTriggered, OutputGuardrailTripwireTriggered
+from typing import List, Optional
+
+from utils import admission, deadline
+
+# The agents SDK and agent.query_resolver are heavy; they are imported on
+# first request (or by the warm-up task in index.py), not at app startup.
 
 router = APIRouter()
 
@@ -30,13 +34,20 @@ async def handle_query(request: QueryRequest) -> QueryResponse:
     Resolve a user query using the SyncStay agent.
     Uses mem0 for memory, MCP for event search, and guardrails for safety.
     """
+    from agents import InputGuardrailTripwireTriggered, OutputGuardrailTripwireTriggered
+
     try:
         from agent.query_resolver import resolve_query
 
-        answer = await resolve_query(
-            user_id=request.user_id,
-            query=request.query,
-        )
+        # Per-user limits first (reject without queueing), then the agent
+        # bulkhead; the whole run (guardrails, agent, MCP tools) shares the
+        # request deadline
+        async with admission.user_limiter.admit(request.user_id):
+            async with admission.bulkhead(admission.POOL_AGENT):
+                answer = await deadline.bounded(
+                    resolve_query(user_id=request.user_id, query=request.query),
+                    "agent",
+                )
 
         return QueryResponse(
             user_id=request.user_id,
@@ -62,5 +73,34 @@ async def handle_query(request: QueryRequest) -> QueryResponse:
             block_reason="output_blocked",
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+class CacheInvalidateRequest(BaseModel):
+    event_ids: List[str] = []
+    slugs: List[str] = []
+    clear_all: bool = False
+
+
+@router.post("/cache/invalidate")
+async def invalidate_answer_cache(request: CacheInvalidateRequest):
+    """
+    Drop cached agent answers built from stale tool data.
+    Call with `slugs` when a microsite's hotel proposals change and with
+    `event_ids` when events change outside of /event/embedding.
+    """
+    from agent.answer_cache import answer_cache
+
+    if request.clear_all:
+        answer_cache.clear()
+        return {"status": "success", "invalidated": "all"}
+
+    invalidated = 0
+    if request.event_ids:
+        invalidated += answer_cache.invalidate_events(request.event_ids)
+    if request.slugs:
+        invalidated += answer_cache.invalidate_slugs(request.slugs)
+    return {"status": "success", "invalidated": invalidated, **answer_cache.stats()}
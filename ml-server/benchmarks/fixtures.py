@@ -0,0 +1,175 @@
+"""
+Synthetic data + local stand-ins for the benchmark suite
+────────────────────────────────────────────────────────
+Everything here is deterministic (seeded) and offline:
+  • make_hotels / make_event  — hotel catalogs scattered around a city
+  • FakeEmbedder              — hash-seeded unit vectors, OpenAIEmbeddings-compatible
+  • build_qdrant              — QdrantClient(":memory:") with events_vectors,
+                                hotels_vectors, hotels_activity_vectors and
+                                optionally hotels_activity_centroids
+"""
+
+import hashlib
+import random
+import uuid
+import warnings
+
+import numpy as np
+from qdrant_client import QdrantClient, models
+
+from hotel.recommendation import EventInput, HotelInput, object_id_to_uuid
+
+# Panaji, Goa
+CITY_LAT = 15.4909
+CITY_LNG = 73.8278
+
+EVENT_TYPES = ["conference", "wedding", "seminar", "workshop", "concert", "expo"]
+
+
+def object_id(i: int) -> str:
+    """24-hex Mongo-style id for synthetic record *i*."""
+    return f"{i:024x}"
+
+
+def make_hotels(n: int, spread_deg: float = 0.15, seed: int = 7) -> list[HotelInput]:
+    rng = random.Random(seed)
+    hotels = []
+    for i in range(n):
+        hotels.append(HotelInput(
+            id=object_id(i),
+            name=f"Hotel {i}",
+            latitude=CITY_LAT + rng.uniform(-spread_deg, spread_deg),
+            longitude=CITY_LNG + rng.uniform(-spread_deg, spread_deg),
+            city="Panaji",
+            country="India",
+            totalRooms=rng.randint(20, 400),
+            specialization=rng.sample(EVENT_TYPES, k=2),
+            priceRange={"min": 2000, "max": 9000},
+            averageRating=round(rng.uniform(2.5, 5.0), 1),
+            eventsHostedCount=rng.randint(0, 120),
+        ))
+    return hotels
+
+
+def make_event() -> EventInput:
+    return EventInput(
+        id=object_id(10**9),
+        name="Cloud Networking Summit",
+        type="conference",
+        description="Two-day summit on cloud networking and SRE practices.",
+        latitude=CITY_LAT,
+        longitude=CITY_LNG,
+        city="Panaji",
+        country="India",
+    )
+
+
+def make_html(paragraphs: int, seed: int = 3) -> str:
+    rng = random.Random(seed)
+    words = ["network", "summit", "cloud", "goa", "keynote", "panel", "security", "devops"]
+    body = []
+    for p in range(paragraphs):
+        text = " ".join(rng.choice(words) for _ in range(60))
+        body.append(f"<p>{text} https://example.com/p/{p}?ref=x</p>")
+    return (
+        "<html><head><style>p{color:red}</style><script>var x=1;</script></head><body>"
+        + "".join(body) + "</body></html>"
+    )
+
+
+class FakeEmbedder:
+    """Deterministic stand-in for OpenAIEmbeddings: same text → same unit vector."""
+
+    def __init__(self, dim: int = 64):
+        self.dim = dim
+
+    def _vector(self, text: str) -> list[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        v = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        return (v / np.linalg.norm(v)).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._vector(text)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._vector(t) for t in texts]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return self._vector(text)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embed_documents(texts)
+
+
+def _random_unit(rng: np.random.Generator, n: int, dim: int) -> np.ndarray:
+    m = rng.standard_normal((n, dim)).astype(np.float32)
+    return m / np.linalg.norm(m, axis=1, keepdims=True)
+
+
+def build_qdrant(
+    hotels: list[HotelInput],
+    n_events: int = 500,
+    chunks_per_event: int = 4,
+    dim: int = 64,
+    seed: int = 11,
+    activity_points: int = 1,
+    centroids: bool = False,
+) -> QdrantClient:
+    """In-memory Qdrant shaped like production (langchain payload layout for events)."""
+    rng = np.random.default_rng(seed)
+    client = QdrantClient(":memory:")
+    params = models.VectorParams(size=dim, distance=models.Distance.COSINE)
+
+    client.create_collection("events_vectors", vectors_config=params)
+    vectors = _random_unit(rng, n_events * chunks_per_event, dim)
+    points = []
+    for e in range(n_events):
+        slug = f"event-{e}"
+        meta = {
+            "id": object_id(e), "name": f"Event {e}", "type": EVENT_TYPES[e % len(EVENT_TYPES)],
+            "location": "Panaji, India", "startDate": "2027-08-12", "endDate": "2027-08-14",
+            "customSlug": slug,
+        }
+        for c in range(chunks_per_event):
+            points.append(models.PointStruct(
+                id=str(uuid.UUID(int=e * chunks_per_event + c)),
+                vector=vectors[e * chunks_per_event + c].tolist(),
+                payload={"page_content": f"Event {e} chunk {c}", "metadata": meta},
+            ))
+    with warnings.catch_warnings():
+        # Local mode warns above 20k points — expected for the large sizes
+        warnings.simplefilter("ignore", UserWarning)
+        client.upload_points("events_vectors", points)
+
+    client.create_collection("hotels_vectors", vectors_config=params)
+    hv = _random_unit(rng, len(hotels), dim)
+    client.upload_points("hotels_vectors", [
+        models.PointStruct(id=object_id_to_uuid(h.id), vector=hv[i].tolist(), payload={"hotelId": h.id})
+        for i, h in enumerate(hotels)
+    ])
+
+    # Legacy layout: `activity_points` points per hotel; the first keeps the
+    # hotel's own id, like the backend's single cumulative point
+    client.create_collection("hotels_activity_vectors", vectors_config=params)
+    av = _random_unit(rng, len(hotels) * activity_points, dim)
+    client.upload_points("hotels_activity_vectors", [
+        models.PointStruct(
+            id=object_id_to_uuid(h.id) if k == 0 else str(uuid.UUID(int=(i + 1) * 1_000_003 + k)),
+            vector=av[i * activity_points + k].tolist(),
+            payload={"hotelId": h.id},
+        )
+        for i, h in enumerate(hotels) for k in range(activity_points)
+    ])
+
+    if centroids:
+        client.create_collection(
+            "hotels_activity_centroids",
+            vectors_config=models.VectorParams(size=dim, distance=models.Distance.DOT),
+        )
+        means = av.reshape(len(hotels), activity_points, dim).mean(axis=1)
+        client.upload_points("hotels_activity_centroids", [
+            models.PointStruct(id=object_id_to_uuid(h.id), vector=means[i].tolist(),
+                               payload={"hotelId": h.id, "count": activity_points})
+            for i, h in enumerate(hotels)
+        ])
+    return client
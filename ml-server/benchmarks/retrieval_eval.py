@@ -0,0 +1,360 @@
+"""
+Offline retrieval evaluation for event search
+─────────────────────────────────────────────
+Indexes a set of events into a local, in-process Qdrant once per
+configuration — chunk size / overlap and embedding model as used by
+event/embedding.py, over-fetch factor as used by event/event_fetch.py —
+runs a labelled query set through the same chunking and ranking code, and
+reports per configuration:
+
+  recall@k, MRR, nDCG@k   binary relevance, for every k in --k
+  vectors, index KiB      chunk count; float32 vectors + payload JSON
+  search ms               median / p95 of Qdrant query + event aggregation
+
+Queries go through event/query_parser.py like /event/fetch does — dates and
+cities become a Qdrant filter — unless --no-filters.  --rerank N adds the
+cross-encoder stage over the top N events; its time counts in search ms.  Local-mode Qdrant
+checks filters in Python, so filtered search ms here overstates a server.
+  embed ms                median query-embedding latency per model
+
+Inputs (a JSON array or JSON lines):
+  --events   EventPost records: id, name, type, description (HTML), dates, location, customSlug
+  --labels   {"query": "...", "relevant": ["<event id>", ...]}
+
+Usage (from ml-server/):
+    python -m benchmarks.retrieval_eval --events events.jsonl --labels labels.jsonl \\
+        --chunk-sizes 500,1000,2000 --overlaps 0,100 \\
+        --models text-embedding-3-large,text-embedding-3-small \\
+        --overfetch 3,5,10 --k 5,10 --output eval.json
+    python -m benchmarks.retrieval_eval --synthetic 300 --embedder hashing     # offline smoke run
+
+--embedder openai (default) needs OPENAI_API_KEY.  Embeddings are cached per
+(model, text) for the run, so configurations that produce identical chunks
+are not embedded twice.  --embedder hashing is a deterministic bag-of-words
+stand-in: its numbers show the pipeline works and how chunking changes
+vector count and latency, not which embedding model is better.
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import statistics
+import time
+import uuid
+from itertools import product
+
+import numpy as np
+from qdrant_client import QdrantClient, models
+
+from benchmarks import fixtures
+from event.embedding import CHUNK_OVERLAP, CHUNK_SIZE, EMBEDDING_MODEL, EventLocation, EventPost, build_event_chunks
+from event.event_fetch import OVERFETCH, best_event_hits, constraint_filter, rank_event_hits
+from event.query_parser import ParsedQuery, parse_query
+from event.rerank import event_reranker
+
+COLLECTION = "events_vectors"
+
+
+# ── Inputs ─────────────────────────────────────────────────────────────
+
+def _read_records(path: str) -> list[dict]:
+    with open(path) as f:
+        text = f.read().strip()
+    if text.startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def load_events(path: str) -> list[EventPost]:
+    return [EventPost(**record) for record in _read_records(path)]
+
+
+def load_labels(path: str) -> list[dict]:
+    labels = []
+    for record in _read_records(path):
+        relevant = record.get("relevant") or []
+        if record.get("query") and relevant:
+            labels.append({"query": record["query"], "relevant": [str(r) for r in relevant]})
+    return labels
+
+
+_TOPICS = [
+    ("cloud networking", ["cloud", "network", "latency", "kubernetes", "sre"]),
+    ("fintech payments", ["payments", "banking", "upi", "fraud", "ledger"]),
+    ("sustainable farming", ["organic", "soil", "harvest", "irrigation", "farmers"]),
+    ("indie music", ["guitar", "bands", "vinyl", "acoustic", "setlist"]),
+    ("medical research", ["clinical", "trials", "oncology", "genomics", "patients"]),
+    ("startup funding", ["investors", "pitch", "seed", "founders", "valuation"]),
+    ("coastal tourism", ["beaches", "resorts", "heritage", "cruise", "hospitality"]),
+    ("ai safety", ["alignment", "evaluation", "models", "robustness", "policy"]),
+]
+_CITIES = ["Panaji", "Mumbai", "Bengaluru", "Chennai", "Kochi", "Jaipur", "Pune", "Delhi"]
+_FILLER = ["agenda", "speakers", "session", "venue", "registration", "networking", "lunch", "keynote"]
+
+
+def synthetic_dataset(n: int, seed: int = 11) -> tuple[list[EventPost], list[dict]]:
+    """
+    n events (topic × type × city) with long HTML descriptions, and one
+    labelled query per event; events sharing topic, type and city are all
+    relevant to each other's queries.
+    """
+    rng = random.Random(seed)
+    events, keys = [], []
+    for i in range(n):
+        topic, words = rng.choice(_TOPICS)
+        event_type = rng.choice(fixtures.EVENT_TYPES)
+        city = rng.choice(_CITIES)
+        paragraphs = []
+        for p in range(rng.randint(2, 8)):
+            vocab = words if p % 3 == 0 else _FILLER + words[:1]
+            paragraphs.append("<p>" + " ".join(rng.choice(vocab) for _ in range(rng.randint(60, 160))) + "</p>")
+        events.append(EventPost(
+            id=fixtures.object_id(i),
+            name=f"{city} {topic.title()} {event_type.title()} {i}",
+            type=event_type,
+            description="<html><body>" + "".join(paragraphs) + "</body></html>",
+            startDate="2026-03-01",
+            endDate="2026-03-02",
+            location=EventLocation(city=city, country="India"),
+            customSlug=f"event-{i}",
+        ))
+        keys.append((topic, event_type, city))
+
+    by_key: dict[tuple, list[str]] = {}
+    for event, key in zip(events, keys):
+        by_key.setdefault(key, []).append(event.id)
+    labels = [
+        {"query": f"{event_type} about {topic} in {city}", "relevant": ids}
+        for (topic, event_type, city), ids in by_key.items()
+    ]
+    return events, labels
+
+
+# ── Embeddings ─────────────────────────────────────────────────────────
+
+class HashingEmbedder:
+    """Deterministic bag-of-words vectors (feature hashing), for offline runs."""
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def _vector(self, text: str) -> list[float]:
+        v = np.zeros(self.dim, dtype=np.float32)
+        for token in re.findall(r"[a-z0-9]+", text.lower()):
+            h = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+            v[h % self.dim] += 1.0 if (h >> 63) else -1.0
+        norm = np.linalg.norm(v)
+        return (v / norm if norm else v).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._vector(text)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._vector(t) for t in texts]
+
+
+class EmbeddingCache:
+    """Run-wide (model, text) -> vector cache in front of the embedding clients."""
+
+    def __init__(self, backend: str):
+        self.backend = backend
+        self._vectors: dict[tuple[str, str], list[float]] = {}
+        self._clients: dict[str, object] = {}
+        self.query_ms: dict[str, list[float]] = {}
+
+    def _client(self, model: str):
+        if model not in self._clients:
+            if self.backend == "hashing":
+                self._clients[model] = HashingEmbedder()
+            elif self.backend == "fake":
+                self._clients[model] = fixtures.FakeEmbedder()
+            else:
+                from utils.clients import get_embeddings
+                self._clients[model] = get_embeddings(model)
+        return self._clients[model]
+
+    def documents(self, model: str, texts: list[str]) -> list[list[float]]:
+        missing = list(dict.fromkeys(t for t in texts if (model, t) not in self._vectors))
+        if missing:
+            for text, vector in zip(missing, self._client(model).embed_documents(missing)):
+                self._vectors[(model, text)] = vector
+        return [self._vectors[(model, t)] for t in texts]
+
+    def query(self, model: str, text: str) -> list[float]:
+        key = (model, "query:" + text)
+        if key not in self._vectors:
+            started = time.perf_counter()
+            self._vectors[key] = self._client(model).embed_query(text)
+            self.query_ms.setdefault(model, []).append((time.perf_counter() - started) * 1000)
+        return self._vectors[key]
+
+
+# ── Index + metrics ────────────────────────────────────────────────────
+
+def build_index(chunks: list, vectors: list[list[float]]) -> tuple[QdrantClient, int]:
+    """A fresh in-memory collection laid out like langchain_qdrant writes it; returns (client, bytes)."""
+    client = QdrantClient(":memory:")
+    client.create_collection(
+        COLLECTION,
+        vectors_config=models.VectorParams(size=len(vectors[0]), distance=models.Distance.COSINE),
+    )
+    points, size = [], 0
+    for chunk, vector in zip(chunks, vectors):
+        payload = {"page_content": chunk.page_content, "metadata": chunk.metadata}
+        size += len(vector) * 4 + len(json.dumps(payload))
+        points.append(models.PointStruct(id=str(uuid.uuid4()), vector=vector, payload=payload))
+    for i in range(0, len(points), 1000):
+        client.upsert(COLLECTION, points[i:i + 1000])
+    return client, size
+
+
+def _dcg(gains: list[int]) -> float:
+    return sum(g / math.log2(rank + 2) for rank, g in enumerate(gains))
+
+
+def score_ranking(ranked_ids: list[str], relevant: set[str], ks: list[int]) -> dict[str, float]:
+    metrics = {}
+    first = next((i for i, eid in enumerate(ranked_ids) if eid in relevant), None)
+    for k in ks:
+        top = ranked_ids[:k]
+        hits = [1 if eid in relevant else 0 for eid in top]
+        ideal = _dcg([1] * min(len(relevant), k))
+        metrics[f"recall@{k}"] = sum(hits) / len(relevant)
+        metrics[f"mrr@{k}"] = 1.0 / (first + 1) if first is not None and first < k else 0.0
+        metrics[f"ndcg@{k}"] = _dcg(hits) / ideal if ideal else 0.0
+    return metrics
+
+
+def evaluate(
+    events: list[EventPost],
+    labels: list[dict],
+    embeddings: EmbeddingCache,
+    model: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    overfetches: list[int],
+    ks: list[int],
+    filters: bool = True,
+    rerank: int = 0,
+) -> list[dict]:
+    """One index (model × chunking), searched once per over-fetch factor."""
+    chunks = [c for event in events for c in build_event_chunks(event, chunk_size, chunk_overlap)]
+    started = time.perf_counter()
+    vectors = embeddings.documents(model, [c.page_content for c in chunks])
+    embed_s = time.perf_counter() - started
+    client, index_bytes = build_index(chunks, vectors)
+    parsed = [parse_query(l["query"]) if filters else ParsedQuery(text=l["query"]) for l in labels]
+    query_vectors = [embeddings.query(model, p.text) for p in parsed]
+
+    top_k = max(ks)
+    candidates = max(top_k, rerank)
+    rows = []
+    for overfetch in overfetches:
+        latencies, totals = [], {}
+        for label, query, vector in zip(labels, parsed, query_vectors):
+            started = time.perf_counter()
+            points = client.query_points(
+                COLLECTION, query=vector, query_filter=constraint_filter(query),
+                limit=candidates * overfetch, with_payload=True,
+            ).points
+            if rerank:
+                ranked = sorted(best_event_hits(points).items(), key=lambda x: x[1]["score"], reverse=True)[:candidates]
+                scores = event_reranker.score(query.text, [(event_id, data["text"]) for event_id, data in ranked])
+                ranked_ids = sorted((event_id for event_id, _ in ranked), key=scores.get, reverse=True)[:top_k]
+            else:
+                ranked_ids = [e["id"] for e in rank_event_hits(points, top_k)]
+            latencies.append((time.perf_counter() - started) * 1000)
+            for name, value in score_ranking(ranked_ids, set(label["relevant"]), ks).items():
+                totals[name] = totals.get(name, 0.0) + value
+        rows.append({
+            "model": model,
+            "chunk_size": chunk_size,
+            "chunk_overlap": chunk_overlap,
+            "overfetch": overfetch,
+            "filters": filters,
+            "rerank": rerank,
+            "vectors": len(chunks),
+            "index_kib": round(index_bytes / 1024, 1),
+            "index_embed_s": round(embed_s, 3),
+            "search_median_ms": round(statistics.median(latencies), 3),
+            "search_p95_ms": round(float(np.percentile(latencies, 95)), 3),
+            **{name: round(total / len(labels), 4) for name, total in totals.items()},
+        })
+    client.close()
+    return rows
+
+
+# ── CLI ────────────────────────────────────────────────────────────────
+
+def _ints(raw: str) -> list[int]:
+    return [int(x) for x in raw.split(",") if x.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", help="EventPost records (JSON array or JSON lines)")
+    parser.add_argument("--labels", help='{"query", "relevant": [event ids]} records')
+    parser.add_argument("--synthetic", type=int, default=0, help="Generate N synthetic events + labels instead")
+    parser.add_argument("--chunk-sizes", default=str(CHUNK_SIZE))
+    parser.add_argument("--overlaps", default=str(CHUNK_OVERLAP))
+    parser.add_argument("--models", default=EMBEDDING_MODEL)
+    parser.add_argument("--overfetch", default=str(OVERFETCH), help="Qdrant limit = max(k) × overfetch")
+    parser.add_argument("--k", default="5,10")
+    parser.add_argument("--no-filters", action="store_true", help="Embed queries verbatim (no date / city filters)")
+    parser.add_argument("--rerank", type=int, default=0, help="Cross-encoder rerank of the top N events (event/rerank.py)")
+    parser.add_argument("--embedder", choices=("openai", "hashing", "fake"), default="openai")
+    parser.add_argument("--output", help="Write results JSON here")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        events, labels = synthetic_dataset(args.synthetic)
+    elif args.events and args.labels:
+        events, labels = load_events(args.events), load_labels(args.labels)
+    else:
+        parser.error("pass --events and --labels, or --synthetic N")
+    known = {e.id for e in events}
+    labels = [l for l in labels if known.intersection(l["relevant"])]
+    if not labels:
+        parser.error("no labelled query has a relevant event in --events")
+
+    if args.rerank and not event_reranker.available():
+        parser.error("--rerank needs the optional sentence-transformers package")
+
+    ks = sorted(set(_ints(args.k)))
+    overfetches = _ints(args.overfetch)
+    embeddings = EmbeddingCache(args.embedder)
+    print(f"{len(events)} events, {len(labels)} labelled queries, embedder={args.embedder}\n")
+
+    k = ks[-1]
+    print(f"{'model':24} {'chunk':>6} {'overlap':>7} {'fetch×':>6} {'vectors':>8} {'KiB':>9} "
+          f"{'recall@' + str(k):>9} {'mrr@' + str(k):>7} {'ndcg@' + str(k):>8} {'search ms':>10} {'p95 ms':>8}")
+    results = []
+    for model, chunk_size, overlap in product(args.models.split(","), _ints(args.chunk_sizes), _ints(args.overlaps)):
+        if overlap >= chunk_size:
+            continue
+        for row in evaluate(events, labels, embeddings, model, chunk_size, overlap, overfetches, ks,
+                            not args.no_filters, args.rerank):
+            results.append(row)
+            print(f"{model:24} {chunk_size:>6} {overlap:>7} {row['overfetch']:>6} {row['vectors']:>8} "
+                  f"{row['index_kib']:>9.1f} {row[f'recall@{k}']:>9.3f} {row[f'mrr@{k}']:>7.3f} "
+                  f"{row[f'ndcg@{k}']:>8.3f} {row['search_median_ms']:>10.3f} {row['search_p95_ms']:>8.3f}")
+
+    query_embed_ms = {m: round(statistics.median(v), 3) for m, v in embeddings.query_ms.items()}
+    print("\nquery embedding ms (median): " + ", ".join(f"{m}={v}" for m, v in query_embed_ms.items()))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "events": len(events),
+                "queries": len(labels),
+                "embedder": args.embedder,
+                "query_embed_ms": query_embed_ms,
+                "results": results,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,383 @@
+"""
+ML server micro-benchmarks
+──────────────────────────
+Times the hot paths against synthetic data and local stand-ins (no OpenAI,
+Qdrant server or Nominatim needed) and records allocations per call.
+
+Usage (from ml-server/):
+    python -m benchmarks.run                                   # all cases, default sizes
+    python -m benchmarks.run --sizes 1000,10000,100000 --output bench.json
+    python -m benchmarks.run --only haversine,geocode_and_filter
+    python -m benchmarks.run --compare baseline.json --max-regression 0.20
+
+With --compare the run exits non-zero when any case's median time grows by
+more than --max-regression relative to the baseline file, so it can gate
+performance in review.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from functools import partial
+from typing import Callable, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+from benchmarks import fixtures
+from event.embedding import extract_text_from_html
+from event.event_fetch import EventSearchRequest, fetch_similar_events
+from hotel import recommendation as reco
+from utils import clients, vector_store
+
+
+@dataclass
+class Case:
+    name: str
+    setup: Callable[[int], Optional[Callable[[], object]]]  # size -> zero-arg callable (sync or returns coroutine), None to skip
+    max_size: Optional[int] = None  # skip sizes above this (e.g. Qdrant-backed cases)
+
+
+def _run_sync(fn):
+    result = fn()
+    if asyncio.iscoroutine(result):
+        result = asyncio.get_event_loop().run_until_complete(result)
+    return result
+
+
+# ── Cases ──────────────────────────────────────────────────────────────
+
+def _setup_haversine(n: int):
+    hotels = fixtures.make_hotels(n)
+    coords = [(h.latitude, h.longitude) for h in hotels]
+
+    def run():
+        for lat, lng in coords:
+            reco.haversine(fixtures.CITY_LAT, fixtures.CITY_LNG, lat, lng)
+    return run
+
+
+def _setup_geocode_and_filter(n: int):
+    event = fixtures.make_event()
+    hotels = fixtures.make_hotels(n)
+    return lambda: reco._geocode_and_filter(event, hotels, 5.0)
+
+
+def _setup_extract_text(n: int):
+    # n hotels ≈ n/100 paragraphs keeps the sizes comparable across cases
+    html = fixtures.make_html(max(1, n // 100))
+    return lambda: extract_text_from_html(html)
+
+
+def _install_stand_ins(hotels, dim: int = 64, n_events: int = 500, **qdrant_options):
+    embedder = fixtures.FakeEmbedder(dim)
+    for model in ("text-embedding-3-large", "text-embedding-3-small"):
+        clients.set_embeddings(model, embedder)
+    clients.set_qdrant_client(fixtures.build_qdrant(hotels, n_events=n_events, dim=dim, **qdrant_options))
+    vector_store.set_vector_store(None)
+
+
+def _use_local_vectors(*collections: str):
+    """Search *collections* in-process (VECTOR_STORE=local), synced from the stand-in Qdrant."""
+    import atexit
+    import shutil
+    import tempfile
+
+    root = tempfile.mkdtemp(prefix="bench-vectors-")
+    atexit.register(shutil.rmtree, root, True)
+    store = vector_store.LocalVectorStore(root, collections)
+    for name in collections:
+        store.sync(name)
+    vector_store.set_vector_store(store)
+
+
+def _setup_fetch_similar_events(n: int):
+    # n is the number of events indexed (4 chunks each)
+    _install_stand_ins(fixtures.make_hotels(10), n_events=n)
+    request = EventSearchRequest(query="network seminar in Goa in August", top_k=10)
+    return lambda: fetch_similar_events(request)
+
+
+def _setup_fetch_similar_events_local(n: int):
+    _install_stand_ins(fixtures.make_hotels(10), n_events=n)
+    _use_local_vectors("events_vectors")
+    request = EventSearchRequest(query="network seminar in Goa in August", top_k=10)
+    return lambda: fetch_similar_events(request)
+
+
+def _setup_recommend_with_ml(n: int, local: bool = False, **qdrant_options):
+    """Mode A; qdrant_options pick the activity layout (points per hotel, centroids)."""
+    hotels = fixtures.make_hotels(n, spread_deg=0.03)  # everything inside the 5 km radius
+    _install_stand_ins(hotels, **qdrant_options)
+    if local:
+        _use_local_vectors("hotels_vectors", "hotels_activity_vectors", "hotels_activity_centroids")
+    event = fixtures.make_event()
+    candidates = asyncio.get_event_loop().run_until_complete(
+        reco._geocode_and_filter(event, hotels, 5.0)
+    )
+
+    async def run():
+        # The pipeline annotates candidates in place — give each run fresh ones
+        fresh = [reco.Candidate(c.index, c.id, c.latitude, c.longitude, c.distance_from_event_km)
+                 for c in candidates]
+        reco.similarity_cache.clear()  # time the scoring, not the cache
+        return reco._render(await reco._recommend_with_ml(fresh, hotels, event, 50), hotels)
+    return run
+
+
+def _setup_recommend_degraded(n: int):
+    """Mode A with the embedder stalled: budget expires, local-signal ranking."""
+    hotels = fixtures.make_hotels(n, spread_deg=0.03)
+    _install_stand_ins(hotels)
+
+    class StalledEmbedder:
+        async def aembed_query(self, text):
+            await asyncio.sleep(3600)
+
+    clients.set_embeddings("text-embedding-3-small", StalledEmbedder())
+    event = fixtures.make_event()
+    candidates = asyncio.get_event_loop().run_until_complete(
+        reco._geocode_and_filter(event, hotels, 5.0)
+    )
+
+    async def run():
+        fresh = [reco.Candidate(c.index, c.id, c.latitude, c.longitude, c.distance_from_event_km)
+                 for c in candidates]
+        return reco._render(await reco._recommend_with_ml(fresh, hotels, event, 50, ml_budget_s=0.0), hotels)
+    return run
+
+
+def _setup_recommend_response(n: int, shape: str):
+    """Serialize n ranked recommendations: shape is "pydantic" (pre-ORJSON
+    path: models + jsonable_encoder + json.dumps), "full" or "compact"."""
+    hotels = fixtures.make_hotels(n)
+    candidates = [
+        reco.Candidate(i, h.id, h.latitude, h.longitude, 1.5, similarity_score=0.5, distance_from_best_km=0.7)
+        for i, h in enumerate(hotels)
+    ]
+    fields = reco.COMPACT_RECOMMENDATION_FIELDS if shape == "compact" else None
+
+    def rows():
+        return [
+            reco._recommendation_row(c, hotels[c.index], i + 1, "ranked", "Hotel 0", fields)
+            for i, c in enumerate(candidates)
+        ]
+
+    if shape == "pydantic":
+        def run():
+            response = reco.RecommendationResponse(
+                status="success",
+                recommendations=[reco.RecommendedHotel(**r) for r in rows()],
+                total_candidates=n, hotels_within_radius=n, best_hotel_name="Hotel 0",
+            )
+            return json.dumps(jsonable_encoder(response)).encode("utf-8")
+        return run
+    return lambda: reco._response(rows(), n, n, "Hotel 0").body
+
+
+def _setup_recommend_request(n: int, body_format: str):
+    """Decode + radius-filter a request with n hotels ("json" or "msgpack" columns)."""
+    import numpy as np
+    from hotel import columnar
+
+    hotels = [h.model_dump() for h in fixtures.make_hotels(n)]
+    meta = {"event": fixtures.make_event().model_dump(), "radius_km": 5.0, "limit": 10}
+    if body_format == "json":
+        body = json.dumps({**meta, "hotels": hotels}).encode("utf-8")
+
+        async def run():
+            req = reco.RecommendationRequest.model_validate_json(body)
+            return await reco._geocode_and_filter(req.event, req.hotels, req.radius_km)
+        return run
+
+    try:
+        import msgpack
+    except ImportError:
+        return None
+    columns = {"id": [h["id"] for h in hotels]}
+    for name in ("latitude", "longitude", "averageRating"):
+        columns[name] = np.array([h[name] for h in hotels], dtype="<f8").tobytes()
+    for name in ("totalRooms", "eventsHostedCount"):
+        columns[name] = np.array([h[name] for h in hotels], dtype="<i4").tobytes()
+    for name in ("name", "city", "country", "specialization", "priceRange"):
+        columns[name] = [h[name] for h in hotels]
+    body = msgpack.packb({**meta, "hotels": columns})
+
+    async def run():
+        fields, cols = columnar.decode_msgpack(body)
+        req = reco.RecommendationRequest.model_validate(fields)
+        return await columnar.geocode_and_filter_columns(req.event, cols, req.radius_km)
+    return run
+
+
+def _setup_recommend_by_distance_cached(n: int):
+    """Mode B answered from a cached candidate set, three hotels selected."""
+    from hotel.candidates import CandidateSet
+
+    hotels = fixtures.make_hotels(n, spread_deg=0.03)
+    event = fixtures.make_event()
+    candidates = asyncio.get_event_loop().run_until_complete(
+        reco._geocode_and_filter(event, hotels, 5.0)
+    )
+    candidate_set = CandidateSet(candidates, hotels)
+    selected = [
+        reco.SelectedHotelInput(id=h.id, name=h.name, latitude=h.latitude, longitude=h.longitude)
+        for h in hotels[:3]
+    ]
+
+    async def run():
+        return reco._render(await reco._recommend_by_distance(candidate_set, selected, "nearest", 10), hotels)
+    return run
+
+
+def _setup_allocate(n: int):
+    """Allocation solver over n in-radius candidates for a 600-room group."""
+    import numpy as np
+    from hotel.allocation import AllocationSolver, AllocationWeights
+
+    hotels = fixtures.make_hotels(n, spread_deg=0.03)
+    lat = np.array([h.latitude for h in hotels])
+    lng = np.array([h.longitude for h in hotels])
+    rooms = np.array([h.totalRooms for h in hotels])
+    similarity = np.random.default_rng(5).uniform(0.0, 0.6, n)
+    from_event = np.hypot(lat - fixtures.CITY_LAT, lng - fixtures.CITY_LNG) * 111.0
+
+    def run():
+        solver = AllocationSolver(lat, lng, rooms, similarity, 600, 20, AllocationWeights())
+        return solver.solve(from_event)
+    return run
+
+
+CASES = [
+    Case("haversine", _setup_haversine),
+    Case("geocode_and_filter", _setup_geocode_and_filter),
+    Case("extract_text_from_html", _setup_extract_text),
+    Case("fetch_similar_events", _setup_fetch_similar_events, max_size=10_000),
+    Case("fetch_similar_events_local", _setup_fetch_similar_events_local, max_size=10_000),
+    Case("recommend_with_ml", _setup_recommend_with_ml, max_size=10_000),
+    Case("recommend_with_ml_activity_scan", partial(_setup_recommend_with_ml, activity_points=10), max_size=10_000),
+    # Local-mode Qdrant evaluates has_id with a Python list scan per point, so
+    # this exercises the centroid path rather than timing the server's filter
+    Case("recommend_with_ml_centroids",
+         partial(_setup_recommend_with_ml, activity_points=10, centroids=True), max_size=1_000),
+    Case("recommend_with_ml_centroids_local",
+         partial(_setup_recommend_with_ml, local=True, activity_points=10, centroids=True), max_size=10_000),
+    Case("recommend_degraded", _setup_recommend_degraded),
+    Case("recommend_response_pydantic", partial(_setup_recommend_response, shape="pydantic")),
+    Case("recommend_response_full", partial(_setup_recommend_response, shape="full")),
+    Case("recommend_response_compact", partial(_setup_recommend_response, shape="compact")),
+    Case("recommend_request_json", partial(_setup_recommend_request, body_format="json")),
+    Case("recommend_request_msgpack", partial(_setup_recommend_request, body_format="msgpack")),
+    Case("recommend_by_distance_cached", _setup_recommend_by_distance_cached),
+    Case("allocate", _setup_allocate, max_size=10_000),
+]
+
+
+# ── Runner ─────────────────────────────────────────────────────────────
+
+def measure(fn, repeats: int, min_time: float) -> dict:
+    _run_sync(fn)  # warm-up
+
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < repeats or (time.perf_counter() - started) < min_time:
+        t0 = time.perf_counter()
+        _run_sync(fn)
+        timings.append(time.perf_counter() - t0)
+        if len(timings) >= repeats * 20:
+            break
+
+    # Separate pass so tracing overhead doesn't skew the timings
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+    _run_sync(fn)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    allocations = sum(max(s.count_diff, 0) for s in stats)
+
+    timings.sort()
+    return {
+        "runs": len(timings),
+        "min_ms": round(timings[0] * 1000, 4),
+        "median_ms": round(statistics.median(timings) * 1000, 4),
+        "p95_ms": round(timings[int(0.95 * (len(timings) - 1))] * 1000, 4),
+        "alloc_blocks": allocations,
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> list[str]:
+    failures = []
+    for key, current in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        ratio = current["median_ms"] / base["median_ms"] if base["median_ms"] else 1.0
+        current["vs_baseline"] = round(ratio, 3)
+        if ratio > 1 + max_regression:
+            failures.append(f"{key}: median {base['median_ms']} → {current['median_ms']} ms (x{ratio:.2f})")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--only", default="", help="Comma-separated case names")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.5, help="Minimum seconds per case")
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--compare", help="Baseline results JSON")
+    parser.add_argument("--max-regression", type=float, default=0.20)
+    args = parser.parse_args()
+
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    only = {s for s in args.only.split(",") if s}
+
+    results: dict[str, dict] = {}
+    print(f"{'case':40} {'size':>8} {'median ms':>12} {'p95 ms':>10} {'allocs':>9} {'peak KiB':>10}")
+    for case in CASES:
+        if only and case.name not in only:
+            continue
+        for size in sizes:
+            if case.max_size and size > case.max_size:
+                continue
+            fn = case.setup(size)
+            if fn is None:  # optional dependency missing
+                continue
+            r = measure(fn, args.repeats, args.min_time)
+            results[f"{case.name}[{size}]"] = r
+            print(f"{case.name:40} {size:>8} {r['median_ms']:>12.3f} {r['p95_ms']:>10.3f} "
+                  f"{r['alloc_blocks']:>9} {r['peak_kib']:>10.1f}")
+
+    failures = []
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        failures = compare(results, baseline, args.max_regression)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "python": sys.version.split()[0],
+                "machine": platform.machine(),
+                "results": results,
+            }, f, indent=2)
+
+    if failures:
+        print("\nPerformance regressions:")
+        for line in failures:
+            print(f"  ✗ {line}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
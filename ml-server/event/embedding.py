@@ -1,14 +1,34 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional
+import asyncio
+import logging
 import re
-from bs4 import BeautifulSoup
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
-from langchain_qdrant import QdrantVectorStore
-from langchain.schema import Document
+
+from utils import vector_store
+from utils.clients import get_embeddings, get_qdrant_client
+from utils.metrics import span
+
+# bs4 / langchain are imported inside the functions that use them so that
+# importing this router (at app startup) stays cheap.
 
 router = APIRouter()
+logger = logging.getLogger("event.embedding")
+
+# Indexing settings (benchmarks/retrieval_eval.py compares alternatives)
+EMBEDDING_MODEL = "text-embedding-3-large"
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 100
+
+# Payload fields filtered on: /event/fetch's constraints (event/query_parser.py)
+# and the superseded chunks of a re-embedded event
+FILTER_INDEXES = {
+    "metadata.startDate": "datetime",
+    "metadata.endDate": "datetime",
+    "metadata.location": "text",
+    "metadata.id": "keyword",
+}
+_filter_indexes_ready = False
 
 
 # Nested models for event structure
@@ -16,6 +36,8 @@ class EventLocation(BaseModel):
     city: str = ""
     country: str = ""
     venue: str = ""
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
 
 
 class EventPost(BaseModel):
@@ -31,6 +53,8 @@ class EventPost(BaseModel):
 
 def extract_text_from_html(html_content: str) -> str:
     """Extract plain text from HTML content and remove URLs"""
+    from bs4 import BeautifulSoup
+
     soup = BeautifulSoup(html_content, 'html.parser')
 
     for script in soup(["script", "style"]):
@@ -46,73 +70,154 @@ def extract_text_from_html(html_content: str) -> str:
     return text
 
 
+def build_event_chunks(event: EventPost, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP) -> list:
+    """The event as one plain-text document, split into the chunks that get embedded."""
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    from langchain_core.documents import Document
+
+    # Extract plain text from HTML description
+    clean_description = extract_text_from_html(event.description)
+
+    # Build location string
+    location_parts = []
+    if event.location:
+        if event.location.venue:
+            location_parts.append(event.location.venue)
+        if event.location.city:
+            location_parts.append(event.location.city)
+        if event.location.country:
+            location_parts.append(event.location.country)
+    location_str = ", ".join(location_parts) if location_parts else "Not specified"
+
+    # Combine key fields into a single text for embedding
+    full_text = (
+        f"Event Name: {event.name}\n"
+        f"Type: {event.type}\n"
+        f"Location: {location_str}\n"
+        f"Start Date: {event.startDate}\n"
+        f"End Date: {event.endDate}\n\n"
+        f"Description:\n{clean_description}"
+    )
+
+    # Create document with metadata
+    doc = Document(
+        page_content=full_text,
+        metadata={
+            "id": event.id,
+            "name": event.name,
+            "type": event.type,
+            "location": location_str,
+            "startDate": event.startDate,
+            "endDate": event.endDate,
+            "customSlug": event.customSlug,
+        }
+    )
+
+    # Split into chunks
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap
+    )
+    return text_splitter.split_documents([doc])
+
+
+def ensure_filter_indexes(client, collection: str = "events_vectors"):
+    """Create the payload indexes behind /event/fetch's date / city filters (once per process).
+
+    Run by the startup warm-up; /event/embedding runs it too, for a
+    collection its first event just created.
+    """
+    global _filter_indexes_ready
+    if _filter_indexes_ready or not client.collection_exists(collection):
+        return
+    existing = client.get_collection(collection).payload_schema or {}
+    for field_name, schema in FILTER_INDEXES.items():
+        if field_name not in existing:
+            client.create_payload_index(collection, field_name=field_name, field_schema=schema)
+    _filter_indexes_ready = True
+
+
+def delete_superseded_chunks(client, event_id: str, keep: list[str], collection: str = "events_vectors") -> list:
+    """Delete the event's chunks from an earlier embedding (all but *keep*); the deleted point ids."""
+    from qdrant_client import models
+
+    stale_filter = models.Filter(
+        must=[models.FieldCondition(key="metadata.id", match=models.MatchValue(value=event_id))],
+        must_not=[models.HasIdCondition(has_id=keep)],
+    )
+    stale, offset = [], None
+    while True:
+        points, offset = client.scroll(
+            collection, scroll_filter=stale_filter, limit=256, offset=offset,
+            with_payload=False, with_vectors=False,
+        )
+        stale.extend(p.id for p in points)
+        if offset is None:
+            break
+    if stale:
+        client.delete(collection, points_selector=models.PointIdsList(points=stale))
+        vector_store.record_deletes(collection, stale)
+    return stale
+
+
 @router.post("/embedding")
 async def create_event_embedding(event: EventPost):
     """
     Create embeddings for an event and store in Qdrant
     """
     try:
-        # Extract plain text from HTML description
-        clean_description = extract_text_from_html(event.description)
-
-        # Build location string
-        location_parts = []
-        if event.location:
-            if event.location.venue:
-                location_parts.append(event.location.venue)
-            if event.location.city:
-                location_parts.append(event.location.city)
-            if event.location.country:
-                location_parts.append(event.location.country)
-        location_str = ", ".join(location_parts) if location_parts else "Not specified"
-
-        # Combine key fields into a single text for embedding
-        full_text = (
-            f"Event Name: {event.name}\n"
-            f"Type: {event.type}\n"
-            f"Location: {location_str}\n"
-            f"Start Date: {event.startDate}\n"
-            f"End Date: {event.endDate}\n\n"
-            f"Description:\n{clean_description}"
-        )
+        from langchain_qdrant import QdrantVectorStore
 
-        # Create document with metadata
-        doc = Document(
-            page_content=full_text,
-            metadata={
-                "id": event.id,
-                "name": event.name,
-                "type": event.type,
-                "location": location_str,
-                "startDate": event.startDate,
-                "endDate": event.endDate,
-                "customSlug": event.customSlug,
-            }
-        )
+        chunks = build_event_chunks(event)
 
-        # Split into chunks
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=100
-        )
-        chunks = text_splitter.split_documents([doc])
-
-        # Initialize embeddings
-        embedding = OpenAIEmbeddings(
-            model="text-embedding-3-large",
-        )
+        # Shared embeddings client
+        embedding = get_embeddings(EMBEDDING_MODEL)
 
         # Store in Qdrant (cloud)
         import os
+        import uuid
         url = os.getenv("QDRANT_URL")
         api_key = os.getenv("QDRANT_API_KEY")
-        qdrant = QdrantVectorStore.from_documents(
-            chunks,
-            embedding,
-            url=url,
-            api_key=api_key,
-            collection_name="events_vectors",
-        )
+        point_ids = [str(uuid.uuid4()) for _ in chunks]
+        with span("embedding.index_event"):
+            qdrant = QdrantVectorStore.from_documents(
+                chunks,
+                embedding,
+                ids=point_ids,
+                url=url,
+                api_key=api_key,
+                collection_name="events_vectors",
+            )
+        try:
+            await asyncio.to_thread(ensure_filter_indexes, get_qdrant_client())
+        except Exception as e:
+            logger.warning(f"⚠️  Could not create events_vectors filter indexes: {e}")
+        if vector_store.tracks("events_vectors"):
+            try:
+                await asyncio.to_thread(vector_store.record_ids, "events_vectors", point_ids)
+            except Exception as e:
+                logger.warning(f"⚠️  In-process events_vectors will see event {event.id} at the next resync: {e}")
+        try:
+            stale = await asyncio.to_thread(delete_superseded_chunks, get_qdrant_client(), event.id, point_ids)
+            if stale:
+                logger.info(f"🗑️  Replaced {len(stale)} earlier chunks of event {event.id}")
+        except Exception as e:
+            logger.warning(f"⚠️  Could not delete earlier chunks of event {event.id}: {e}")
+
+        # Cached agent answers may reference this event or miss it in searches,
+        # and its rerank scores were computed against the old text
+        from agent.answer_cache import answer_cache
+        from event.rerank import event_reranker
+        answer_cache.invalidate_events([event.id])
+        event_reranker.cache.invalidate_events([event.id])
+
+        # Rank hotels for the event before a planner first opens it
+        from hotel.precompute import PRECOMPUTE_ENABLED, precompute_queue
+        if PRECOMPUTE_ENABLED:
+            try:
+                await asyncio.to_thread(precompute_queue.enqueue_embedded, event)
+            except Exception as e:
+                logger.warning(f"⚠️  Could not queue hotel precompute for event {event.id}: {e}")
 
         return {
             "status": "success",
@@ -1,10 +1,18 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 from typing import List, Optional
-from langchain_openai import OpenAIEmbeddings
-from qdrant_client import QdrantClient
 from collections import defaultdict
-import os
+
+from event.embedding import EMBEDDING_MODEL
+from event.query_parser import ParsedQuery, city_names, parse_query
+from event.rerank import RERANK_BUDGET_S, RERANK_CANDIDATES, RERANK_ENABLED, event_reranker
+from utils import deadline
+from utils.admission import POOL_EMBEDDING, POOL_VECTOR_SEARCH, bulkhead
+from utils.clients import get_embeddings
+from utils.metrics import span
+from utils.responses import parse_fields
+from utils.vector_store import get_vector_store
 
 router = APIRouter()
 
@@ -13,6 +21,10 @@ router = APIRouter()
 class EventSearchRequest(BaseModel):
     query: str  
     top_k: Optional[int] = 5
+    # Restrict results to the dates / cities named in the query (event/query_parser.py)
+    filters: Optional[bool] = True
+    # Cross-encoder rerank of the dense results (event/rerank.py); None = EVENT_RERANK
+    rerank: Optional[bool] = None
 
 
 # Response model
@@ -28,74 +40,151 @@ class SimilarEvent(BaseModel):
     percentage_similarity: float
 
 
-@router.post("/fetch")
-async def fetch_similar_events(request: EventSearchRequest) -> List[SimilarEvent]:
+SIMILAR_EVENT_FIELDS = tuple(SimilarEvent.model_fields)
+COMPACT_SIMILAR_EVENT_FIELDS = ("id", "customSlug", "percentage_similarity")
+
+# Events are indexed as several chunks, so fetch extra hits to still have
+# top_k distinct events after deduplicating (benchmarks/retrieval_eval.py)
+OVERFETCH = 10
+
+
+def constraint_filter(parsed: ParsedQuery):
+    """Qdrant filter: the event overlaps the query's date range and is in one of its cities."""
+    from qdrant_client import models
+
+    if not parsed.has_constraints:
+        return None
+    must = []
+    start, end = parsed.window()
+    if start:
+        must.append(models.FieldCondition(key="metadata.endDate", range=models.DatetimeRange(gte=start)))
+    if end:
+        must.append(models.FieldCondition(key="metadata.startDate", range=models.DatetimeRange(lte=end)))
+    if parsed.cities:
+        must.append(models.Filter(should=[
+            models.FieldCondition(key="metadata.location", match=models.MatchText(text=name))
+            for city in parsed.cities for name in city_names(city)
+        ]))
+    return models.Filter(must=must)
+
+
+def best_event_hits(search_results) -> dict:
+    """Aggregate chunk hits by event id — keep the best chunk's score, text and metadata."""
+    event_best = {}  # event_id -> { score, text, metadata }
+
+    for result in search_results:
+        meta = result.payload.get("metadata", {})
+        event_id = meta.get("id")
+        if not event_id:
+            continue
+
+        score = result.score
+        if event_id not in event_best or score > event_best[event_id]["score"]:
+            event_best[event_id] = {
+                "score": score,
+                "text": result.payload.get("page_content", ""),
+                "name": meta.get("name", ""),
+                "type": meta.get("type", ""),
+                "location": meta.get("location", ""),
+                "startDate": meta.get("startDate", ""),
+                "endDate": meta.get("endDate", ""),
+                "customSlug": meta.get("customSlug", ""),
+            }
+    return event_best
+
+
+def event_row(event_id: str, data: dict) -> dict:
+    return {
+        "id": event_id,
+        "name": data["name"],
+        "type": data["type"],
+        "location": data["location"],
+        "startDate": data["startDate"],
+        "endDate": data["endDate"],
+        "customSlug": data["customSlug"],
+        "micrositeUrl": f"/microsite/{data['customSlug']}" if data["customSlug"] else "",
+        "percentage_similarity": round(data["score"] * 100, 2),
+    }
+
+
+def rank_event_hits(search_results, top_k: int) -> List[dict]:
+    """Chunk hits -> the top_k events, each scored by its best chunk."""
+    # Sort by similarity and take top_k
+    sorted_events = sorted(
+        best_event_hits(search_results).items(),
+        key=lambda x: x[1]["score"],
+        reverse=True,
+    )[:top_k]
+    return [event_row(event_id, data) for event_id, data in sorted_events]
+
+
+async def _rerank(query: str, ranked: list) -> list:
+    """Cross-encoder re-order of (event_id, data) pairs; dense order when scores aren't ready."""
+    scores = await event_reranker.rerank(
+        query, [(event_id, data["text"]) for event_id, data in ranked], RERANK_BUDGET_S,
+    )
+    if scores is None:
+        return ranked
+    return sorted(ranked, key=lambda x: scores.get(x[0], float("-inf")), reverse=True)
+
+
+@router.post("/fetch", response_model=List[SimilarEvent])
+async def fetch_similar_events(
+    request: EventSearchRequest,
+    compact: bool = False,
+    fields: Optional[str] = None,
+):
     """
     Takes a natural language query, creates an embedding vector,
     and fetches the most similar public events from Qdrant.
+    Dates and cities named in the query restrict the results instead of
+    being embedded (`"filters": false` turns that off).  With reranking on
+    (EVENT_RERANK or `"rerank": true`) a cross-encoder re-orders the top
+    candidates within a latency budget.
+
+    `?compact=true` returns only id, customSlug and percentage_similarity;
+    `?fields=a,b` picks exact SimilarEvent fields.
     """
+    row_fields = parse_fields(fields, compact, SIMILAR_EVENT_FIELDS, COMPACT_SIMILAR_EVENT_FIELDS)
     try:
+        # Dates and cities become a filter; only the rest of the query is embedded
+        parsed = parse_query(request.query) if request.filters else ParsedQuery(text=request.query)
+        rerank = (RERANK_ENABLED if request.rerank is None else request.rerank) and event_reranker.available()
+        candidates = max(request.top_k, RERANK_CANDIDATES) if rerank else request.top_k
+
         # Embed the query text
-        embedding = OpenAIEmbeddings(model="text-embedding-3-large")
-        query_vector = await embedding.aembed_query(request.query)
-
-        # Search Qdrant (cloud)
-        url = os.getenv("QDRANT_URL")
-        api_key = os.getenv("QDRANT_API_KEY")
-        client = QdrantClient(url=url, api_key=api_key)
-
-        search_results = client.query_points(
-            collection_name="events_vectors",
-            query=query_vector,
-            limit=request.top_k * 10,  # fetch extra to deduplicate across chunks
-            with_payload=True,
-        ).points
-
-        # Aggregate by event id — keep max similarity and metadata per event
-        event_best = {}  # event_id -> { score, metadata }
-
-        for result in search_results:
-            meta = result.payload.get("metadata", {})
-            event_id = meta.get("id")
-            if not event_id:
-                continue
-
-            score = result.score
-            if event_id not in event_best or score > event_best[event_id]["score"]:
-                event_best[event_id] = {
-                    "score": score,
-                    "name": meta.get("name", ""),
-                    "type": meta.get("type", ""),
-                    "location": meta.get("location", ""),
-                    "startDate": meta.get("startDate", ""),
-                    "endDate": meta.get("endDate", ""),
-                    "customSlug": meta.get("customSlug", ""),
-                }
-
-        # Sort by similarity and take top_k
-        sorted_events = sorted(
-            event_best.items(),
-            key=lambda x: x[1]["score"],
-            reverse=True,
-        )[: request.top_k]
-
-        # Build response
-        similar_events = [
-            SimilarEvent(
-                id=event_id,
-                name=data["name"],
-                type=data["type"],
-                location=data["location"],
-                startDate=data["startDate"],
-                endDate=data["endDate"],
-                customSlug=data["customSlug"],
-                micrositeUrl=f"/microsite/{data['customSlug']}" if data["customSlug"] else "",
-                percentage_similarity=round(data["score"] * 100, 2),
-            )
-            for event_id, data in sorted_events
-        ]
-
-        return similar_events
+        embedding = get_embeddings(EMBEDDING_MODEL)
+        async with bulkhead(POOL_EMBEDDING):
+            with span("embedding", model=EMBEDDING_MODEL):
+                query_vector = await deadline.call(
+                    "embedding.event_search", lambda: embedding.aembed_query(parsed.text),
+                )
+
+        # Search Qdrant (cloud), or the in-process copy (utils/vector_store.py)
+        client = get_vector_store()
+
+        async with bulkhead(POOL_VECTOR_SEARCH):
+            with span("qdrant.events_vectors"):
+                search_results = (await deadline.call_sync(
+                    "qdrant.events_vectors",
+                    client.query_points,
+                    collection_name="events_vectors",
+                    query=query_vector,
+                    query_filter=constraint_filter(parsed),
+                    limit=candidates * OVERFETCH,
+                    with_payload=True,
+                )).points
+
+        if rerank:
+            ranked = sorted(best_event_hits(search_results).items(), key=lambda x: x[1]["score"], reverse=True)
+            ranked = await _rerank(parsed.text, ranked[:candidates])
+            similar_events = [event_row(event_id, data) for event_id, data in ranked[:request.top_k]]
+        else:
+            similar_events = rank_event_hits(search_results, request.top_k)
+        if row_fields is not None:
+            similar_events = [{k: e[k] for k in row_fields} for e in similar_events]
+
+        return ORJSONResponse(similar_events)
 
     except HTTPException:
         raise
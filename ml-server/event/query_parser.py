@@ -0,0 +1,230 @@
+"""
+Local event-query parser
+────────────────────────
+Pulls structured constraints out of an event search query before it is
+embedded.  It uses rules only and makes no LLM call.
+  • dates   "12/08/2027", "2027-08-12", "12 Aug 2027", "Aug 12, 2027",
+            "12-14 August 2027", "August 2027", joined into ranges by
+            "between A and|to B", "from A to|till B", "A - B"; a lone date
+            after "after/since/from" or "before/until/by" is open-ended
+  • cities  whole-word matches against the bundled cities.txt, aliases
+            included ("Bangalore" → "Bengaluru")
+
+The matched phrases, together with their leading "in", "between", "on", …,
+are cut from the text that gets embedded, so the vector describes what the
+event is about.  /event/fetch turns the constraints into a Qdrant filter.
+
+Numeric dates are read day-first (12/08/2027 is 12 August), unless only
+the month-first reading is valid.  Dates are calendar days in
+EVENT_QUERY_UTC_OFFSET_MINUTES (default 330, IST).
+"""
+
+import os
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+QUERY_TZ = timezone(timedelta(minutes=int(os.getenv("EVENT_QUERY_UTC_OFFSET_MINUTES", "330"))))
+
+_MONTHS = {
+    "january": 1, "february": 2, "march": 3, "april": 4, "may": 5, "june": 6, "july": 7,
+    "august": 8, "september": 9, "october": 10, "november": 11, "december": 12,
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "jun": 6, "jul": 7, "aug": 8,
+    "sep": 9, "sept": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+_MONTH = r"(" + "|".join(sorted(_MONTHS, key=len, reverse=True)) + r")\.?"
+_ORD = r"(?:st|nd|rd|th)?"
+_CONNECTOR = re.compile(r"\s*(?:and|to|till|until|through|thru|-|–)\s*$", re.IGNORECASE)
+_DATE_PREFIX = re.compile(
+    r"\b(between|from|after|since|starting|before|until|till|by|on|in|during)\s+$", re.IGNORECASE,
+)
+_CITY_PREFIX = re.compile(r"\b(?:in|at|near|around)\s+$", re.IGNORECASE)
+_OPEN_END = {"after", "since", "from", "starting"}
+_OPEN_START = {"before", "until", "till", "by"}
+
+
+@dataclass
+class ParsedQuery:
+    text: str                                        # what gets embedded
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    cities: list[str] = field(default_factory=list)  # canonical names
+
+    @property
+    def has_constraints(self) -> bool:
+        return bool(self.date_from or self.date_to or self.cities)
+
+    def window(self) -> tuple[Optional[datetime], Optional[datetime]]:
+        """The date range as aware datetimes: start of date_from, end of date_to."""
+        start = datetime.combine(self.date_from, datetime.min.time(), QUERY_TZ) if self.date_from else None
+        end = datetime.combine(self.date_to, datetime.max.time(), QUERY_TZ) if self.date_to else None
+        return start, end
+
+
+# ── Cities ─────────────────────────────────────────────────────────────
+
+def _load_cities(path: str) -> tuple[dict[str, str], dict[str, list[str]], int]:
+    lookup: dict[str, str] = {}  # lowercased name or alias -> canonical
+    names: dict[str, list[str]] = {}  # canonical -> [canonical, *aliases]
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            variants = [v.strip() for v in line.split("|") if v.strip()]
+            names[variants[0]] = variants
+            for v in variants:
+                lookup[v.lower()] = variants[0]
+    longest = max((len(k.split()) for k in lookup), default=1)
+    return lookup, names, longest
+
+
+_CITY_LOOKUP, _CITY_NAMES, _CITY_MAX_WORDS = _load_cities(os.path.join(os.path.dirname(__file__), "cities.txt"))
+
+
+def city_names(canonical: str) -> list[str]:
+    """Every spelling of a canonical city (used to match event locations)."""
+    return _CITY_NAMES.get(canonical, [canonical])
+
+
+def _find_cities(query: str, taken: list[tuple[int, int]]) -> list[tuple[int, int, str]]:
+    words = list(re.finditer(r"[A-Za-z]+", query))
+    found, i = [], 0
+    while i < len(words):
+        for n in range(min(_CITY_MAX_WORDS, len(words) - i), 0, -1):
+            group = words[i:i + n]
+            if any(not query[a.end():b.start()].isspace() for a, b in zip(group, group[1:])):
+                continue
+            canonical = _CITY_LOOKUP.get(" ".join(w.group().lower() for w in group))
+            start, end = group[0].start(), group[-1].end()
+            if canonical and not any(s < end and start < e for s, e in taken):
+                found.append((start, end, canonical))
+                i += n
+                break
+        else:
+            i += 1
+    return found
+
+
+# ── Dates ──────────────────────────────────────────────────────────────
+
+def _year(raw: str) -> int:
+    y = int(raw)
+    return y + 2000 if y < 100 else y
+
+
+def _numeric(a: str, b: str, y: str) -> date:
+    first, second = int(a), int(b)
+    try:
+        return date(_year(y), second, first)  # day-first
+    except ValueError:
+        return date(_year(y), first, second)
+
+
+def _month_span(month: str, year: str) -> tuple[date, date]:
+    m, y = _MONTHS[month.lower()], int(year)
+    last = (date(y + m // 12, m % 12 + 1, 1) - timedelta(days=1))
+    return date(y, m, 1), last
+
+
+_DATE_PATTERNS = [
+    # 12-14 August 2027, 12th to 14th of Aug 2027
+    (re.compile(rf"\b(\d{{1,2}}){_ORD}\s*(?:-|–|to|and|till|until)\s*(\d{{1,2}}){_ORD}\s+(?:of\s+)?{_MONTH},?\s+(\d{{4}})\b", re.I),
+     lambda g: (date(int(g[3]), _MONTHS[g[2].lower()], int(g[0])), date(int(g[3]), _MONTHS[g[2].lower()], int(g[1])))),
+    # 2027-08-12
+    (re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b"),
+     lambda g: (date(int(g[0]), int(g[1]), int(g[2])),) * 2),
+    # 12/08/2027, 12.08.27, 12-08-2027
+    (re.compile(r"\b(\d{1,2})[/.-](\d{1,2})[/.-](\d{4}|\d{2})\b"),
+     lambda g: (_numeric(*g),) * 2),
+    # 12 Aug 2027, 12th of August, 2027
+    (re.compile(rf"\b(\d{{1,2}}){_ORD}\s+(?:of\s+)?{_MONTH},?\s+(\d{{4}})\b", re.I),
+     lambda g: (date(int(g[2]), _MONTHS[g[1].lower()], int(g[0])),) * 2),
+    # Aug 12, 2027
+    (re.compile(rf"\b{_MONTH}\s+(\d{{1,2}}){_ORD},?\s+(\d{{4}})\b", re.I),
+     lambda g: (date(int(g[2]), _MONTHS[g[0].lower()], int(g[1])),) * 2),
+    # August 2027
+    (re.compile(rf"\b{_MONTH},?\s+(\d{{4}})\b", re.I),
+     lambda g: _month_span(g[0], g[1])),
+]
+
+
+def _find_dates(query: str) -> list[tuple[int, int, date, date]]:
+    """Non-overlapping date mentions, leftmost-longest first."""
+    candidates = []
+    for pattern, convert in _DATE_PATTERNS:
+        for m in pattern.finditer(query):
+            try:
+                first, last = convert(m.groups())
+            except ValueError:  # 31/02/2027 and friends
+                continue
+            if first <= last:
+                candidates.append((m.start(), m.end(), first, last))
+    candidates.sort(key=lambda c: (c[0], -c[1]))
+    found, end = [], -1
+    for c in candidates:
+        if c[0] >= end:
+            found.append(c)
+            end = c[1]
+    return found
+
+
+def _date_constraints(query: str, mentions: list) -> tuple[Optional[date], Optional[date], list[tuple[int, int]]]:
+    ranges, spans, i = [], [], 0
+    while i < len(mentions):
+        start, end, first, last = mentions[i]
+        prefix = _DATE_PREFIX.search(query, spans[-1][1] if spans else 0, start)
+        word = prefix.group(1).lower() if prefix else ""
+        span_start = prefix.start() if prefix else start
+        nxt = mentions[i + 1] if i + 1 < len(mentions) else None
+        if nxt and _CONNECTOR.match(query, end, nxt[0]):
+            ranges.append((first, nxt[3]))
+            spans.append((span_start, nxt[1]))
+            i += 2
+            continue
+        if word in _OPEN_END:
+            ranges.append((first, None))
+        elif word in _OPEN_START:
+            ranges.append((None, last))
+        else:
+            ranges.append((first, last))
+        spans.append((span_start, end))
+        i += 1
+    if not ranges:
+        return None, None, spans
+    starts = [r[0] for r in ranges]
+    ends = [r[1] for r in ranges]
+    date_from = None if None in starts else min(starts)
+    date_to = None if None in ends else max(ends)
+    return date_from, date_to, spans
+
+
+# ── Parse ──────────────────────────────────────────────────────────────
+
+def _strip(query: str, spans: list[tuple[int, int]]) -> str:
+    pieces, pos = [], 0
+    for start, end in sorted(spans):
+        if start > pos:
+            pieces.append(query[pos:start])
+        pos = max(pos, end)
+    pieces.append(query[pos:])
+    text = " ".join("".join(pieces).split())
+    text = re.sub(r"\s+([,.;:!?])", r"\1", text)
+    text = re.sub(r"(?:[\s,;:–-]+|\b(?:and|or|in|on|at|between|from|to)\b)+$", "", text, flags=re.IGNORECASE)
+    return text.strip(" ,;:-–")
+
+
+def parse_query(query: str) -> ParsedQuery:
+    """Split *query* into semantic text plus date range and city constraints."""
+    date_from, date_to, spans = _date_constraints(query, _find_dates(query))
+    cities = []
+    for start, end, canonical in _find_cities(query, spans):
+        prefix = _CITY_PREFIX.search(query, 0, start)
+        spans.append((prefix.start() if prefix else start, end))
+        if canonical not in cities:
+            cities.append(canonical)
+    if not spans:
+        return ParsedQuery(text=query)
+    text = _strip(query, spans)
+    return ParsedQuery(text=text or query, date_from=date_from, date_to=date_to, cities=cities)
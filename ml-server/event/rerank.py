@@ -0,0 +1,238 @@
+"""
+Cross-encoder rerank for /event/fetch
+─────────────────────────────────────
+Dense search orders events by their best chunk's cosine similarity.  With
+EVENT_RERANK=1 a second stage re-orders the top EVENT_RERANK_CANDIDATES
+distinct events.  A small local cross-encoder (sentence-transformers,
+EVENT_RERANK_MODEL, on CPU) scores each (query, best chunk) pair.
+
+  • batched, thread-pooled  pairs go in EVENT_RERANK_BATCH-sized batches
+                            to EVENT_RERANK_THREADS worker threads
+  • budgeted                the request waits at most EVENT_RERANK_BUDGET_MS,
+                            clipped to its deadline.  Batches that finish
+                            late still fill the cache, and the response
+                            keeps the dense order
+  • cached                  scores are kept per (query hash, event id), and
+                            an event's scores are dropped when it is
+                            re-embedded (on every worker, see
+                            utils/invalidation.py)
+  • bounded                 with EVENT_RERANK_MAX_PENDING batches already
+                            queued the stage is skipped, not queued behind
+                            the backlog
+
+sentence-transformers is optional.  Without it, or without EVENT_RERANK,
+/event/fetch returns the dense order as before.  percentage_similarity
+stays the cosine score; only the order changes.
+"""
+
+import asyncio
+import hashlib
+import importlib.util
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional, Sequence
+
+from prometheus_client import Counter
+
+from utils import deadline
+from utils.invalidation import invalidations
+from utils.metrics import span
+
+logger = logging.getLogger("event.rerank")
+
+RERANK_ENABLED = os.getenv("EVENT_RERANK", "0") == "1"
+RERANK_MODEL = os.getenv("EVENT_RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("EVENT_RERANK_CANDIDATES", "20"))
+RERANK_BUDGET_S = float(os.getenv("EVENT_RERANK_BUDGET_MS", "300")) / 1000
+RERANK_THREADS = int(os.getenv("EVENT_RERANK_THREADS", "2"))
+RERANK_BATCH = int(os.getenv("EVENT_RERANK_BATCH", "16"))
+RERANK_MAX_PENDING = int(os.getenv("EVENT_RERANK_MAX_PENDING", "32"))
+# Characters of the best chunk sent with the query (the model truncates at 512 tokens anyway)
+MAX_PASSAGE_CHARS = 1200
+
+RERANKS = Counter(
+    "mlserver_event_rerank_total",
+    "Event rerank attempts by outcome (cached, scored, timeout, busy, error)",
+    ["outcome"],
+)
+
+
+class RerankScoreCache:
+    """LRU + TTL of cross-encoder scores keyed by (query hash, event id)."""
+
+    def __init__(self, max_entries: int = 8192, ttl_seconds: float = 3600, name: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.name = name  # publishes / receives cross-worker invalidations under this name
+        self._entries: OrderedDict[tuple[str, str], tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        if name:
+            invalidations.subscribe(name, self._apply)
+
+    def get_many(self, query_key: str, event_ids: Iterable[str]) -> dict[str, float]:
+        invalidations.poll()
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for event_id in event_ids:
+                key = (query_key, event_id)
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if now - entry[0] > self.ttl_seconds:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[event_id] = entry[1]
+        return found
+
+    def put_many(self, query_key: str, scores: dict[str, float]):
+        now = time.monotonic()
+        with self._lock:
+            for event_id, score in scores.items():
+                self._entries[(query_key, event_id)] = (now, score)
+                self._entries.move_to_end((query_key, event_id))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _apply(self, op: str, keys: list):
+        ids = set(keys)
+        with self._lock:
+            if op == "clear":
+                self._entries.clear()
+            elif op == "events":
+                for key in [k for k in self._entries if k[1] in ids]:
+                    del self._entries[key]
+
+    def _invalidate(self, op: str, keys: Iterable[str] = ()):
+        keys = list(keys)
+        if self.name:
+            invalidations.publish(self.name, op, keys)
+        self._apply(op, keys)
+
+    def invalidate_events(self, event_ids: Iterable[str]):
+        self._invalidate("events", event_ids)
+
+    def clear(self):
+        self._invalidate("clear")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class CrossEncoderReranker:
+    def __init__(self, model_name: str, threads: int, batch_size: int, max_pending: int):
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        self.max_pending = max_pending
+        self.cache = RerankScoreCache(
+            max_entries=int(os.getenv("EVENT_RERANK_CACHE_SIZE", "8192")),
+            ttl_seconds=float(os.getenv("EVENT_RERANK_CACHE_TTL_SECONDS", "3600")),
+            name="event.rerank_cache",
+        )
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, threads), thread_name_prefix="rerank")
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+
+    # ── Model ─────────────────────────────────────────────────────────
+
+    def available(self) -> bool:
+        return self._model is not None or importlib.util.find_spec("sentence_transformers") is not None
+
+    def set_model(self, model):
+        """Install a model exposing CrossEncoder.predict (benchmarks / stand-ins)."""
+        self._model = model
+
+    def load(self):
+        """Load the cross-encoder (blocking; warm-up calls this in a thread)."""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name, device="cpu")
+                    logger.info(f"✅ Loaded rerank model {self.model_name}")
+        return self._model
+
+    # ── Scoring ───────────────────────────────────────────────────────
+
+    def query_key(self, query: str) -> str:
+        normalized = " ".join(query.lower().split())
+        return hashlib.blake2b(f"{self.model_name}\x00{normalized}".encode("utf-8"), digest_size=16).hexdigest()
+
+    def _score_batch(self, query_key: str, query: str, batch: Sequence[tuple[str, str]]) -> dict[str, float]:
+        try:
+            model = self.load()
+            with span("rerank.cross_encoder"):
+                raw = model.predict(
+                    [(query, text[:MAX_PASSAGE_CHARS]) for _, text in batch],
+                    batch_size=len(batch), show_progress_bar=False,
+                )
+            scores = {event_id: float(s) for (event_id, _), s in zip(batch, raw)}
+            self.cache.put_many(query_key, scores)
+            return scores
+        finally:
+            with self._pending_lock:
+                self._pending -= 1
+
+    def _batches(self, items: Sequence[tuple[str, str]]) -> list[Sequence[tuple[str, str]]]:
+        return [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+
+    def score(self, query: str, items: Sequence[tuple[str, str]]) -> dict[str, float]:
+        """Blocking, unbudgeted scores for (event id, passage) items (offline evaluation)."""
+        key = self.query_key(query)
+        scores = self.cache.get_many(key, [event_id for event_id, _ in items])
+        missing = [item for item in items if item[0] not in scores]
+        for batch in self._batches(missing):
+            with self._pending_lock:
+                self._pending += 1
+            scores.update(self._score_batch(key, query, batch))
+        return scores
+
+    async def rerank(
+        self, query: str, items: Sequence[tuple[str, str]], budget_s: float,
+    ) -> Optional[dict[str, float]]:
+        """
+        Cross-encoder scores for (event id, passage) items, or None when they
+        aren't all ready within the budget (the caller keeps dense order).
+        """
+        key = self.query_key(query)
+        scores = self.cache.get_many(key, [event_id for event_id, _ in items])
+        missing = [item for item in items if item[0] not in scores]
+        if not missing:
+            RERANKS.labels("cached").inc()
+            return scores
+
+        batches = self._batches(missing)
+        with self._pending_lock:
+            if self._pending + len(batches) > self.max_pending:
+                RERANKS.labels("busy").inc()
+                return None
+            self._pending += len(batches)
+        futures = [asyncio.wrap_future(self._pool.submit(self._score_batch, key, query, b)) for b in batches]
+        for future in futures:  # retrieve late failures so asyncio doesn't warn about them
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+        left = deadline.remaining()
+        if left is not None:
+            budget_s = min(budget_s, max(0.0, left * 0.8))
+        done, pending = await asyncio.wait(futures, timeout=budget_s)
+        if pending:
+            RERANKS.labels("timeout").inc()
+            return None
+        for future in done:
+            if future.exception() is not None:
+                RERANKS.labels("error").inc()
+                logger.warning(f"⚠️  Event rerank failed: {future.exception()}")
+                return None
+            scores.update(future.result())
+        RERANKS.labels("scored").inc()
+        return scores
+
+
+event_reranker = CrossEncoderReranker(RERANK_MODEL, RERANK_THREADS, RERANK_BATCH, RERANK_MAX_PENDING)
@@ -0,0 +1,454 @@
+"""
+Hotel activity vectors
+──────────────────────
+Builds the vectors Mode A of /hotel/recommend scores hotels against, from
+HotelActivity records (one per hotel × event, same fields as the backend's
+Mongo model):
+
+  • hotels_activity_points     one point per activity, id = uuid5(hotel:event),
+                               payload {hotelId, eventId, eventType, ...}
+  • hotels_activity_centroids  one point per hotel, id = objectIdToUUID(hotel),
+                               the mean of its activity vectors,
+                               payload {hotelId, count}
+
+Ingest embeds records in batches, upserts the points and updates each
+touched hotel's centroid as a running mean
+
+      mean' = (mean · n + Σ added − Σ replaced) / n'
+
+so only the current centroid and the points being replaced are read back.
+The new centroids are written first, flagged `pending`, then the points,
+then the flag is cleared: a retry after a failure in between finds the flag
+and recomputes that hotel's centroid from its points instead of folding the
+same points in twice.  Ingests (and rebuilds) hold an exclusive flock under
+ML_SHARED_DIR, so workers and the CLI on one host never interleave their
+read-modify-write.
+The centroid collection uses dot-product distance and stores the raw mean:
+for unit query and activity vectors q·mean is exactly the average cosine
+similarity over the hotel's activities (a cosine collection would normalise
+the stored vector and lose the mean).  `rebuild_centroids` recomputes them
+all from the points, e.g. after float32 drift or a manual edit.
+
+Mode A queries the centroids restricted to the candidate ids — one point per
+hotel — and scores candidates that have no centroid (the backend still
+writes live activity only to hotels_activity_vectors) against their
+hotels_activity_vectors point.
+
+  POST /hotel/activity/ingest   {"activities": [HotelActivity, ...]}
+  python -m hotel.activity_index activities.jsonl [--rebuild]
+"""
+
+import asyncio
+import fcntl
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import List, Optional, Sequence
+
+import numpy as np
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+
+from utils import vector_store
+from utils.clients import get_embeddings, get_qdrant_client
+from utils.metrics import span
+from utils.shared_arrays import shared_dir
+
+router = APIRouter()
+logger = logging.getLogger("hotel_activity")
+
+# Must match the model _similarity_scores embeds the event with
+EMBEDDING_MODEL = "text-embedding-3-small"
+POINTS_COLLECTION = os.getenv("HOTEL_ACTIVITY_POINTS_COLLECTION", "hotels_activity_points")
+CENTROIDS_COLLECTION = os.getenv("HOTEL_ACTIVITY_CENTROIDS_COLLECTION", "hotels_activity_centroids")
+EMBED_BATCH_SIZE = int(os.getenv("HOTEL_ACTIVITY_EMBED_BATCH", "256"))
+UPSERT_BATCH_SIZE = 512
+MAX_ACTIVITIES_PER_REQUEST = 10_000
+
+_POINT_NAMESPACE = uuid.UUID("5b0c3f4e-8f8e-4d55-9d0f-2a7c1f6b3e21")
+_OBJECT_ID = re.compile(r"^[0-9a-fA-F]{1,32}$")
+
+
+def object_id_to_uuid(object_id: str) -> str:
+    """Mirror the Node.js objectIdToUUID conversion."""
+    hex_id = object_id.ljust(32, "0")
+    return f"{hex_id[:8]}-{hex_id[8:12]}-{hex_id[12:16]}-{hex_id[16:20]}-{hex_id[20:32]}"
+
+
+def is_object_id(value: str) -> bool:
+    return bool(_OBJECT_ID.match(value))
+
+
+def activity_point_id(hotel_id: str, event_id: str) -> str:
+    return str(uuid.uuid5(_POINT_NAMESPACE, f"{hotel_id}:{event_id}"))
+
+
+# ──────────────────────────────────────────────
+# Pydantic Models
+# ──────────────────────────────────────────────
+
+class ActivityLocation(BaseModel):
+    city: str = ""
+    country: str = ""
+
+
+class HotelActivity(BaseModel):
+    hotel: str
+    event: str
+    eventType: str = ""
+    eventName: str = ""
+    eventScale: str = "small"
+    eventLocation: ActivityLocation = Field(default_factory=ActivityLocation)
+    eventDate: Optional[str] = None
+    outcome: str = "selected"
+    bookingsCount: int = 0
+
+
+class ActivityIngestRequest(BaseModel):
+    activities: List[HotelActivity] = Field(..., min_length=1, max_length=MAX_ACTIVITIES_PER_REQUEST)
+
+
+class ActivityIngestResponse(BaseModel):
+    status: str
+    activities: int
+    points_added: int
+    points_replaced: int
+    hotels_updated: int
+    embedding_batches: int
+
+
+# ──────────────────────────────────────────────
+# Centroid availability (read by Mode A)
+# ──────────────────────────────────────────────
+
+_AVAILABILITY_TTL_S = 60.0
+_availability: dict[int, tuple[float, bool]] = {}
+_availability_lock = threading.Lock()
+
+
+async def centroids_available(client) -> bool:
+    """Whether the centroid collection exists (checked at most once a minute per client, off the loop)."""
+    now = time.monotonic()
+    cached = _availability.get(id(client))
+    if cached is not None and now - cached[0] < _AVAILABILITY_TTL_S:
+        return cached[1]
+    try:
+        exists = bool(await asyncio.to_thread(client.collection_exists, CENTROIDS_COLLECTION))
+    except Exception as e:
+        logger.warning(f"⚠️  Could not check {CENTROIDS_COLLECTION}: {e}")
+        exists = False
+    with _availability_lock:
+        _availability[id(client)] = (now, exists)
+    return exists
+
+
+def _mark_available(client):
+    with _availability_lock:
+        _availability[id(client)] = (time.monotonic(), True)
+
+
+# ──────────────────────────────────────────────
+# Embedding
+# ──────────────────────────────────────────────
+
+def activity_text(activity: HotelActivity) -> str:
+    """Text embedded per activity — phrased like the event text Mode A queries with."""
+    location = ", ".join(p for p in (activity.eventLocation.city, activity.eventLocation.country) if p)
+    return (
+        f"Event Name: {activity.eventName or 'Event'}. "
+        f"Type: {activity.eventType or 'general'}. "
+        f"Scale: {activity.eventScale}. "
+        f"Location: {location or 'Not specified'}. "
+        f"Outcome: {activity.outcome}."
+    )
+
+
+async def embed_activities(activities: Sequence[HotelActivity]) -> tuple[np.ndarray, int]:
+    """Embed in batches of EMBED_BATCH_SIZE → (unit vectors, batch count)."""
+    model = get_embeddings(EMBEDDING_MODEL)
+    texts = [activity_text(a) for a in activities]
+    vectors: list[list[float]] = []
+    batches = 0
+    for start in range(0, len(texts), EMBED_BATCH_SIZE):
+        with span("embedding.activity_batch", model=EMBEDDING_MODEL):
+            vectors.extend(await model.aembed_documents(texts[start:start + EMBED_BATCH_SIZE]))
+        batches += 1
+    matrix = np.asarray(vectors, dtype=np.float64)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1.0), batches
+
+
+# ──────────────────────────────────────────────
+# Qdrant writes
+# ──────────────────────────────────────────────
+
+def _ensure_collections(client, dim: int):
+    from qdrant_client import models
+
+    for name, distance in (
+        (POINTS_COLLECTION, models.Distance.COSINE),
+        (CENTROIDS_COLLECTION, models.Distance.DOT),
+    ):
+        if not client.collection_exists(name):
+            client.create_collection(name, vectors_config=models.VectorParams(size=dim, distance=distance))
+            if name == POINTS_COLLECTION:
+                client.create_payload_index(name, "hotelId", models.PayloadSchemaType.KEYWORD)
+            logger.info(f"✅ Created collection '{name}' ({dim}-d, {distance.value})")
+
+
+def _upsert(client, collection: str, points: list):
+    for start in range(0, len(points), UPSERT_BATCH_SIZE):
+        client.upsert(collection, points=points[start:start + UPSERT_BATCH_SIZE], wait=True)
+    vector_store.record_points(collection, points)  # the in-process copy, if it holds the collection
+
+
+def _retrieve(client, collection: str, ids: list[str]) -> list:
+    found = []
+    for start in range(0, len(ids), UPSERT_BATCH_SIZE):
+        found.extend(client.retrieve(
+            collection, ids=ids[start:start + UPSERT_BATCH_SIZE], with_payload=True, with_vectors=True,
+        ))
+    return found
+
+
+def _centroid_point(hotel_id: str, mean: np.ndarray, count: int, pending: bool = False):
+    from qdrant_client import models
+
+    payload = {"hotelId": hotel_id, "count": count, "updatedAt": time.time()}
+    if pending:
+        payload["pending"] = True
+    return models.PointStruct(id=object_id_to_uuid(hotel_id), vector=mean.tolist(), payload=payload)
+
+
+def _sum_points(client, hotel_ids: Optional[list[str]] = None, page_size: int = 1024):
+    """Σ vectors and point count per hotel over hotels_activity_points (all hotels, or *hotel_ids*)."""
+    from qdrant_client import models
+
+    query_filter = None
+    if hotel_ids is not None:
+        query_filter = models.Filter(must=[
+            models.FieldCondition(key="hotelId", match=models.MatchAny(any=hotel_ids)),
+        ])
+    sums: dict[str, np.ndarray] = {}
+    counts: dict[str, int] = {}
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            POINTS_COLLECTION, scroll_filter=query_filter, limit=page_size, offset=offset,
+            with_payload=["hotelId"], with_vectors=True,
+        )
+        for p in points:
+            hotel_id = p.payload["hotelId"]
+            vector = np.asarray(p.vector, dtype=np.float64)
+            sums[hotel_id] = sums[hotel_id] + vector if hotel_id in sums else vector
+            counts[hotel_id] = counts.get(hotel_id, 0) + 1
+        if offset is None:
+            return sums, counts
+
+
+def _clear_similarity_cache():
+    """Mode A's cached scores and rankings were computed against the old centroids."""
+    from hotel.precompute import PRECOMPUTE_ENABLED, precompute_queue
+    from hotel.recommendation import similarity_cache
+    from hotel.response_cache import response_cache
+
+    similarity_cache.clear()
+    response_cache.clear()
+    if PRECOMPUTE_ENABLED:
+        precompute_queue.requeue_all("hotel activity changed")
+
+
+@contextmanager
+def _ingest_lock():
+    """One centroid read-modify-write at a time across threads, workers and the CLI."""
+    root = shared_dir()
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, "activity_ingest.lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _ingest_locked(client, records: list[HotelActivity], vectors: np.ndarray) -> tuple[int, int]:
+    """Write the points and fold them into the centroids → (points replaced, hotels updated)."""
+    from qdrant_client import models
+
+    with _ingest_lock(), span("activity.ingest", activities=len(records)):
+        _ensure_collections(client, vectors.shape[1])
+
+        point_ids = [activity_point_id(a.hotel, a.event) for a in records]
+        previous = {str(p.id): p for p in _retrieve(client, POINTS_COLLECTION, point_ids)}
+
+        # Per-hotel change to Σ vectors and to the point count
+        sums: dict[str, np.ndarray] = {}
+        counts: dict[str, int] = {}
+        points = []
+        for activity, point_id, vector in zip(records, point_ids, vectors):
+            delta = vector
+            old = previous.get(point_id)
+            if old is not None:
+                delta = vector - np.asarray(old.vector, dtype=np.float64)
+            else:
+                counts[activity.hotel] = counts.get(activity.hotel, 0) + 1
+            sums[activity.hotel] = sums[activity.hotel] + delta if activity.hotel in sums else delta.copy()
+            counts.setdefault(activity.hotel, 0)
+            points.append(models.PointStruct(
+                id=point_id,
+                vector=vector.tolist(),
+                payload={
+                    "hotelId": activity.hotel,
+                    "eventId": activity.event,
+                    "eventType": activity.eventType,
+                    "eventName": activity.eventName,
+                    "city": activity.eventLocation.city,
+                    "country": activity.eventLocation.country,
+                    "eventDate": activity.eventDate,
+                    "outcome": activity.outcome,
+                },
+            ))
+
+        hotel_ids = list(sums)
+        current = {
+            p.payload["hotelId"]: p
+            for p in _retrieve(client, CENTROIDS_COLLECTION, [object_id_to_uuid(h) for h in hotel_ids])
+        }
+        # A pending centroid is left over from an ingest that failed before its
+        # points landed; its running mean can't be trusted, so it's recomputed
+        stale = [h for h in hotel_ids if h in current and current[h].payload.get("pending")]
+        centroids = []
+        for hotel_id in hotel_ids:
+            if hotel_id in stale:
+                continue
+            old = current.get(hotel_id)
+            n = int(old.payload.get("count", 0)) if old is not None else 0
+            total = sums[hotel_id]
+            if n:
+                total = total + n * np.asarray(old.vector, dtype=np.float64)
+            count = n + counts[hotel_id]
+            centroids.append((hotel_id, total / count, count))
+
+        _upsert(client, CENTROIDS_COLLECTION, [_centroid_point(h, mean, n, pending=True) for h, mean, n in centroids])
+        _upsert(client, POINTS_COLLECTION, points)
+        if stale:
+            stale_sums, stale_counts = _sum_points(client, stale)
+            centroids.extend((h, stale_sums[h] / stale_counts[h], stale_counts[h]) for h in stale_sums)
+            logger.info(f"🔁 Recomputed {len(stale_sums)} pending hotel centroids from their points")
+        _upsert(client, CENTROIDS_COLLECTION, [_centroid_point(h, mean, n) for h, mean, n in centroids])
+    return len(previous), len(hotel_ids)
+
+
+async def ingest_activities(activities: Sequence[HotelActivity]) -> ActivityIngestResponse:
+    """Embed + upsert activity points and fold them into the per-hotel centroids."""
+    latest: dict[tuple[str, str], HotelActivity] = {}
+    for activity in activities:
+        if not is_object_id(activity.hotel):
+            raise ValueError(f"hotel '{activity.hotel}' is not an ObjectId")
+        latest[(activity.hotel, activity.event)] = activity  # last record for a pair wins
+    records = list(latest.values())
+
+    vectors, batches = await embed_activities(records)
+    client = get_qdrant_client()
+    replaced, hotels_updated = await asyncio.to_thread(_ingest_locked, client, records, vectors)
+
+    _mark_available(client)
+    await asyncio.to_thread(_clear_similarity_cache)
+    logger.info(
+        f"✅ Ingested {len(records)} activities ({replaced} replaced) "
+        f"→ {hotels_updated} hotel centroids, {batches} embedding batches"
+    )
+    return ActivityIngestResponse(
+        status="success",
+        activities=len(records),
+        points_added=len(records) - replaced,
+        points_replaced=replaced,
+        hotels_updated=hotels_updated,
+        embedding_batches=batches,
+    )
+
+
+def rebuild_centroids(page_size: int = 1024) -> int:
+    """Recompute every centroid from hotels_activity_points; returns the hotel count."""
+    client = get_qdrant_client()
+    with _ingest_lock(), span("activity.rebuild_centroids"):
+        sums, counts = _sum_points(client, page_size=page_size)
+        _upsert(client, CENTROIDS_COLLECTION, [
+            _centroid_point(hotel_id, sums[hotel_id] / counts[hotel_id], counts[hotel_id]) for hotel_id in sums
+        ])
+    _mark_available(client)
+    _clear_similarity_cache()
+    return len(sums)
+
+
+# ──────────────────────────────────────────────
+# Endpoint
+# ──────────────────────────────────────────────
+
+@router.post("/activity/ingest", response_model=ActivityIngestResponse)
+async def ingest_hotel_activity(request: ActivityIngestRequest):
+    """Bulk-ingest HotelActivity records into the activity points + hotel centroids."""
+    try:
+        return await ingest_activities(request.activities)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error(f"Hotel activity ingest error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ──────────────────────────────────────────────
+# CLI
+# ──────────────────────────────────────────────
+
+def _read_activities(path: str) -> list[HotelActivity]:
+    import json
+
+    with open(path) as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        rows = json.loads(text)
+    else:
+        rows = [json.loads(line) for line in text.splitlines() if line.strip()]
+    return [HotelActivity.model_validate(row) for row in rows]
+
+
+def main():
+    import argparse
+
+    from dotenv import load_dotenv
+
+    from utils.log import configure_logging
+
+    parser = argparse.ArgumentParser(
+        description="Ingest HotelActivity records (JSON array or JSON lines) into Qdrant.",
+    )
+    parser.add_argument("path", nargs="?", help="Activities file; omit with --rebuild to only rebuild")
+    parser.add_argument("--chunk", type=int, default=2000, help="Records per ingest call")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute all centroids from the points")
+    args = parser.parse_args()
+    if not args.path and not args.rebuild:
+        parser.error("give an activities file and/or --rebuild")
+
+    load_dotenv()
+    configure_logging()
+
+    if args.path:
+        activities = _read_activities(args.path)
+
+        async def ingest_all():
+            for start in range(0, len(activities), args.chunk):
+                result = await ingest_activities(activities[start:start + args.chunk])
+                print(result.model_dump_json())
+
+        asyncio.run(ingest_all())
+    if args.rebuild:
+        print(f"Rebuilt {rebuild_centroids()} hotel centroids")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+"""
+Capacity-aware multi-hotel allocation
+─────────────────────────────────────
+POST /hotel/allocate picks a compact set of in-radius hotels that together
+provide the rooms a group needs, instead of one best hotel plus a
+distance-ordered list the planner has to hand-pick from.
+
+Objective (lower is better, in km):
+
+      max_distance · max pairwise distance between chosen hotels
+    + avg_distance · mean pairwise distance
+    + Σ chosen     ( hotel_penalty_km + similarity · (1 − similarity_score) )
+
+The per-hotel term keeps the set small and prefers hotels that hosted
+similar events.  Solver:
+
+  1. Distance rows come from a vectorised great-circle distance (unit
+     vectors + one mat-vec per hotel), cached per hotel.
+  2. Greedy from a handful of seeds (most similar, most rooms, nearest to
+     the event, taken round-robin): repeatedly add the hotel with the
+     lowest marginal cost per newly covered room until the rooms are
+     covered.  New seeds stop once GREEDY_BUDGET_S is spent; the first
+     always runs, so there is always an answer.
+  3. Local search on the best few greedy sets: drop redundant hotels and
+     swap a member for one of the nearest non-members while the objective
+     improves, until SOLVE_BUDGET_S (measured from the start of the solve)
+     runs out.
+
+For 5k candidates: ≈ 10 ms when a couple of hotels cover the group, up to
+≈ 45 ms when capacity is short and the set grows to max_hotels.  A single
+greedy run is not interrupted, so very large max_hotels can exceed that.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, Field
+
+from hotel.recommendation import (
+    EventInput,
+    HotelInput,
+    _coords_valid,
+    _geocode_and_filter,
+    _similarity_within_budget,
+    haversine,
+)
+from utils.metrics import span
+
+router = APIRouter()
+logger = logging.getLogger("hotel_allocation")
+
+EARTH_RADIUS_KM = 6371.0
+SEEDS_PER_CRITERION = 6
+LOCAL_SEARCH_STARTS = 3
+SWAP_POOL = 64
+GREEDY_BUDGET_S = 0.015
+SOLVE_BUDGET_S = 0.040
+
+
+# ──────────────────────────────────────────────
+# Pydantic Models
+# ──────────────────────────────────────────────
+
+class AllocationWeights(BaseModel):
+    max_distance: float = Field(default=1.0, ge=0, description="Weight of the max pairwise distance (km)")
+    avg_distance: float = Field(default=1.0, ge=0, description="Weight of the mean pairwise distance (km)")
+    similarity: float = Field(default=2.0, ge=0, description="km-equivalent cost of a hotel with zero similarity")
+    hotel_penalty_km: float = Field(default=0.25, ge=0, description="Cost per extra hotel in the set")
+
+
+class AllocationRequest(BaseModel):
+    event: EventInput
+    hotels: List[HotelInput]
+    guest_count: int = Field(gt=0, description="Guests to house")
+    guests_per_room: float = Field(default=1.0, gt=0)
+    radius_km: float = Field(default=5.0, description="Radius in km to filter candidate hotels")
+    max_hotels: int = Field(default=20, ge=1, description="Upper bound on hotels in the set")
+    use_similarity: bool = Field(default=True, description="Score hotels against the event via Qdrant")
+    weights: AllocationWeights = AllocationWeights()
+
+
+class AllocatedHotel(BaseModel):
+    hotel_id: str
+    hotel_name: str
+    rank: int
+    rooms_available: int
+    rooms_assigned: int
+    similarity_score: float
+    distance_from_event_km: float
+    max_distance_to_group_km: float
+
+
+class AllocationResponse(BaseModel):
+    status: str  # "success" | "partial" (capacity within radius / max_hotels is short)
+    rooms_required: int
+    rooms_allocated: int
+    allocations: List[AllocatedHotel]
+    max_distance_km: float
+    avg_distance_km: float
+    hotels_within_radius: int
+    total_candidates: int
+    solve_ms: float
+
+
+# ──────────────────────────────────────────────
+# Solver
+# ──────────────────────────────────────────────
+
+def unit_vectors(lat: np.ndarray, lng: np.ndarray) -> np.ndarray:
+    """(N, 3) points on the unit sphere."""
+    phi = np.radians(lat)
+    lam = np.radians(lng)
+    cos_phi = np.cos(phi)
+    return np.column_stack((cos_phi * np.cos(lam), cos_phi * np.sin(lam), np.sin(phi)))
+
+
+@dataclass
+class AllocationResult:
+    members: List[int]   # indices into the solver arrays, in assignment order
+    assigned: List[int]  # rooms assigned per member
+    covered: int
+    cost: float
+
+
+class AllocationSolver:
+    def __init__(
+        self,
+        lat: np.ndarray,
+        lng: np.ndarray,
+        rooms: np.ndarray,
+        similarity: np.ndarray,
+        required: int,
+        max_hotels: int,
+        weights: AllocationWeights,
+    ):
+        self.points = unit_vectors(lat, lng)
+        self.rooms = rooms.astype(np.int64)
+        self.required = required
+        self.max_hotels = max_hotels
+        self.w_max = weights.max_distance
+        self.w_avg = weights.avg_distance
+        self.hotel_cost = weights.hotel_penalty_km + weights.similarity * (1.0 - np.clip(similarity, 0.0, 1.0))
+        self._rows: dict[int, np.ndarray] = {}
+
+    def row(self, i: int) -> np.ndarray:
+        """Great-circle km from hotel i to every candidate."""
+        row = self._rows.get(i)
+        if row is None:
+            dots = np.clip(self.points @ self.points[i], -1.0, 1.0)
+            chord = np.sqrt(np.maximum(2.0 - 2.0 * dots, 0.0))
+            row = self._rows[i] = 2.0 * EARTH_RADIUS_KM * np.arcsin(np.minimum(chord / 2.0, 1.0))
+        return row
+
+    def rows(self, members: List[int]) -> np.ndarray:
+        return np.stack([self.row(i) for i in members])
+
+    def pair_stats(self, members: List[int]) -> tuple[float, float]:
+        """(max, mean) pairwise distance within the set."""
+        k = len(members)
+        if k < 2:
+            return 0.0, 0.0
+        sub = self.rows(members)[:, members]
+        upper = sub[np.triu_indices(k, 1)]
+        return float(upper.max()), float(upper.mean())
+
+    def cost(self, members: List[int]) -> float:
+        max_d, avg_d = self.pair_stats(members)
+        return self.w_max * max_d + self.w_avg * avg_d + float(self.hotel_cost[members].sum())
+
+    def covered(self, members: List[int]) -> int:
+        return int(self.rooms[members].sum())
+
+    # ── Greedy ────────────────────────────────────────────────────────
+
+    def seeds(self, distance_from_event: np.ndarray) -> List[int]:
+        """Seed hotels, the best of each criterion first (greedy may not get to them all)."""
+        n = len(self.rooms)
+        k = min(SEEDS_PER_CRITERION, n)
+        orders = [
+            np.argsort(key, kind="stable")[:k].tolist()
+            for key in (self.hotel_cost, -self.rooms, distance_from_event)
+        ]
+        picks = [order[r] for r in range(k) for order in orders]
+        return list(dict.fromkeys(i for i in picks if self.rooms[i] > 0))
+
+    def greedy(self, seed: int) -> List[int]:
+        members = [seed]
+        covered = int(self.rooms[seed])
+        row = self.row(seed)
+        max_to = row.copy()  # max distance from each hotel to the set
+        sum_to = row.copy()  # summed distance from each hotel to the set
+        cur_max = cur_sum = 0.0
+        available = self.rooms > 0
+        available[seed] = False
+
+        while covered < self.required and len(members) < self.max_hotels and available.any():
+            k = len(members)
+            new_max = np.maximum(cur_max, max_to)
+            new_sum = cur_sum + sum_to
+            cur_avg = cur_sum / (k * (k - 1) / 2) if k > 1 else 0.0
+            delta = (
+                self.w_max * (new_max - cur_max)
+                + self.w_avg * (new_sum / (k * (k + 1) / 2) - cur_avg)
+                + self.hotel_cost
+            )
+            gain = np.minimum(self.rooms, self.required - covered)
+            score = np.maximum(delta, 1e-9) / np.maximum(gain, 1)
+            score[~available] = np.inf
+            j = int(np.argmin(score))
+
+            members.append(j)
+            available[j] = False
+            covered += int(self.rooms[j])
+            cur_max, cur_sum = float(new_max[j]), float(new_sum[j])
+            row = self.row(j)
+            np.maximum(max_to, row, out=max_to)
+            sum_to += row
+        return members
+
+    # ── Local search ──────────────────────────────────────────────────
+
+    def improve(self, members: List[int], deadline: float) -> List[int]:
+        members = list(members)
+        target = min(self.required, self.covered(members))
+        current = self.cost(members)
+
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = False
+
+            # Drop hotels the rest of the set can cover without
+            for i in sorted(members, key=lambda m: self.rooms[m]):
+                if len(members) > 1 and self.covered(members) - self.rooms[i] >= target:
+                    trial = [m for m in members if m != i]
+                    trial_cost = self.cost(trial)
+                    if trial_cost < current - 1e-9:
+                        members, current, improved = trial, trial_cost, True
+
+            # Swap one member for one of the nearest non-members
+            member_rows = self.rows(members)
+            spread = member_rows.max(axis=0)
+            spread[members] = np.inf
+            spread[self.rooms <= 0] = np.inf
+            pool_size = min(SWAP_POOL, int(np.isfinite(spread).sum()))
+            if pool_size == 0:
+                break
+            pool = np.argpartition(spread, pool_size - 1)[:pool_size]
+
+            covered = self.covered(members)
+            k = len(members)
+            for pos, i in enumerate(members):
+                if time.perf_counter() >= deadline:
+                    break
+                rest = members[:pos] + members[pos + 1:]
+                keep = self.rooms[pool] >= target - (covered - self.rooms[i])
+                cand = pool[keep]
+                if cand.size == 0:
+                    continue
+                rest_rows = np.delete(member_rows, pos, axis=0)
+                if rest:
+                    sub = rest_rows[:, rest]
+                    upper = sub[np.triu_indices(len(rest), 1)]
+                    rest_max = float(upper.max()) if upper.size else 0.0
+                    rest_sum = float(upper.sum())
+                    to_cand = rest_rows[:, cand]
+                    new_max = np.maximum(rest_max, to_cand.max(axis=0))
+                    new_sum = rest_sum + to_cand.sum(axis=0)
+                    pairs = k * (k - 1) / 2
+                    costs = (
+                        self.w_max * new_max + self.w_avg * new_sum / pairs
+                        + float(self.hotel_cost[rest].sum()) + self.hotel_cost[cand]
+                    )
+                else:
+                    costs = self.hotel_cost[cand].copy()
+                best = int(np.argmin(costs))
+                if costs[best] < current - 1e-9:
+                    members = rest + [int(cand[best])]
+                    current = float(costs[best])
+                    improved = True
+                    break
+        return members
+
+    # ── Driver ────────────────────────────────────────────────────────
+
+    def solve(self, distance_from_event: np.ndarray) -> AllocationResult:
+        if self.required <= 0 or not (self.rooms > 0).any():
+            return AllocationResult([], [], 0, 0.0)
+
+        started = time.perf_counter()
+        greedy_deadline = started + GREEDY_BUDGET_S
+        solutions = {}
+        for seed in self.seeds(distance_from_event):
+            if solutions and time.perf_counter() >= greedy_deadline:
+                break
+            members = self.greedy(seed)
+            solutions[frozenset(members)] = members
+
+        def rank(members):
+            return (-min(self.covered(members), self.required), self.cost(members))
+
+        starts = sorted(solutions.values(), key=rank)[:LOCAL_SEARCH_STARTS]
+        deadline = started + SOLVE_BUDGET_S
+        best = min((self.improve(m, deadline) for m in starts), key=rank)
+
+        # Most suitable hotels (lowest per-hotel cost) get filled first
+        best.sort(key=lambda m: (self.hotel_cost[m], -self.rooms[m]))
+        assigned, remaining = [], self.required
+        for m in best:
+            take = int(min(self.rooms[m], remaining))
+            assigned.append(take)
+            remaining -= take
+        return AllocationResult(best, assigned, self.covered(best), self.cost(best))
+
+
+# ──────────────────────────────────────────────
+# Endpoint
+# ──────────────────────────────────────────────
+
+@router.post("/allocate", response_model=AllocationResponse)
+async def allocate_hotels(request: AllocationRequest):
+    """
+    Choose a compact set of hotels within *radius_km* of the event whose
+    rooms together cover ceil(guest_count / guests_per_room).
+    """
+    try:
+        event = request.event
+        hotels = request.hotels
+        rooms_required = math.ceil(request.guest_count / request.guests_per_room)
+        logger.info(
+            f"🧩 [Allocate] event={event.name} (id={event.id}) hotels={len(hotels)} "
+            f"rooms_required={rooms_required} radius={request.radius_km}km"
+        )
+
+        candidates = await _geocode_and_filter(event, hotels, request.radius_km)
+        hotels_within_radius = len(candidates)
+        candidates = [
+            c for c in candidates
+            if hotels[c.index].totalRooms > 0 and _coords_valid(c.latitude, c.longitude)
+        ]
+
+        if candidates and request.use_similarity:
+            # Shares Mode A's cache; without scores the solver runs on distance alone
+            similarity, _ = await _similarity_within_budget(candidates, event, None)
+            similarity = similarity or {}
+            for c in candidates:
+                c.similarity_score = round(similarity.get(c.id, 0), 4)
+
+        started = time.perf_counter()
+        with span("allocation.solve"):
+            solver = AllocationSolver(
+                np.array([c.latitude for c in candidates], dtype=np.float64),
+                np.array([c.longitude for c in candidates], dtype=np.float64),
+                np.array([hotels[c.index].totalRooms for c in candidates], dtype=np.int64),
+                np.array([c.similarity_score for c in candidates], dtype=np.float64),
+                rooms_required,
+                request.max_hotels,
+                request.weights,
+            )
+            # Tens of ms of numpy — keep it off the event loop
+            result = await asyncio.to_thread(
+                solver.solve, np.array([c.distance_from_event_km for c in candidates]),
+            )
+        solve_ms = round((time.perf_counter() - started) * 1000, 2)
+
+        chosen = [candidates[m] for m in result.members]
+        allocations = []
+        pair_distances = []
+        for rank, (c, assigned) in enumerate(zip(chosen, result.assigned), start=1):
+            to_group = [
+                haversine(c.latitude, c.longitude, o.latitude, o.longitude)
+                for o in chosen if o is not c
+            ]
+            pair_distances.extend(to_group)
+            hotel = hotels[c.index]
+            allocations.append({
+                "hotel_id": c.id,
+                "hotel_name": hotel.name,
+                "rank": rank,
+                "rooms_available": hotel.totalRooms,
+                "rooms_assigned": assigned,
+                "similarity_score": c.similarity_score,
+                "distance_from_event_km": c.distance_from_event_km,
+                "max_distance_to_group_km": round(max(to_group, default=0.0), 2),
+            })
+
+        rooms_allocated = sum(result.assigned)
+        logger.info(
+            f"✅ Allocate: {len(allocations)} hotels, {rooms_allocated}/{rooms_required} rooms "
+            f"in {solve_ms} ms"
+        )
+        return ORJSONResponse({
+            "status": "success" if rooms_allocated >= rooms_required else "partial",
+            "rooms_required": rooms_required,
+            "rooms_allocated": rooms_allocated,
+            "allocations": allocations,
+            "max_distance_km": round(max(pair_distances, default=0.0), 2),
+            "avg_distance_km": round(sum(pair_distances) / len(pair_distances), 2) if pair_distances else 0.0,
+            "hotels_within_radius": hotels_within_radius,
+            "total_candidates": len(hotels),
+            "solve_ms": solve_ms,
+        })
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Hotel allocation error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
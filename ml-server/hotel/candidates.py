@@ -0,0 +1,324 @@
+"""
+Radius-filtered candidate sets + per-event cache
+────────────────────────────────────────────────
+A planner selects hotels for one event one at a time, and every selection
+triggers another Mode B call with the same event and hotel list.  The
+geocoded, radius-filtered candidates are therefore kept per
+(event, hotel-set fingerprint, radius) as NumPy arrays, together with
+lazily computed distance rows from each selected hotel, so follow-up calls
+skip geocoding, the radius filter and per-hotel haversine entirely.
+
+The fingerprint covers hotel ids, coordinates and cities (everything the
+filter depends on) and is returned to the caller; a caller that sends it
+back as `hotels_fingerprint` may omit the hotel list on later calls.
+
+With several uvicorn workers (utils/shared_arrays.py) each new set is also
+published as a memory-mapped snapshot, so a follow-up call that lands on
+another worker attaches the arrays instead of rebuilding them — and the
+fingerprint-only form keeps working whichever worker answers.
+
+Cache size / TTL: HOTEL_CANDIDATE_CACHE_SIZE (default 64 event hotel sets),
+HOTEL_CANDIDATE_CACHE_TTL_SECONDS (default 1800).
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Hashable, List, Optional, Sequence
+
+import numpy as np
+
+from utils.shared_arrays import SharedArrayStore, Snapshot, get_shared_store
+
+logger = logging.getLogger("hotel_recommendation")
+
+EARTH_RADIUS_KM = 6371.0
+NO_DISTANCE_KM = 999.0  # candidate without coordinates — sorts last
+
+
+@dataclass(slots=True)
+class Candidate:
+    """A hotel that passed the radius filter.  `index` points back into the
+    request's hotel list so only the returned rows touch the pydantic model."""
+    index: int
+    id: str
+    latitude: Optional[float]
+    longitude: Optional[float]
+    distance_from_event_km: float
+    similarity_score: float = 0.0
+    distance_from_best_km: float = 0.0
+
+
+# ──────────────────────────────────────────────
+# Vectorised distance
+# ──────────────────────────────────────────────
+
+def haversine_np(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Great-circle distance in km from one point to arrays of points."""
+    phi1 = np.radians(lat)
+    phi2 = np.radians(lats)
+    dphi = phi2 - phi1
+    dlambda = np.radians(lngs - lng)
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def valid_coords_mask(lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Vectorised _coords_valid: finite and not the (0, 0) placeholder."""
+    return np.isfinite(lats) & np.isfinite(lngs) & ~((lats == 0.0) & (lngs == 0.0))
+
+
+def spherical_centroid(lats: Sequence[float], lngs: Sequence[float]) -> tuple[float, float]:
+    """Centre of a few points (mean of unit vectors, projected back)."""
+    phi = np.radians(np.asarray(lats, dtype=np.float64))
+    lam = np.radians(np.asarray(lngs, dtype=np.float64))
+    x = float(np.mean(np.cos(phi) * np.cos(lam)))
+    y = float(np.mean(np.cos(phi) * np.sin(lam)))
+    z = float(np.mean(np.sin(phi)))
+    return float(np.degrees(np.arctan2(z, np.hypot(x, y)))), float(np.degrees(np.arctan2(y, x)))
+
+
+# ──────────────────────────────────────────────
+# Fingerprint
+# ──────────────────────────────────────────────
+
+def hotels_fingerprint(hotels) -> str:
+    """Digest of what the radius filter depends on: ids, coordinates, cities."""
+    digest = hashlib.blake2b(digest_size=16)
+    columns = getattr(hotels, "latitude", None)
+    if isinstance(columns, np.ndarray):  # HotelColumns
+        digest.update("\x1f".join(hotels.ids).encode("utf-8"))
+        digest.update(np.ascontiguousarray(hotels.latitude, dtype="<f8").tobytes())
+        digest.update(np.ascontiguousarray(hotels.longitude, dtype="<f8").tobytes())
+        cities = hotels.rows.get("city")
+        if cities is not None:
+            digest.update("\x1f".join(cities[i] or "" for i in range(len(hotels))).encode("utf-8"))
+    else:
+        digest.update("\x1e".join(
+            f"{h.id}\x1f{h.latitude}\x1f{h.longitude}\x1f{h.city}" for h in hotels
+        ).encode("utf-8"))
+    return digest.hexdigest()
+
+
+# ──────────────────────────────────────────────
+# Candidate set
+# ──────────────────────────────────────────────
+
+class CandidateSet:
+    """In-radius candidates of one request as parallel arrays."""
+
+    def __init__(self, candidates: List[Candidate], hotels: Sequence):
+        self.hotels = hotels
+        self.index = np.array([c.index for c in candidates], dtype=np.int64)
+        self.ids = [c.id for c in candidates]
+        self.latitude = np.array([np.nan if c.latitude is None else c.latitude for c in candidates])
+        self.longitude = np.array([np.nan if c.longitude is None else c.longitude for c in candidates])
+        self.distance_from_event = np.array([c.distance_from_event_km for c in candidates])
+        self.valid = valid_coords_mask(self.latitude, self.longitude)
+        self._positions: Optional[dict[str, int]] = None
+        self._rows: dict[Hashable, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def with_hotels(self, hotels: Sequence) -> "CandidateSet":
+        """Same candidates (and distance rows) rendered from another copy of the hotel list."""
+        clone = copy.copy(self)
+        clone.hotels = hotels
+        return clone
+
+    def positions(self, ids) -> list[int]:
+        if self._positions is None:
+            self._positions = {hotel_id: p for p, hotel_id in enumerate(self.ids)}
+        return [self._positions[i] for i in ids if i in self._positions]
+
+    def candidate(self, p: int, distance_from_best_km: float = 0.0) -> Candidate:
+        lat = float(self.latitude[p])
+        lng = float(self.longitude[p])
+        return Candidate(
+            int(self.index[p]), str(self.ids[p]),
+            lat if np.isfinite(lat) else None, lng if np.isfinite(lng) else None,
+            float(self.distance_from_event[p]), 0.0, distance_from_best_km,
+        )
+
+    def candidates(self) -> List[Candidate]:
+        """Fresh Candidate objects (callers annotate them in place)."""
+        return [self.candidate(p) for p in range(len(self))]
+
+    def distance_row(self, lat: float, lng: float) -> np.ndarray:
+        """Rounded km from (lat, lng) to every candidate; computed once per point."""
+        key = (lat, lng)
+        row = self._rows.get(key)
+        if row is None:
+            row = np.full(len(self), NO_DISTANCE_KM)
+            row[self.valid] = np.round(
+                haversine_np(lat, lng, self.latitude[self.valid], self.longitude[self.valid]), 2,
+            )
+            self._rows[key] = row
+        return row
+
+
+# ──────────────────────────────────────────────
+# Shared snapshots (multi-worker)
+# ──────────────────────────────────────────────
+
+_HOTEL_TEXT_COLUMNS = ("name", "city", "country")
+_HOTEL_JSON_COLUMNS = ("specialization", "priceRange")
+_HOTEL_NUMERIC_COLUMNS = ("totalRooms", "averageRating", "eventsHostedCount")
+
+
+class _JsonColumn:
+    """Row access into a string array of JSON-encoded values."""
+
+    __slots__ = ("_values",)
+
+    def __init__(self, values: np.ndarray):
+        self._values = values
+
+    def __getitem__(self, i: int):
+        return json.loads(str(self._values[i]))
+
+
+def _float_array(values) -> np.ndarray:
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+def snapshot_arrays(candidate_set: CandidateSet) -> dict[str, np.ndarray]:
+    """Candidate arrays plus the full hotel list as columns (strings as fixed-width unicode)."""
+    hotels = candidate_set.hotels
+    rows = hotels if isinstance(hotels, list) else [hotels[i] for i in range(len(hotels))]
+    arrays = {
+        "index": candidate_set.index,
+        "ids": np.array(candidate_set.ids, dtype=str),
+        "latitude": candidate_set.latitude,
+        "longitude": candidate_set.longitude,
+        "distance_from_event": candidate_set.distance_from_event,
+        "h_id": np.array([h.id for h in rows], dtype=str),
+        "h_latitude": _float_array(h.latitude for h in rows),
+        "h_longitude": _float_array(h.longitude for h in rows),
+    }
+    for name in _HOTEL_TEXT_COLUMNS:
+        arrays[f"h_{name}"] = np.array([getattr(h, name) for h in rows], dtype=str)
+    for name in _HOTEL_JSON_COLUMNS:
+        arrays[f"h_{name}"] = np.array([json.dumps(getattr(h, name)) for h in rows], dtype=str)
+    for name in _HOTEL_NUMERIC_COLUMNS:
+        arrays[f"h_{name}"] = np.array([getattr(h, name) for h in rows])
+    return arrays
+
+
+def candidate_set_from_snapshot(snapshot: Snapshot) -> CandidateSet:
+    """Rebuild a CandidateSet over the mapped arrays (no copies)."""
+    from hotel.columnar import HotelColumns
+
+    a = snapshot.arrays
+    candidate_set = CandidateSet.__new__(CandidateSet)
+    candidate_set.index = a["index"]
+    candidate_set.ids = a["ids"]
+    candidate_set.latitude = a["latitude"]
+    candidate_set.longitude = a["longitude"]
+    candidate_set.distance_from_event = a["distance_from_event"]
+    candidate_set.valid = valid_coords_mask(a["latitude"], a["longitude"])
+    candidate_set._positions = None
+    candidate_set._rows = {}
+    rows = {name: a[f"h_{name}"] for name in _HOTEL_TEXT_COLUMNS}
+    rows.update({name: _JsonColumn(a[f"h_{name}"]) for name in _HOTEL_JSON_COLUMNS})
+    candidate_set.hotels = HotelColumns(
+        a["h_id"], a["h_latitude"], a["h_longitude"],
+        {name: a[f"h_{name}"] for name in _HOTEL_NUMERIC_COLUMNS}, rows,
+    )
+    return candidate_set
+
+
+class CandidateCache:
+    """
+    LRU of CandidateSets keyed by (event, hotel fingerprint, radius), with an
+    optional SharedArrayStore behind it so worker processes share entries.
+    """
+
+    # Expired shared snapshots are swept every N publishes
+    GC_EVERY = 50
+
+    def __init__(
+        self,
+        max_entries: int = 64,
+        ttl_seconds: float = 1800,
+        shared: Optional[SharedArrayStore] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self._entries: OrderedDict[Hashable, tuple[float, CandidateSet]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._publisher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="candidate-publish") if shared else None
+        self._publishes = 0
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _shared_name(key: Hashable) -> str:
+        return "cand-" + hashlib.blake2b(repr(key).encode("utf-8"), digest_size=12).hexdigest()
+
+    def get(self, key: Hashable) -> Optional[CandidateSet]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+
+        if self.shared is not None:
+            try:
+                snapshot = self.shared.attach(self._shared_name(key))
+                if snapshot is not None and time.time() - snapshot.meta["published_at"] <= self.ttl_seconds:
+                    candidate_set = candidate_set_from_snapshot(snapshot)
+                    self._put_local(key, candidate_set)
+                    self.shared_hits += 1
+                    return candidate_set
+            except Exception as e:
+                logger.warning(f"⚠️  Shared candidate cache read failed: {e}")
+
+        self.misses += 1
+        return None
+
+    def _put_local(self, key: Hashable, candidate_set: CandidateSet):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), candidate_set)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def put(self, key: Hashable, candidate_set: CandidateSet):
+        self._put_local(key, candidate_set)
+        if self._publisher is not None:
+            self._publisher.submit(self._publish, key, candidate_set)
+
+    def _publish(self, key: Hashable, candidate_set: CandidateSet):
+        try:
+            self.shared.publish(self._shared_name(key), snapshot_arrays(candidate_set))
+            self._publishes += 1
+            if self._publishes % self.GC_EVERY == 0:
+                self.shared.gc(self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"⚠️  Shared candidate cache publish failed: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+candidate_cache = CandidateCache(
+    max_entries=int(os.getenv("HOTEL_CANDIDATE_CACHE_SIZE", "64")),
+    ttl_seconds=float(os.getenv("HOTEL_CANDIDATE_CACHE_TTL_SECONDS", "1800")),
+    shared=get_shared_store(),
+)
@@ -0,0 +1,305 @@
+"""
+Columnar hotel lists for /hotel/recommend
+─────────────────────────────────────────
+Besides JSON, /hotel/recommend accepts the hotel list as parallel columns
+so large cities don't pay for thousands of HotelInput models:
+
+  • application/msgpack (or application/x-msgpack)
+        {"event": {...}, "selected_hotel": {...} | nil, "radius_km": 5.0,
+         "limit": 10, ...any other RecommendationRequest field...,
+         "hotels": {"id": [...], "latitude": <bin>, "longitude": <bin>, ...}}
+    Numeric columns are either arrays or raw little-endian bin blobs
+    (float64 for latitude/longitude/averageRating, int32 for
+    totalRooms/eventsHostedCount — i.e. a Float64Array/Int32Array buffer).
+    Missing coordinates are NaN (or nil in an array).
+
+  • application/vnd.apache.arrow.stream
+        An Arrow IPC stream whose columns are the HotelInput fields; the
+        other RecommendationRequest fields (event, selected_hotel, ...)
+        travel as JSON in the schema metadata under the "request" key.
+
+Only id, latitude and longitude are required.  Column types are checked
+against HotelInput while decoding, so a malformed column is a 422 rather
+than a failure when its row is rendered.  Numeric columns are decoded
+straight into NumPy arrays (zero-copy where the buffer allows), the radius
+filter is vectorised, and a HotelInput is only built for the rows that end
+up in the response.
+
+msgpack and pyarrow are optional — without them the matching content type
+is answered with 415.
+"""
+
+import json
+import logging
+from typing import Optional
+
+import numpy as np
+
+from hotel.candidates import Candidate, haversine_np, valid_coords_mask
+from hotel.recommendation import EventInput, HotelInput, _coords_valid, geocode_city
+from utils.metrics import span
+
+logger = logging.getLogger("hotel_recommendation")
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+ARROW_STREAM_TYPE = "application/vnd.apache.arrow.stream"
+
+_FLOAT_COLUMNS = ("latitude", "longitude", "averageRating")
+_INT_COLUMNS = ("totalRooms", "eventsHostedCount")
+_ROW_COLUMNS = ("name", "city", "country", "specialization", "priceRange")
+_TEXT_COLUMNS = ("name", "city", "country")
+
+
+class UnsupportedBody(Exception):
+    """Content type we can't decode here (unknown, or optional dependency missing) → 415."""
+
+
+class InvalidBody(Exception):
+    """Columnar body that decodes but is malformed → 422."""
+
+
+# ──────────────────────────────────────────────
+# Columnar hotel list
+# ──────────────────────────────────────────────
+
+class _ArrowColumn:
+    """Row access into an Arrow column without converting it all to Python."""
+
+    __slots__ = ("_column",)
+
+    def __init__(self, column):
+        self._column = column
+
+    def __getitem__(self, i: int):
+        return self._column[i].as_py()
+
+
+class HotelColumns:
+    """
+    Hotel list held as columns.  Indexing returns a HotelInput for one row,
+    so the ranking code (which only touches `hotels[c.index]` for returned
+    rows) works unchanged on either representation.
+    """
+
+    def __init__(self, ids, latitude: np.ndarray, longitude: np.ndarray,
+                 numeric: dict, rows: dict):
+        self.ids = ids
+        self.latitude = latitude
+        self.longitude = longitude
+        self.numeric = numeric  # name -> np.ndarray (averageRating, totalRooms, ...)
+        self.rows = rows        # name -> indexable (name, city, specialization, ...)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, i: int) -> HotelInput:
+        lat = float(self.latitude[i])
+        lng = float(self.longitude[i])
+        fields = {
+            "id": self.ids[i],
+            "name": "",
+            "latitude": lat if np.isfinite(lat) else None,
+            "longitude": lng if np.isfinite(lng) else None,
+        }
+        for name, column in self.numeric.items():
+            fields[name] = column[i].item()
+        for name, column in self.rows.items():
+            value = column[i]
+            if value is not None:
+                fields[name] = value
+        return HotelInput(**fields)
+
+
+def _check_length(name: str, column, n: int):
+    if len(column) != n:
+        raise InvalidBody(f"hotels.{name} has {len(column)} values, expected {n}")
+
+
+def _row_value_ok(name: str, value) -> bool:
+    if value is None:
+        return True
+    if name in _TEXT_COLUMNS:
+        return isinstance(value, str)
+    if name == "specialization":
+        return isinstance(value, list) and all(isinstance(v, str) for v in value)
+    return isinstance(value, dict)  # priceRange
+
+
+def _row_column(name: str, values, n: int) -> list:
+    if not isinstance(values, list):
+        raise InvalidBody(f"hotels.{name} must be a list")
+    _check_length(name, values, n)
+    bad = next((v for v in values if not _row_value_ok(name, v)), None)
+    if bad is not None:
+        raise InvalidBody(f"hotels.{name} has an invalid value: {bad!r}")
+    return values
+
+
+def _numeric_column(name: str, value, n: int) -> np.ndarray:
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        dtype = "<f8" if name in _FLOAT_COLUMNS else "<i4"
+        if len(value) % np.dtype(dtype).itemsize:
+            raise InvalidBody(f"hotels.{name} buffer is not a whole number of {dtype} values")
+        column = np.frombuffer(value, dtype=dtype)
+    elif name in _FLOAT_COLUMNS:
+        column = np.array(value, dtype=np.float64)  # None → NaN
+    else:
+        column = np.array([0 if v is None else v for v in value], dtype=np.int64)
+    _check_length(name, column, n)
+    return column
+
+
+def decode_msgpack(body: bytes):
+    """Decode a MessagePack request → (request fields without hotels, HotelColumns)."""
+    try:
+        import msgpack
+    except ImportError:
+        raise UnsupportedBody("MessagePack bodies need the optional 'msgpack' package")
+
+    with span("decode.msgpack"):
+        try:
+            payload = msgpack.unpackb(body, raw=False)
+            columns = payload["hotels"]
+            ids = columns["id"]
+        except (ValueError, KeyError, TypeError, msgpack.UnpackException) as e:
+            raise InvalidBody(f"Invalid MessagePack recommendation body: {e}")
+
+        if not isinstance(ids, list) or not all(isinstance(i, str) for i in ids):
+            raise InvalidBody("hotels.id must be a list of strings")
+        n = len(ids)
+        if "latitude" not in columns or "longitude" not in columns:
+            raise InvalidBody("hotels.latitude and hotels.longitude are required")
+        try:
+            lat = _numeric_column("latitude", columns["latitude"], n)
+            lng = _numeric_column("longitude", columns["longitude"], n)
+            numeric = {
+                name: _numeric_column(name, columns[name], n)
+                for name in ("averageRating",) + _INT_COLUMNS if name in columns
+            }
+            rows = {name: _row_column(name, columns[name], n) for name in _ROW_COLUMNS if name in columns}
+        except (TypeError, ValueError, OverflowError) as e:
+            # e.g. latitude: ["x"], totalRooms: ["many"]
+            raise InvalidBody(f"Invalid MessagePack hotel column: {e}")
+
+    payload.pop("hotels")
+    return payload, HotelColumns(ids, lat, lng, numeric, rows)
+
+
+def _arrow_type_ok(pa, name: str, type_) -> bool:
+    """Whether an Arrow column of *type_* decodes into HotelInput's *name* field."""
+    t = pa.types
+    if t.is_null(type_):
+        return name != "id"
+    if name == "id" or name in _TEXT_COLUMNS:
+        return t.is_string(type_) or t.is_large_string(type_)
+    if name in _FLOAT_COLUMNS:
+        return t.is_floating(type_) or t.is_integer(type_)
+    if name in _INT_COLUMNS:
+        return t.is_integer(type_)
+    if name == "specialization":
+        return (t.is_list(type_) or t.is_large_list(type_)) and (
+            t.is_string(type_.value_type) or t.is_large_string(type_.value_type)
+        )
+    return t.is_struct(type_)  # priceRange
+
+
+def decode_arrow(body: bytes):
+    """Decode an Arrow IPC stream → (request fields without hotels, HotelColumns)."""
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        raise UnsupportedBody("Arrow bodies need the optional 'pyarrow' package")
+
+    with span("decode.arrow"):
+        try:
+            table = pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+            meta = json.loads((table.schema.metadata or {})[b"request"])
+            names = set(table.column_names)
+            ids = table.column("id")
+        except (pa.ArrowException, KeyError, ValueError) as e:
+            raise InvalidBody(f"Invalid Arrow recommendation body: {e}")
+
+        if "latitude" not in names or "longitude" not in names:
+            raise InvalidBody("hotels.latitude and hotels.longitude are required")
+        for field in table.schema:
+            if field.name in names and not _arrow_type_ok(pa, field.name, field.type):
+                raise InvalidBody(f"hotels.{field.name} can't be an Arrow {field.type} column")
+        if ids.null_count:
+            raise InvalidBody("hotels.id can't contain nulls")
+
+        try:
+            lat = table.column("latitude").to_numpy().astype(np.float64, copy=False)
+            lng = table.column("longitude").to_numpy().astype(np.float64, copy=False)
+            numeric = {}
+            if "averageRating" in names:
+                numeric["averageRating"] = pc.fill_null(table.column("averageRating").cast(pa.float64()), 0.0).to_numpy()
+            for name in _INT_COLUMNS:
+                if name in names:
+                    numeric[name] = pc.fill_null(table.column(name).cast(pa.int64()), 0).to_numpy()
+        except (pa.ArrowException, TypeError, ValueError) as e:
+            raise InvalidBody(f"Invalid Arrow hotel column: {e}")
+        rows = {name: _ArrowColumn(table.column(name)) for name in _ROW_COLUMNS if name in names}
+
+    return meta, HotelColumns(ids.to_pylist(), lat, lng, numeric, rows)
+
+
+# ──────────────────────────────────────────────
+# Geocode + vectorised radius filter
+# ──────────────────────────────────────────────
+
+def _or_none(value) -> Optional[float]:
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+async def geocode_and_filter_columns(
+    event: EventInput,
+    hotels: HotelColumns,
+    radius_km: float,
+) -> list[Candidate]:
+    """Columnar counterpart of _geocode_and_filter (same geocoding rules)."""
+    event_lat = event.latitude
+    event_lng = event.longitude
+    if not _coords_valid(event_lat, event_lng) and event.city:
+        event_lat, event_lng = await geocode_city(event.city, event.country)
+        if event_lat is not None:
+            event.latitude = event_lat
+            event.longitude = event_lng
+
+    valid = valid_coords_mask(hotels.latitude, hotels.longitude)
+    cities = hotels.rows.get("city")
+    if cities is not None and not valid.all():
+        countries = hotels.rows.get("country")
+        # Buffers decoded from the body may be read-only
+        hotels.latitude = hotels.latitude.copy()
+        hotels.longitude = hotels.longitude.copy()
+        for i in np.flatnonzero(~valid):
+            city = cities[i]
+            if city:
+                lat, lng = await geocode_city(city, (countries[i] if countries is not None else "") or "")
+                if lat is not None:
+                    hotels.latitude[i], hotels.longitude[i] = lat, lng
+                    valid[i] = True
+
+    ids = hotels.ids
+    if not _coords_valid(event_lat, event_lng):
+        logger.warning("⚠️  Event has no coordinates — skipping distance filter")
+        return [
+            Candidate(i, ids[i], _or_none(hotels.latitude[i]), _or_none(hotels.longitude[i]), 0.0)
+            for i in range(len(hotels))
+        ]
+
+    with span("haversine_filter"):
+        dist = np.full(len(hotels), np.inf)
+        dist[valid] = haversine_np(event_lat, event_lng, hotels.latitude[valid], hotels.longitude[valid])
+        within = np.flatnonzero(dist <= radius_km)
+        rounded = [round(d, 2) for d in dist[within].tolist()]
+        lats = hotels.latitude[within].tolist()
+        lngs = hotels.longitude[within].tolist()
+        candidates = [
+            Candidate(i, ids[i], lats[k], lngs[k], rounded[k])
+            for k, i in enumerate(within.tolist())
+        ]
+    logger.debug(f"✅ {len(candidates)} hotels within {radius_km} km radius")
+    return candidates
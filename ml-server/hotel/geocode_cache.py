@@ -0,0 +1,74 @@
+"""
+Geocode cache
+─────────────
+geocode_city results live in a per-process dict.  With shared caching on
+(multi-worker mode, see utils/shared_arrays.py) they are also written to a
+small SQLite table — WAL mode, reads served from a memory-mapped file — so
+every worker, and the next restart, reuses a lookup instead of calling
+Nominatim again.  SQLite serialises the writers.
+
+GEOCODE_CACHE_PATH (default ml-server/data/geocode.sqlite3).
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+
+from utils.shared_arrays import shared_cache_enabled
+
+logger = logging.getLogger("hotel_recommendation")
+
+
+class GeocodeCache:
+    def __init__(self, path: Optional[str] = None):
+        self._local: dict[str, Tuple[float, float]] = {}
+        self._conn = None
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA mmap_size=67108864")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS geocode ("
+                " key TEXT PRIMARY KEY, lat REAL NOT NULL, lng REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def get(self, key: str) -> Optional[Tuple[float, float]]:
+        hit = self._local.get(key)
+        if hit is not None or self._conn is None:
+            return hit
+        with self._lock:
+            row = self._conn.execute("SELECT lat, lng FROM geocode WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            hit = self._local[key] = (row[0], row[1])
+        return hit
+
+    def put(self, key: str, lat: float, lng: float):
+        self._local[key] = (lat, lng)
+        if self._conn is None:
+            return
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO geocode (key, lat, lng, updated_at) VALUES (?, ?, ?, ?)",
+                    (key, lat, lng, time.time()),
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️  Could not persist geocode for '{key}': {e}")
+
+    def __len__(self) -> int:
+        return len(self._local)
+
+
+geocode_cache = GeocodeCache(
+    os.getenv(
+        "GEOCODE_CACHE_PATH",
+        os.path.join(os.path.dirname(__file__), "..", "data", "geocode.sqlite3"),
+    )
+    if shared_cache_enabled() else None
+)
@@ -0,0 +1,458 @@
+"""
+Background precomputation of hotel recommendations
+──────────────────────────────────────────────────
+The ranking for the default request of an event's hotel page (radius
+HOTEL_PRECOMPUTE_RADIUS_KM = 5, limit HOTEL_PRECOMPUTE_LIMIT = 10, nothing
+selected) is computed ahead of time and stored, so the first planner to open
+the page is served from the store instead of waiting on the whole Mode A
+pipeline (geocoding, the event embedding, the Qdrant searches, the ranking).
+
+  • triggers   POST /event/embedding enqueues the event it indexed, and
+               POST /hotel/recommend/precompute enqueues one explicitly
+  • hotels     the Node backend always sends the full active hotel list, so
+               the latest list /hotel/recommend received (or a precompute
+               request carried) is kept as the catalogue that jobs rank
+  • queue      a SQLite table (WAL) in HOTEL_PRECOMPUTE_PATH, one row per
+               event, drained by HOTEL_PRECOMPUTE_WORKERS asyncio workers.
+               A claim is one atomic UPDATE, so several uvicorn workers can
+               share the file.  A claim older than the lease (a worker that
+               died) is retried, queued jobs survive restarts, and failures
+               retry with backoff up to MAX_ATTEMPTS
+  • serving    rankings are stored under the response cache's request key
+               (hotel/response_cache.py), so a live request hits only if the
+               event fields, hotel set, radius and limit all match
+  • refresh    a default request whose event fields no longer match the
+               stored ranking re-enqueues the event with the live fields.
+               A new hotel list re-enqueues the events ranked against the
+               old one, and activity ingest re-enqueues everything.  The
+               old ranking is served only while its key still matches
+
+Jobs run with the normal bulkheads (utils/admission.py), so precomputation
+backs off instead of crowding out live traffic.  Stored rankings older than
+HOTEL_PRECOMPUTE_RETENTION_DAYS (30) are pruned at startup.
+HOTEL_PRECOMPUTE=0 turns it off.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Sequence
+
+from prometheus_client import Counter, Gauge
+
+from hotel.candidates import Candidate
+from hotel.response_cache import Ranking, request_key, response_cache
+from utils import admission, deadline
+
+logger = logging.getLogger("hotel_recommendation")
+
+PRECOMPUTE_ENABLED = os.getenv("HOTEL_PRECOMPUTE", "1") == "1"
+PRECOMPUTE_PATH = os.getenv(
+    "HOTEL_PRECOMPUTE_PATH",
+    os.path.join(os.path.dirname(__file__), "..", "data", "precompute.sqlite3"),
+)
+PRECOMPUTE_WORKERS = int(os.getenv("HOTEL_PRECOMPUTE_WORKERS", "2"))
+DEFAULT_RADIUS_KM = float(os.getenv("HOTEL_PRECOMPUTE_RADIUS_KM", "5.0"))
+DEFAULT_LIMIT = int(os.getenv("HOTEL_PRECOMPUTE_LIMIT", "10"))
+RETENTION_DAYS = float(os.getenv("HOTEL_PRECOMPUTE_RETENTION_DAYS", "30"))
+JOB_BUDGET_S = 60.0
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF_S = 30.0
+LEASE_S = 300.0
+POLL_INTERVAL_S = 5.0
+_HOTEL_SETS_KEPT = 2
+
+JOBS = Counter(
+    "mlserver_hotel_precompute_jobs_total",
+    "Recommendation precompute jobs by outcome (done, retry, failed, skipped)",
+    ["outcome"],
+)
+QUEUE_DEPTH = Gauge(
+    "mlserver_hotel_precompute_queue_depth",
+    "Events waiting for a recommendation precompute",
+    multiprocess_mode="max",
+)
+SERVED = Counter(
+    "mlserver_hotel_precompute_lookups_total",
+    "Default /hotel/recommend requests checked against the store (hit, stale, miss)",
+    ["outcome"],
+)
+
+
+# ──────────────────────────────────────────────
+# Ranking (de)serialisation
+# ──────────────────────────────────────────────
+
+def _dump_ranking(ranking: Ranking) -> str:
+    return json.dumps({
+        "rows": [
+            [c.index, c.id, c.latitude, c.longitude, c.distance_from_event_km,
+             c.similarity_score, c.distance_from_best_km, role, anchor_name]
+            for c, role, anchor_name in ranking.rows
+        ],
+        "total_candidates": ranking.total_candidates,
+        "hotels_within_radius": ranking.hotels_within_radius,
+        "best_hotel_name": ranking.best_hotel_name,
+        "fingerprint": ranking.fingerprint,
+    }, separators=(",", ":"))
+
+
+def _load_ranking(payload: str, hotels: Sequence) -> Ranking:
+    data = json.loads(payload)
+    rows = [(Candidate(*row[:7]), row[7], row[8]) for row in data["rows"]]
+    return Ranking(
+        rows, data["total_candidates"], data["hotels_within_radius"],
+        data["best_hotel_name"], data["fingerprint"], hotels,
+    )
+
+
+# ──────────────────────────────────────────────
+# Store: job queue, hotel catalogue, rankings
+# ──────────────────────────────────────────────
+
+class PrecomputeStore:
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " event_id TEXT PRIMARY KEY, event TEXT NOT NULL, state TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0, not_before REAL NOT NULL DEFAULT 0,"
+            " claimed_at REAL, enqueued_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS hotel_sets ("
+            " fingerprint TEXT PRIMARY KEY, hotels TEXT NOT NULL, seen_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS rankings ("
+            " key TEXT PRIMARY KEY, event_id TEXT NOT NULL, fingerprint TEXT NOT NULL,"
+            " event TEXT NOT NULL, ranking TEXT NOT NULL, computed_at REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS rankings_event ON rankings (event_id);"
+            "CREATE INDEX IF NOT EXISTS rankings_fingerprint ON rankings (fingerprint);"
+        )
+        self._lock = threading.Lock()
+
+    # ── Jobs ──────────────────────────────────────────────────────────
+    def enqueue(self, event_id: str, event_json: str):
+        """Queue an event, or re-queue it with new fields (the same fields keep their place)."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (event_id, event, state, attempts, not_before, enqueued_at)"
+                " VALUES (?, ?, 'queued', 0, 0, ?)"
+                " ON CONFLICT(event_id) DO UPDATE SET event = excluded.event, state = 'queued',"
+                " attempts = 0, not_before = 0, enqueued_at = excluded.enqueued_at"
+                " WHERE jobs.event != excluded.event",
+                (event_id, event_json, time.time()),
+            )
+
+    def claim(self) -> Optional[tuple[str, str, int, float]]:
+        """Take the oldest runnable job: (event id, event JSON, attempts, enqueued_at)."""
+        now = time.time()
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE jobs SET state = 'running', claimed_at = ?1 WHERE event_id = ("
+                " SELECT event_id FROM jobs"
+                " WHERE (state = 'queued' AND not_before <= ?1) OR (state = 'running' AND claimed_at < ?2)"
+                " ORDER BY enqueued_at LIMIT 1)"
+                " RETURNING event_id, event, attempts, enqueued_at",
+                (now, now - LEASE_S),
+            ).fetchone()
+
+    def finish(self, event_id: str, enqueued_at: float):
+        """Drop a finished job, unless it was re-queued while it ran."""
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE event_id = ? AND enqueued_at = ?", (event_id, enqueued_at))
+
+    def retry(self, event_id: str, enqueued_at: float, attempts: int, delay_s: float):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET state = 'queued', attempts = ?, not_before = ?"
+                " WHERE event_id = ? AND enqueued_at = ?",
+                (attempts, time.time() + delay_s, event_id, enqueued_at),
+            )
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            jobs = dict(self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+            rankings = self._conn.execute("SELECT COUNT(*) FROM rankings").fetchone()[0]
+        return {"queued": jobs.get("queued", 0), "running": jobs.get("running", 0), "rankings": rankings}
+
+    # ── Hotel catalogue ───────────────────────────────────────────────
+    def save_hotels(self, fingerprint: str, hotels_json: str) -> Optional[str]:
+        """Store the latest hotel list; returns the previous latest fingerprint."""
+        with self._lock:
+            row = self._conn.execute("SELECT fingerprint FROM hotel_sets ORDER BY seen_at DESC LIMIT 1").fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO hotel_sets (fingerprint, hotels, seen_at) VALUES (?, ?, ?)",
+                (fingerprint, hotels_json, time.time()),
+            )
+            self._conn.execute(
+                "DELETE FROM hotel_sets WHERE fingerprint NOT IN ("
+                " SELECT fingerprint FROM hotel_sets ORDER BY seen_at DESC LIMIT ?)",
+                (_HOTEL_SETS_KEPT,),
+            )
+        return row[0] if row else None
+
+    def latest_hotels(self) -> Optional[tuple[str, str]]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT fingerprint, hotels FROM hotel_sets ORDER BY seen_at DESC LIMIT 1"
+            ).fetchone()
+
+    # ── Rankings ──────────────────────────────────────────────────────
+    def rankings_for(self, event_id: str) -> list[tuple[str, str]]:
+        """(key, ranking JSON) for every stored ranking of an event."""
+        with self._lock:
+            return self._conn.execute("SELECT key, ranking FROM rankings WHERE event_id = ?", (event_id,)).fetchall()
+
+    def save_ranking(self, key: str, event_id: str, fingerprint: str, event_json: str, ranking_json: str):
+        with self._lock:
+            # One stored ranking per event: the one for its current inputs
+            self._conn.execute("DELETE FROM rankings WHERE event_id = ? AND key != ?", (event_id, key))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO rankings (key, event_id, fingerprint, event, ranking, computed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, event_id, fingerprint, event_json, ranking_json, time.time()),
+            )
+
+    def ranked_events(self, fingerprint: Optional[str] = None) -> list[tuple[str, str]]:
+        """(event id, event JSON) of stored rankings, optionally only for one hotel set."""
+        query, args = "SELECT event_id, event FROM rankings", ()
+        if fingerprint is not None:
+            query, args = query + " WHERE fingerprint = ?", (fingerprint,)
+        with self._lock:
+            return self._conn.execute(query, args).fetchall()
+
+    def prune(self, max_age_s: float) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM rankings WHERE computed_at < ?", (time.time() - max_age_s,),
+            ).rowcount
+
+
+# ──────────────────────────────────────────────
+# Queue + workers
+# ──────────────────────────────────────────────
+
+class PrecomputeQueue:
+    def __init__(self, path: str, workers: int):
+        self._path = path
+        self._store: Optional[PrecomputeStore] = None
+        self._n_workers = max(1, workers)
+        self._workers: list[asyncio.Task] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._latest_fingerprint: Optional[str] = None
+        self._catalogue: Optional[tuple[str, list]] = None  # (fingerprint, [HotelInput])
+
+    @property
+    def store(self) -> PrecomputeStore:
+        if self._store is None:
+            self._store = PrecomputeStore(self._path)
+        return self._store
+
+    def start(self):
+        """Start the workers on the running loop (app lifespan)."""
+        if self._workers:
+            return
+        try:
+            pruned = self.store.prune(RETENTION_DAYS * 86400)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"⚠️  Recommendation precompute disabled — store unavailable: {e}")
+            return
+        if pruned:
+            logger.info(f"🧹 Pruned {pruned} precomputed rankings older than {RETENTION_DAYS:g} days")
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._workers = [
+            asyncio.create_task(self._run(), name=f"hotel-precompute-{i}") for i in range(self._n_workers)
+        ]
+
+    async def close(self):
+        for task in self._workers:
+            task.cancel()
+        for task in self._workers:
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._workers = []
+
+    def _notify(self):
+        """Wake the workers; producers run in worker threads (asyncio.to_thread)."""
+        QUEUE_DEPTH.set(self.store.pending())
+        if self._wake is None:
+            return
+        try:
+            on_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            self._wake.set()
+        else:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    # ── Producers (blocking: SQLite) ──────────────────────────────────
+    def enqueue(self, event) -> None:
+        """Queue a precompute for an EventInput (replaces a queued one for the same event)."""
+        self.store.enqueue(event.id, event.model_dump_json())
+        self._notify()
+
+    def enqueue_embedded(self, post) -> None:
+        """Queue a precompute for an event just indexed by /event/embedding (an EventPost)."""
+        from hotel.recommendation import EventInput
+
+        location = post.location
+        self.enqueue(EventInput(
+            id=post.id, name=post.name, type=post.type, description=post.description,
+            latitude=location.latitude if location else None,
+            longitude=location.longitude if location else None,
+            city=location.city if location else "",
+            country=location.country if location else "",
+        ))
+
+    def _enqueue_raw(self, events: list[tuple[str, str]]):
+        for event_id, event_json in events:
+            self.store.enqueue(event_id, event_json)
+        if events:
+            self._notify()
+
+    def requeue_all(self, reason: str):
+        """Re-rank every stored event (its similarity inputs changed)."""
+        events = self.store.ranked_events()
+        self._enqueue_raw(events)
+        if events:
+            logger.info(f"🔁 Re-queued {len(events)} precomputed events ({reason})")
+
+    def knows_hotels(self, fingerprint: str) -> bool:
+        return fingerprint == self._latest_fingerprint
+
+    def remember_hotels(self, fingerprint: str, hotels: Sequence):
+        """Keep the latest full hotel list as the catalogue jobs rank against (blocking)."""
+        if self.knows_hotels(fingerprint) or not isinstance(hotels, list) or not hotels:
+            return
+        self._latest_fingerprint = fingerprint
+        hotels_json = json.dumps([h.model_dump() for h in hotels], separators=(",", ":"))
+        previous = self.store.save_hotels(fingerprint, hotels_json)
+        if previous is not None and previous != fingerprint:
+            events = self.store.ranked_events(previous)
+            self._enqueue_raw(events)
+            if events:
+                logger.info(f"🔁 Hotel list changed — re-queued {len(events)} precomputed events")
+
+    # ── Serving ───────────────────────────────────────────────────────
+    def lookup(self, key: str, request, hotels: Sequence) -> Optional[Ranking]:
+        """The stored ranking for this request key; re-queues the event when its inputs moved on (blocking)."""
+        if request.radius_km != DEFAULT_RADIUS_KM or request.limit != DEFAULT_LIMIT or request.all_selected():
+            return None
+        stored = self.store.rankings_for(request.event.id)
+        for stored_key, payload in stored:
+            if stored_key == key:
+                SERVED.labels("hit").inc()
+                return _load_ranking(payload, hotels)
+        if stored:
+            SERVED.labels("stale").inc()
+            self.enqueue(request.event)
+        else:
+            SERVED.labels("miss").inc()
+        return None
+
+    # ── Workers ───────────────────────────────────────────────────────
+    def _load_catalogue(self) -> Optional[tuple[str, list]]:
+        from hotel.recommendation import HotelInput
+
+        row = self.store.latest_hotels()
+        if row is None:
+            return None
+        fingerprint, hotels_json = row
+        if self._catalogue is None or self._catalogue[0] != fingerprint:
+            self._catalogue = (fingerprint, [HotelInput.model_validate(h) for h in json.loads(hotels_json)])
+        return self._catalogue
+
+    async def _run_job(self, event_json: str) -> Optional[tuple[str, Ranking]]:
+        """Rank one event against the catalogue; (key, ranking) or None when there is no catalogue."""
+        from hotel.recommendation import EventInput, RecommendationRequest, _rank
+
+        catalogue = await asyncio.to_thread(self._load_catalogue)
+        if catalogue is None:
+            return None
+        fingerprint, hotels = catalogue
+        request = RecommendationRequest(
+            event=EventInput.model_validate_json(event_json),
+            radius_km=DEFAULT_RADIUS_KM,
+            limit=DEFAULT_LIMIT,
+            ml_budget_ms=JOB_BUDGET_S * 1000,
+        )
+        key = request_key(request, fingerprint)  # before _rank geocodes the event in place
+        token = deadline.set_deadline(JOB_BUDGET_S)
+        try:
+            ranking = await _rank(request, hotels, fingerprint)
+        finally:
+            deadline.reset_deadline(token)
+        return key, ranking
+
+    async def _process(self, event_id: str, event_json: str, attempts: int, enqueued_at: float):
+        try:
+            result = await self._run_job(event_json)
+            if result is None:
+                JOBS.labels("skipped").inc()
+                logger.warning(f"⚠️  No hotel list seen yet — skipped precompute for event {event_id}")
+                await asyncio.to_thread(self.store.finish, event_id, enqueued_at)
+                return
+            key, ranking = result
+            if ranking.degraded:
+                raise RuntimeError("similarity scoring unavailable (degraded ranking)")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            attempts += 1
+            if attempts >= MAX_ATTEMPTS:
+                JOBS.labels("failed").inc()
+                logger.error(f"❌ Precompute for event {event_id} failed after {attempts} attempts: {e}")
+                await asyncio.to_thread(self.store.finish, event_id, enqueued_at)
+            else:
+                JOBS.labels("retry").inc()
+                delay = RETRY_BACKOFF_S * (2 ** (attempts - 1))
+                if isinstance(e, admission.Overloaded):
+                    delay = max(delay, float(e.headers["Retry-After"]))
+                logger.warning(f"⚠️  Precompute for event {event_id} failed (attempt {attempts}), retrying in {delay:g}s: {e}")
+                await asyncio.to_thread(self.store.retry, event_id, enqueued_at, attempts, delay)
+            return
+
+        await asyncio.to_thread(
+            self.store.save_ranking, key, event_id, ranking.fingerprint, event_json, _dump_ranking(ranking),
+        )
+        response_cache.put(key, ranking, event_id)
+        await asyncio.to_thread(self.store.finish, event_id, enqueued_at)
+        JOBS.labels("done").inc()
+        logger.info(f"✅ Precomputed {len(ranking.rows)} recommendations for event {event_id}")
+
+    async def _run(self):
+        while True:
+            try:
+                job = await asyncio.to_thread(self.store.claim)
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️  Precompute queue unavailable: {e}")
+                job = None
+            if job is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), POLL_INTERVAL_S)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._process(*job)
+            except Exception as e:  # the store itself failed; the lease brings the job back
+                logger.warning(f"⚠️  Precompute job for event {job[0]} could not be recorded: {e}")
+            QUEUE_DEPTH.set(await asyncio.to_thread(self.store.pending))
+
+
+precompute_queue = PrecomputeQueue(PRECOMPUTE_PATH, PRECOMPUTE_WORKERS)
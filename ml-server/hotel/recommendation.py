@@ -4,26 +4,59 @@ Hotel Recommendation Engine — ML Server
 Implements a 4-step recommendation pipeline:
 
   Step 1 — Filter hotels within a configurable radius (default 5 km) using Haversine.
-  Step 2 — Embed the new event and search Qdrant `hotels_activity_vectors`
-            to find hotels that have hosted similar events. Group by hotel
-            and compute average similarity scores.
+  Step 2 — Embed the new event and score the candidates against their
+            activity centroids in `hotels_activity_centroids` (built by
+            hotel/activity_index.py; hotels without a centroid fall back
+            to their `hotels_activity_vectors` point) and `hotels_vectors`.
   Step 3 — Select the best hotel (highest similarity among candidates).
   Step 4 — Sort remaining candidate hotels by distance from the best hotel.
 
+If similarity scoring misses its time budget or fails, Mode A answers
+`degraded` from local signals and finishes the scoring in the background.
+
 The Node.js backend sends event + hotel data (with coordinates).
 This module returns the final ranked recommendation list.
 """
 
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, Field
-from typing import List, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, Field, ValidationError
+from typing import List, Literal, Optional, Sequence, Tuple
+import asyncio
+import hashlib
 import math
 import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
 import logging
 import httpx
-
-from langchain_openai import OpenAIEmbeddings
-from qdrant_client import QdrantClient
+from prometheus_client import Counter
+
+from hotel.activity_index import (
+    CENTROIDS_COLLECTION,
+    centroids_available,
+    is_object_id,
+    object_id_to_uuid,
+)
+from hotel.candidates import (
+    Candidate,
+    CandidateSet,
+    candidate_cache,
+    hotels_fingerprint,
+    spherical_centroid,
+)
+from hotel.geocode_cache import geocode_cache
+from hotel.precompute import PRECOMPUTE_ENABLED, precompute_queue
+from hotel.response_cache import Ranking, request_key, response_cache
+from utils import admission, deadline
+from utils.clients import get_embeddings
+from utils.invalidation import invalidations
+from utils.metrics import span
+from utils.responses import parse_fields
+from utils.vector_store import get_vector_store
 
 router = APIRouter()
 logger = logging.getLogger("hotel_recommendation")
@@ -42,42 +75,48 @@ def _coords_valid(lat, lng) -> bool:
 # Geocoding Cache + Helper
 # ──────────────────────────────────────────────
 
-_geocode_cache: dict[str, Tuple[float, float]] = {}
+NOMINATIM_URL = os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org/search")
 
 
 async def geocode_city(city: str, country: str = "") -> Tuple[Optional[float], Optional[float]]:
     """
     Resolve (latitude, longitude) for a city+country string using
     the OpenStreetMap Nominatim free geocoding API.
-    Results are cached in-memory to avoid repeated API calls.
+    Results are cached (hotel/geocode_cache.py) to avoid repeated API calls.
     """
     if not city:
         return None, None
 
     cache_key = f"{city.strip().lower()}|{country.strip().lower()}"
-    if cache_key in _geocode_cache:
-        return _geocode_cache[cache_key]
+    cached = geocode_cache.get(cache_key)
+    if cached is not None:
+        return cached
 
     query = f"{city}, {country}" if country else city
     try:
-        async with httpx.AsyncClient(timeout=10) as client:
-            resp = await client.get(
-                "https://nominatim.openstreetmap.org/search",
-                params={"q": query, "format": "json", "limit": 1},
-                headers={"User-Agent": "SyncStay-ML/1.0"},
-            )
-            resp.raise_for_status()
-            data = resp.json()
+        async with admission.bulkhead(admission.POOL_GEOCODE):
+            with span("geocode"):
+                async with httpx.AsyncClient(timeout=deadline.timeout(10, "geocode")) as client:
+                    resp = await client.get(
+                        NOMINATIM_URL,
+                        params={"q": query, "format": "json", "limit": 1},
+                        headers={"User-Agent": "SyncStay-ML/1.0"},
+                    )
+                    resp.raise_for_status()
+                    data = resp.json()
+
 
         if data:
             lat = float(data[0]["lat"])
             lon = float(data[0]["lon"])
-            _geocode_cache[cache_key] = (lat, lon)
+            geocode_cache.put(cache_key, lat, lon)
             logger.info(f"📍 Geocoded '{query}' → ({lat}, {lon})")
             return lat, lon
         else:
             logger.warning(f"⚠️  Geocoding returned no results for '{query}'")
             return None, None
+    except (deadline.DeadlineExceeded, admission.Overloaded):
+        raise
     except Exception as e:
         logger.warning(f"⚠️  Geocoding failed for '{query}': {e}")
         return None, None
@@ -124,13 +163,37 @@ class SelectedHotelInput(BaseModel):
 
 class RecommendationRequest(BaseModel):
     event: EventInput
-    hotels: List[HotelInput]
+    hotels: List[HotelInput] = Field(
+        default=[],
+        description="May be omitted when hotels_fingerprint names a hotel set the server has cached",
+    )
     selected_hotel: Optional[SelectedHotelInput] = Field(
         default=None,
         description="If a hotel is already selected, remaining hotels are ranked by distance from it (no ML)",
     )
+    selected_hotels: List[SelectedHotelInput] = Field(
+        default=[],
+        description="Several already-selected hotels (combined with selected_hotel)",
+    )
+    selected_anchor: Literal["nearest", "centroid"] = Field(
+        default="nearest",
+        description="Rank by distance to the nearest selected hotel or to their centre",
+    )
+    hotels_fingerprint: Optional[str] = Field(
+        default=None,
+        description="Fingerprint returned by a previous call for the same hotel list",
+    )
     radius_km: float = Field(default=5.0, description="Radius in km to filter candidate hotels")
     limit: int = Field(default=10, description="Max hotels to return")
+    ml_budget_ms: Optional[float] = Field(
+        default=None, ge=0,
+        description="Mode A: how long to wait for similarity scoring before answering degraded "
+                    "(default HOTEL_ML_BUDGET_MS)",
+    )
+
+    def all_selected(self) -> List[SelectedHotelInput]:
+        selected = ([self.selected_hotel] if self.selected_hotel else []) + list(self.selected_hotels)
+        return list({s.id: s for s in selected}.values())
 
 
 class RecommendedHotel(BaseModel):
@@ -156,6 +219,15 @@ class RecommendationResponse(BaseModel):
     total_candidates: int
     hotels_within_radius: int
     best_hotel_name: str = ""
+    hotels_fingerprint: Optional[str] = None
+    degraded: bool = False
+
+
+RECOMMENDATION_FIELDS = tuple(RecommendedHotel.model_fields) + ("reason_codes",)
+COMPACT_RECOMMENDATION_FIELDS = (
+    "hotel_id", "rank", "is_best_match", "similarity_score",
+    "distance_from_event_km", "distance_from_best_km", "reason_codes",
+)
 
 
 # ──────────────────────────────────────────────
@@ -187,67 +259,218 @@ def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
 # Helper: Qdrant UUID ↔ ObjectId conversion
 # ──────────────────────────────────────────────
 
-def object_id_to_uuid(object_id: str) -> str:
-    """Mirror the Node.js objectIdToUUID conversion."""
-    padded = object_id.ljust(32, "0")
-    return (
-        f"{padded[0:8]}-{padded[8:12]}-{padded[12:16]}"
-        f"-{padded[16:20]}-{padded[20:32]}"
-    )
-
-
 def uuid_to_object_id(uuid: str) -> str:
     """Mirror the Node.js uuidToObjectId conversion."""
     return uuid.replace("-", "")[:24]
 
 
+
 # ──────────────────────────────────────────────
-# Reason Generator
+# Reason codes
 # ──────────────────────────────────────────────
-
-def _generate_reasons(
-    candidate: dict,
-    is_best: bool = False,
-    best_hotel_name: str = "",
-) -> List[str]:
-    reasons: List[str] = []
-    hotel: HotelInput = candidate["hotel"]
-
-    if is_best:
-        score = candidate.get("similarity_score", 0)
-        if score > 0:
-            pct = round(score * 100, 1)
-            reasons.append(f"🎯 Best event similarity match ({pct}%)")
-        else:
-            reasons.append("🎯 Best available match (nearest to event)")
-        reasons.append(
-            f"📍 {candidate['distance_from_event_km']} km from event venue"
-        )
+# Compact responses return the codes; full responses render them to the
+# human-readable strings the dashboard shows.
+
+REASON_BEST_SIMILARITY = "best_similarity"
+REASON_BEST_NEAREST = "best_nearest"
+REASON_BEST_LOCAL = "best_local_match"
+REASON_NEAR_BEST = "near_best"
+REASON_NEAR_SELECTED = "near_selected"
+REASON_NEAR_SELECTED_CENTRE = "near_selected_centre"
+REASON_NEAR_EVENT = "near_event"
+REASON_ROOMS_AVAILABLE = "rooms_available"
+REASON_HIGHLY_RATED = "highly_rated"
+REASON_SPECIALIZED = "specialized"
+
+_REASON_TEMPLATES = {
+    REASON_BEST_SIMILARITY: lambda c, h, anchor: (
+        f"🎯 Best event similarity match ({round(c.similarity_score * 100, 1)}%)"
+    ),
+    REASON_BEST_NEAREST: lambda c, h, anchor: "🎯 Best available match (nearest to event)",
+    REASON_BEST_LOCAL: lambda c, h, anchor: (
+        "🎯 Best match on distance, rating and event experience (similarity unavailable)"
+    ),
+    REASON_NEAR_BEST: lambda c, h, anchor: f"📍 {c.distance_from_best_km} km from {anchor}",
+    REASON_NEAR_SELECTED: lambda c, h, anchor: (
+        f"📍 {c.distance_from_best_km} km from {anchor} (selected hotel)"
+    ),
+    REASON_NEAR_SELECTED_CENTRE: lambda c, h, anchor: (
+        f"📍 {c.distance_from_best_km} km from the centre of the selected hotels"
+    ),
+    REASON_NEAR_EVENT: lambda c, h, anchor: f"📍 {c.distance_from_event_km} km from event venue",
+    REASON_ROOMS_AVAILABLE: lambda c, h, anchor: f"🏨 {h.totalRooms} rooms available",
+    REASON_HIGHLY_RATED: lambda c, h, anchor: f"⭐ Highly rated ({h.averageRating}/5)",
+    REASON_SPECIALIZED: lambda c, h, anchor: f"🎪 Specializes in: {', '.join(h.specialization)}",
+}
+
+
+_BEST_ROLES = ("best", "best_local")
+
+
+def _reason_codes(candidate: Candidate, hotel: HotelInput, role: str) -> List[str]:
+    """role: "best" / "best_local" (Mode A rank 1, by similarity / degraded),
+    "ranked" (Mode A rest), "selected" or "centroid" (Mode B, nearest
+    selected hotel / centre of the selection)."""
+    if role == "best":
+        codes = [REASON_BEST_SIMILARITY if candidate.similarity_score > 0 else REASON_BEST_NEAREST]
+    elif role == "best_local":
+        codes = [REASON_BEST_LOCAL]
+    elif role == "selected":
+        codes = [REASON_NEAR_SELECTED]
+    elif role == "centroid":
+        codes = [REASON_NEAR_SELECTED_CENTRE]
     else:
-        dist_best = candidate.get("distance_from_best_km", 0)
-        reasons.append(f"📍 {dist_best} km from {best_hotel_name}")
-        reasons.append(
-            f"📍 {candidate['distance_from_event_km']} km from event venue"
-        )
+        codes = [REASON_NEAR_BEST]
+    codes.append(REASON_NEAR_EVENT)
 
     if hotel.totalRooms > 0:
-        reasons.append(f"🏨 {hotel.totalRooms} rooms available")
-
+        codes.append(REASON_ROOMS_AVAILABLE)
     if hotel.averageRating >= 4:
-        reasons.append(f"⭐ Highly rated ({hotel.averageRating}/5)")
-
+        codes.append(REASON_HIGHLY_RATED)
     if hotel.specialization:
-        reasons.append(f"🎪 Specializes in: {', '.join(hotel.specialization)}")
+        codes.append(REASON_SPECIALIZED)
+    return codes
+
+
+def _render_reasons(
+    codes: List[str], candidate: Candidate, hotel: HotelInput, anchor_name: str,
+) -> List[str]:
+    return [_REASON_TEMPLATES[code](candidate, hotel, anchor_name) for code in codes]
+
 
-    return reasons
+# ──────────────────────────────────────────────
+# Response rows
+# ──────────────────────────────────────────────
+
+def _recommendation_row(
+    candidate: Candidate,
+    hotel: HotelInput,
+    rank: int,
+    role: str,
+    anchor_name: str,
+    fields: Optional[Tuple[str, ...]],
+) -> dict:
+    """One recommendation as a plain dict (RecommendedHotel layout when fields is None)."""
+    codes = _reason_codes(candidate, hotel, role)
+    if fields is None:
+        return {
+            "hotel_id": candidate.id,
+            "hotel_name": hotel.name,
+            "rank": rank,
+            "is_best_match": role in _BEST_ROLES,
+            "similarity_score": candidate.similarity_score,
+            "distance_from_event_km": candidate.distance_from_event_km,
+            "distance_from_best_km": candidate.distance_from_best_km,
+            "reasons": _render_reasons(codes, candidate, hotel, anchor_name),
+            "city": hotel.city,
+            "country": hotel.country,
+            "totalRooms": hotel.totalRooms,
+            "specialization": hotel.specialization,
+            "priceRange": hotel.priceRange,
+            "averageRating": hotel.averageRating,
+        }
+
+    row = {
+        "hotel_id": candidate.id,
+        "rank": rank,
+        "is_best_match": role in _BEST_ROLES,
+        "similarity_score": candidate.similarity_score,
+        "distance_from_event_km": candidate.distance_from_event_km,
+        "distance_from_best_km": candidate.distance_from_best_km,
+        "reason_codes": codes,
+    }
+    out = {}
+    for name in fields:
+        if name in row:
+            out[name] = row[name]
+        elif name == "hotel_name":
+            out[name] = hotel.name
+        elif name == "reasons":
+            out[name] = _render_reasons(codes, candidate, hotel, anchor_name)
+        else:
+            out[name] = getattr(hotel, name)
+    return out
+
+
+def _response(
+    recommendations: List[dict],
+    total_candidates: int,
+    hotels_within_radius: int,
+    best_hotel_name: str,
+    fingerprint: Optional[str] = None,
+    degraded: bool = False,
+) -> ORJSONResponse:
+    return ORJSONResponse({
+        "status": "success",
+        "recommendations": recommendations,
+        "total_candidates": total_candidates,
+        "hotels_within_radius": hotels_within_radius,
+        "best_hotel_name": best_hotel_name,
+        "hotels_fingerprint": fingerprint,
+        "degraded": degraded,
+    })
+
+
+def _render(ranking: Ranking, hotels: Sequence, fields: Optional[Tuple[str, ...]] = None) -> ORJSONResponse:
+    """The response for a ranking, with row details from *hotels* (same fingerprint)."""
+    recommendations = [
+        _recommendation_row(c, hotels[c.index], rank, role, anchor_name, fields)
+        for rank, (c, role, anchor_name) in enumerate(ranking.rows, start=1)
+    ]
+    return _response(
+        recommendations, ranking.total_candidates, ranking.hotels_within_radius,
+        ranking.best_hotel_name, ranking.fingerprint, ranking.degraded,
+    )
 
 
 # ──────────────────────────────────────────────
 # Main Recommendation Endpoint
 # ──────────────────────────────────────────────
 
-@router.post("/recommend")
-async def recommend_hotels(request: RecommendationRequest):
+async def _read_recommendation_request(request: Request):
+    """
+    Content negotiation for /hotel/recommend.  JSON yields a list of
+    HotelInput; MessagePack / Arrow bodies (see hotel/columnar.py) yield a
+    HotelColumns.  Returns (request, hotels).
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    body = await request.body()
+    try:
+        if content_type in ("", "application/json"):
+            with span("decode.json"):
+                req = RecommendationRequest.model_validate_json(body)
+            return req, req.hotels
+
+        from hotel import columnar
+        try:
+            if content_type in columnar.MSGPACK_TYPES:
+                fields, hotels = columnar.decode_msgpack(body)
+            elif content_type == columnar.ARROW_STREAM_TYPE:
+                fields, hotels = columnar.decode_arrow(body)
+            else:
+                fields = None
+        except columnar.UnsupportedBody as e:
+            raise HTTPException(status_code=415, detail=str(e))
+        except columnar.InvalidBody as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        if fields is not None:
+            return RecommendationRequest.model_validate(fields), hotels
+    except ValidationError as e:
+        raise RequestValidationError(e.errors(include_url=False))
+
+    raise HTTPException(
+        status_code=415,
+        detail=f"Unsupported content type '{content_type}' — use application/json, "
+               "application/msgpack or application/vnd.apache.arrow.stream",
+    )
+
+
+@router.post("/recommend", response_model=RecommendationResponse)
+async def recommend_hotels(
+    http_request: Request,
+    compact: bool = False,
+    fields: Optional[str] = None,
+):
     """
     Hotel recommendation pipeline with two modes:
 
@@ -261,51 +484,63 @@ async def recommend_hotels(request: RecommendationRequest):
       Skip ML entirely.  Filter hotels within radius of the event,
       then sort them by distance from the already-selected hotel so
       guests stay close together.
+
+    The body is a RecommendationRequest as JSON, or the same request with
+    the hotel list as columns (application/msgpack or
+    application/vnd.apache.arrow.stream — see hotel/columnar.py).
+
+    Several selected hotels can be given (`selected_hotels`); remaining
+    hotels are then ranked by distance to the nearest of them, or to their
+    centre with `selected_anchor="centroid"`.
+
+    The geocoded, radius-filtered candidates are cached per event and
+    hotel-set fingerprint (see hotel/candidates.py).  The response carries
+    `hotels_fingerprint`; sending it back lets later calls for the same
+    event skip re-filtering and even omit `hotels`.
+
+    `?compact=true` drops the echoed hotel fields and returns
+    `reason_codes` instead of reason strings; `?fields=hotel_id,rank,...`
+    picks exact columns (any RecommendedHotel field or `reason_codes`).
+
+    Mode A waits at most `ml_budget_ms` for similarity scoring; past that
+    (or if embedding / Qdrant fail) it ranks on local signals and sets
+    `degraded: true` while the scoring finishes in the background.
+
+    Rankings are cached per event, hotel set, selection, radius and limit,
+    and identical concurrent requests share one computation (see
+    hotel/response_cache.py); degraded answers are not cached.
     """
+    row_fields = parse_fields(fields, compact, RECOMMENDATION_FIELDS, COMPACT_RECOMMENDATION_FIELDS)
+    request, hotels = await _read_recommendation_request(http_request)
     try:
         event = request.event
-        hotels = request.hotels
-        selected = request.selected_hotel
+        selected = request.all_selected()
         radius_km = request.radius_km
         limit = request.limit
 
         mode = "distance-from-selected" if selected else "ml-pipeline"
-        print(f"\n{'='*60}")
-        print(f"🔍 [Reco] Mode: {mode}")
-        print(f"🔍 [Reco] Event: {event.name} (id={event.id})")
-        print(f"🔍 [Reco] Event city={event.city}, country={event.country}")
-        print(f"🔍 [Reco] Hotels received: {len(hotels)}")
-        if selected:
-            print(f"🔍 [Reco] Selected hotel: {selected.name} (id={selected.id})")
-        print(f"🔍 [Reco] Radius: {radius_km} km, Limit: {limit}")
-        print(f"{'='*60}")
-
-        # ── Common: geocode & distance-filter ─────────────────────────────
-        candidates = await _geocode_and_filter(event, hotels, radius_km)
-
-        if not candidates:
-            print("🚫 No candidates within radius — returning empty")
-            return RecommendationResponse(
-                status="success",
-                recommendations=[],
-                total_candidates=len(hotels),
-                hotels_within_radius=0,
-                best_hotel_name="",
-            )
+        logger.info(
+            f"🔍 [Reco] mode={mode} event={event.name} (id={event.id}, "
+            f"city={event.city}, country={event.country}) hotels={len(hotels)} "
+            f"radius={radius_km}km limit={limit}"
+            + (f" selected={[s.name for s in selected]}" if selected else "")
+        )
 
-        hotels_within_radius = len(candidates)
+        fingerprint = request.hotels_fingerprint
+        if fingerprint is None and len(hotels):
+            with span("hotels_fingerprint"):
+                fingerprint = hotels_fingerprint(hotels)
+        if PRECOMPUTE_ENABLED and fingerprint and not precompute_queue.knows_hotels(fingerprint):
+            await asyncio.to_thread(precompute_queue.remember_hotels, fingerprint, hotels)
 
-        # ── Branch by mode ────────────────────────────────────────────────
-        if selected:
-            return await _recommend_by_distance(
-                candidates, selected, hotels_within_radius,
-                len(hotels), limit,
-            )
+        key = request_key(request, fingerprint) if fingerprint else None
+        if key is None or not response_cache.enabled:
+            ranking = await _rank(request, hotels, fingerprint, key)
         else:
-            return await _recommend_with_ml(
-                candidates, event, hotels_within_radius,
-                len(hotels), limit,
+            ranking = await response_cache.get_or_compute(
+                key, event.id, lambda: _rank(request, hotels, fingerprint, key),
             )
+        return _render(ranking, hotels if len(hotels) else ranking.hotels, row_fields)
 
     except HTTPException:
         raise
@@ -314,6 +549,140 @@ async def recommend_hotels(request: RecommendationRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _rank(
+    request: RecommendationRequest,
+    hotels: Sequence[HotelInput],
+    fingerprint: Optional[str],
+    key: Optional[str] = None,
+) -> Ranking:
+    # ── Precomputed for this exact request (hotel/precompute.py) ──────
+    if key is not None and PRECOMPUTE_ENABLED and len(hotels):
+        ranking = await asyncio.to_thread(precompute_queue.lookup, key, request, hotels)
+        if ranking is not None:
+            return ranking
+
+    # ── Common: geocode & distance-filter (cached per event) ──────────
+    candidate_set = await _candidate_set(request, hotels, fingerprint)
+    hotels = candidate_set.hotels
+
+    if not len(candidate_set):
+        logger.info("🚫 No candidates within radius — returning empty")
+        return Ranking([], len(hotels), 0, "", fingerprint, hotels)
+
+    # ── Branch by mode ────────────────────────────────────────────────
+    selected = request.all_selected()
+    if selected:
+        return await _recommend_by_distance(
+            candidate_set, selected, request.selected_anchor, request.limit, fingerprint,
+        )
+    budget_ms = ML_BUDGET_MS if request.ml_budget_ms is None else request.ml_budget_ms
+    return await _recommend_with_ml(
+        candidate_set.candidates(), hotels, request.event, request.limit, fingerprint,
+        ml_budget_s=budget_ms / 1000,
+    )
+
+
+class RecommendationCacheInvalidateRequest(BaseModel):
+    event_ids: List[str] = []
+    hotels_fingerprints: List[str] = []
+    clear_all: bool = False
+
+
+@router.post("/recommend/cache/invalidate")
+async def invalidate_recommendation_cache(request: RecommendationCacheInvalidateRequest):
+    """
+    Drop cached /hotel/recommend rankings.  Call with `event_ids` when an
+    event's details change and with `hotels_fingerprints` when a hotel set
+    does.  `clear_all` also drops the cached similarity scores; use it after
+    `hotels_vectors` changes; it also re-queues the precomputed rankings.
+    """
+    if request.clear_all:
+        response_cache.clear()
+        similarity_cache.clear()
+        if PRECOMPUTE_ENABLED:
+            await asyncio.to_thread(precompute_queue.requeue_all, "recommendation cache cleared")
+        return {"status": "success", "invalidated": "all"}
+
+    invalidated = 0
+    if request.event_ids:
+        invalidated += response_cache.invalidate_events(request.event_ids)
+    if request.hotels_fingerprints:
+        invalidated += response_cache.invalidate_fingerprints(request.hotels_fingerprints)
+    return {"status": "success", "invalidated": invalidated, **response_cache.stats()}
+
+
+class PrecomputeRequest(BaseModel):
+    event: EventInput
+    hotels: List[HotelInput] = Field(
+        default=[],
+        description="The full hotel list; omit to rank against the latest list /hotel/recommend received",
+    )
+
+
+@router.post("/recommend/precompute")
+async def enqueue_recommendation_precompute(request: PrecomputeRequest):
+    """
+    Queue a background ranking of `event` for the default request (radius
+    HOTEL_PRECOMPUTE_RADIUS_KM, limit HOTEL_PRECOMPUTE_LIMIT), so the first
+    /hotel/recommend for it is served from the store.  See hotel/precompute.py.
+    """
+    if not PRECOMPUTE_ENABLED:
+        raise HTTPException(status_code=503, detail="Recommendation precompute is disabled (HOTEL_PRECOMPUTE=0)")
+    try:
+        if request.hotels:
+            fingerprint = hotels_fingerprint(request.hotels)
+            await asyncio.to_thread(precompute_queue.remember_hotels, fingerprint, request.hotels)
+        await asyncio.to_thread(precompute_queue.enqueue, request.event)
+        return {"status": "queued", "event_id": request.event.id, **await asyncio.to_thread(precompute_queue.store.stats)}
+    except Exception as e:
+        logger.error(f"Precompute enqueue error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/recommend/precompute")
+async def recommendation_precompute_status():
+    if not PRECOMPUTE_ENABLED:
+        return {"enabled": False}
+    return {"enabled": True, **await asyncio.to_thread(precompute_queue.store.stats)}
+
+
+# ──────────────────────────────────────────────
+# Shared: cached candidate set
+# ──────────────────────────────────────────────
+
+async def _candidate_set(
+    request: RecommendationRequest,
+    hotels: Sequence[HotelInput],
+    fingerprint: Optional[str],
+) -> CandidateSet:
+    """Radius-filtered candidates for this event + hotel list, from cache when possible."""
+    event = request.event
+    key = (event.id, event.latitude, event.longitude, event.city, event.country,
+           fingerprint, request.radius_km)
+    cached = candidate_cache.get(key) if fingerprint else None
+    if cached is not None:
+        if len(hotels):
+            # Same ids/coords in the same order; use this request's hotel details
+            cached = cached.with_hotels(hotels)
+        return cached
+    if not len(hotels) and fingerprint:
+        raise HTTPException(
+            status_code=412,
+            detail="hotels_fingerprint is not cached (expired or unknown) — resend hotels",
+        )
+
+    if isinstance(hotels, list):
+        candidates = await _geocode_and_filter(event, hotels, request.radius_km)
+    else:
+        from hotel.columnar import geocode_and_filter_columns
+        candidates = await geocode_and_filter_columns(event, hotels, request.radius_km)
+
+    candidate_set = CandidateSet(candidates, hotels)
+    if fingerprint:
+        candidate_cache.put(key, candidate_set)
+    return candidate_set
+
+
 # ──────────────────────────────────────────────
 # Shared: geocode + Haversine radius filter
 # ──────────────────────────────────────────────
@@ -322,7 +691,7 @@ async def _geocode_and_filter(
     event: EventInput,
     hotels: List[HotelInput],
     radius_km: float,
-) -> List[dict]:
+) -> List[Candidate]:
     """Geocode missing coords, then filter hotels within radius of event."""
     event_lat = event.latitude
     event_lng = event.longitude
@@ -331,7 +700,7 @@ async def _geocode_and_filter(
         if event_lat is not None:
             event.latitude = event_lat
             event.longitude = event_lng
-            print(f"📍 Event geocoded to ({event_lat}, {event_lng})")
+            logger.debug(f"📍 Event geocoded to ({event_lat}, {event_lng})")
 
     geocoded_count = 0
     for h in hotels:
@@ -340,24 +709,25 @@ async def _geocode_and_filter(
             if h.latitude is not None:
                 geocoded_count += 1
     if geocoded_count:
-        print(f"📍 Geocoded {geocoded_count} hotels")
+        logger.debug(f"📍 Geocoded {geocoded_count} hotels")
 
     if not _coords_valid(event_lat, event_lng):
-        print("⚠️  Event has no coordinates — skipping distance filter")
-        return [{"hotel": h, "distance_from_event_km": 0.0} for h in hotels]
+        logger.warning("⚠️  Event has no coordinates — skipping distance filter")
+        return [Candidate(i, h.id, h.latitude, h.longitude, 0.0) for i, h in enumerate(hotels)]
 
     candidates = []
     skipped = 0
-    for h in hotels:
-        if not _coords_valid(h.latitude, h.longitude):
-            skipped += 1
-            continue
-        dist = haversine(event_lat, event_lng, h.latitude, h.longitude)
-        if dist <= radius_km:
-            candidates.append({"hotel": h, "distance_from_event_km": round(dist, 2)})
+    with span("haversine_filter"):
+        for i, h in enumerate(hotels):
+            if not _coords_valid(h.latitude, h.longitude):
+                skipped += 1
+                continue
+            dist = haversine(event_lat, event_lng, h.latitude, h.longitude)
+            if dist <= radius_km:
+                candidates.append(Candidate(i, h.id, h.latitude, h.longitude, round(dist, 2)))
     if skipped:
-        print(f"   ⚠️  Skipped {skipped} hotels with no coordinates")
-    print(f"   ✅ {len(candidates)} hotels within {radius_km} km radius")
+        logger.debug(f"⚠️  Skipped {skipped} hotels with no coordinates")
+    logger.debug(f"✅ {len(candidates)} hotels within {radius_km} km radius")
     return candidates
 
 
@@ -366,140 +736,180 @@ async def _geocode_and_filter(
 # ──────────────────────────────────────────────
 
 async def _recommend_by_distance(
-    candidates: List[dict],
-    selected: SelectedHotelInput,
-    hotels_within_radius: int,
-    total_candidates: int,
+    candidate_set: CandidateSet,
+    selected: List[SelectedHotelInput],
+    anchor: str,
     limit: int,
-) -> RecommendationResponse:
+    fingerprint: Optional[str] = None,
+) -> Ranking:
     """
-    A hotel is already selected — skip ML, just sort remaining
-    candidates by distance from the selected hotel so guests
-    stay close together.
+    Hotels are already selected — skip ML, just rank the other candidates
+    by distance from the selection so guests stay close together.
+    Distance rows come from the cached candidate set, so repeated calls
+    for the same event only sort.
     """
-    sel_lat = selected.latitude
-    sel_lng = selected.longitude
-    if not _coords_valid(sel_lat, sel_lng) and selected.city:
-        sel_lat, sel_lng = await geocode_city(selected.city, selected.country)
-        if sel_lat is not None:
-            print(f"📍 Selected hotel geocoded to ({sel_lat}, {sel_lng})")
-
-    if not _coords_valid(sel_lat, sel_lng):
-        print("⚠️  Selected hotel has no coordinates — falling back to event distance")
-        candidates.sort(key=lambda c: c["distance_from_event_km"])
+    hotels = candidate_set.hotels
+    located = []  # (selected hotel, lat, lng)
+    for s in selected:
+        sel_lat, sel_lng = s.latitude, s.longitude
+        if not _coords_valid(sel_lat, sel_lng) and s.city:
+            sel_lat, sel_lng = await geocode_city(s.city, s.country)
+            if sel_lat is not None:
+                logger.debug(f"📍 Selected hotel '{s.name}' geocoded to ({sel_lat}, {sel_lng})")
+        if _coords_valid(sel_lat, sel_lng):
+            located.append((s, sel_lat, sel_lng))
+
+    anchor_names = None  # per-candidate nearest selected hotel (nearest mode, >1 hotel)
+    role = "selected"
+    best_hotel_name = ", ".join(s.name for s in selected)
+    if not located:
+        logger.warning("⚠️  Selected hotel has no coordinates — falling back to event distance")
+        distance = np.zeros(len(candidate_set))
+        sort_key = candidate_set.distance_from_event
+    elif anchor == "centroid" and len(located) > 1:
+        role = "centroid"
+        centre = spherical_centroid([lat for _, lat, _ in located], [lng for _, _, lng in located])
+        distance = sort_key = candidate_set.distance_row(*centre)
     else:
-        for c in candidates:
-            h = c["hotel"]
-            if _coords_valid(h.latitude, h.longitude):
-                c["distance_from_selected_km"] = round(
-                    haversine(sel_lat, sel_lng, h.latitude, h.longitude), 2,
-                )
-            else:
-                c["distance_from_selected_km"] = 999.0
-        candidates.sort(key=lambda c: c.get("distance_from_selected_km", 999))
-
-    # Exclude the selected hotel itself from results
-    candidates = [c for c in candidates if c["hotel"].id != selected.id]
-
-    recommendations: List[RecommendedHotel] = []
-    for i, c in enumerate(candidates[:limit]):
-        h = c["hotel"]
-        dist_sel = c.get("distance_from_selected_km", 0.0)
-        dist_evt = c["distance_from_event_km"]
-
-        reasons = [
-            f"📍 {dist_sel} km from {selected.name} (selected hotel)",
-            f"📍 {dist_evt} km from event venue",
-        ]
-        if h.totalRooms > 0:
-            reasons.append(f"🏨 {h.totalRooms} rooms available")
-        if h.averageRating >= 4:
-            reasons.append(f"⭐ Highly rated ({h.averageRating}/5)")
-        if h.specialization:
-            reasons.append(f"🎪 Specializes in: {', '.join(h.specialization)}")
-
-        recommendations.append(
-            RecommendedHotel(
-                hotel_id=h.id,
-                hotel_name=h.name,
-                rank=i + 1,
-                is_best_match=False,
-                similarity_score=0.0,
-                distance_from_event_km=dist_evt,
-                distance_from_best_km=dist_sel,
-                reasons=reasons,
-                city=h.city,
-                country=h.country,
-                totalRooms=h.totalRooms,
-                specialization=h.specialization,
-                priceRange=h.priceRange,
-                averageRating=h.averageRating,
-            )
-        )
+        rows = np.stack([candidate_set.distance_row(lat, lng) for _, lat, lng in located])
+        nearest = rows.argmin(axis=0)
+        distance = sort_key = rows[nearest, np.arange(rows.shape[1])]
+        if len(located) > 1:
+            anchor_names = [s.name for s, _, _ in located]
+
+    # Exclude the selected hotels themselves, then take the top `limit`
+    # (ties keep input order, like a stable sort)
+    keys = sort_key.astype(np.float64, copy=True)
+    keys[candidate_set.positions(s.id for s in selected)] = np.inf
+    available = int(np.isfinite(keys).sum())
+    k = max(0, min(limit, available))
+    if k:
+        top = np.argpartition(keys, k - 1)[:k] if k < len(keys) else np.arange(len(keys))
+        order = top[np.lexsort((top, keys[top]))][:k]
+    else:
+        order = []
 
-    print(f"✅ Mode B: {len(recommendations)} hotels sorted by distance from '{selected.name}'")
-    return RecommendationResponse(
-        status="success",
-        recommendations=recommendations,
-        total_candidates=total_candidates,
-        hotels_within_radius=hotels_within_radius,
-        best_hotel_name=selected.name,
-    )
+    rows = []
+    for p in order:
+        c = candidate_set.candidate(int(p), float(distance[p]))
+        rows.append((c, role, anchor_names[nearest[p]] if anchor_names else best_hotel_name))
+
+    logger.info(f"✅ Mode B: {len(rows)} hotels sorted by distance from '{best_hotel_name}'")
+    return Ranking(rows, len(hotels), len(candidate_set), best_hotel_name, fingerprint, hotels)
 
 
 # ──────────────────────────────────────────────
-# Mode A: Full ML pipeline (first selection)
+# Shared: event ↔ hotel similarity from Qdrant
 # ──────────────────────────────────────────────
 
-async def _recommend_with_ml(
-    candidates: List[dict],
-    event: EventInput,
-    hotels_within_radius: int,
-    total_candidates: int,
-    limit: int,
-) -> RecommendationResponse:
-    """Full 4-step ML pipeline (distance filter already done)."""
-    candidate_id_set = {c["hotel"].id for c in candidates}
+class SimilarityUnavailable(Exception):
+    """Every Qdrant search failed — there is no similarity signal at all."""
+
 
-    # ── Step 2: Vector similarity search ──────────────────────────────
-    event_text = (
+def _event_text(event: EventInput) -> str:
+    return (
         f"Event Name: {event.name}. "
         f"Type: {event.type}. "
         f"Description: {event.description}. "
         f"Location: {event.city}, {event.country}."
     )
 
-    embedding_model = OpenAIEmbeddings(model="text-embedding-3-small")
-    event_vector = await embedding_model.aembed_query(event_text)
 
-    qdrant_url = os.getenv("QDRANT_URL")
-    qdrant_api_key = os.getenv("QDRANT_API_KEY")
-    client = QdrantClient(url=qdrant_url, api_key=qdrant_api_key)
+async def _similarity_scores(candidates: List[Candidate], event: EventInput) -> dict[str, float]:
+    """
+    Embed the event and score candidates against their activity centroid
+    (one point per hotel; candidates without one against their
+    `hotels_activity_vectors` point) and
+    `hotels_vectors` (averaged in).  Returns hotel id → similarity;
+    candidates Qdrant didn't return are absent.  Raises
+    SimilarityUnavailable when no search answered.
+    """
+    candidate_id_set = {c.id for c in candidates}
+    event_text = _event_text(event)
+
+    embedding_model = get_embeddings("text-embedding-3-small")
+    async with admission.bulkhead(admission.POOL_EMBEDDING):
+        with span("embedding", model="text-embedding-3-small"):
+            event_vector = await deadline.call(
+                "embedding.event", lambda: embedding_model.aembed_query(event_text),
+            )
 
-    hotel_similarity: dict[str, float] = {}
-    try:
-        search_results = client.query_points(
-            collection_name="hotels_activity_vectors",
-            query=event_vector,
-            limit=200,
-            with_payload=True,
-        ).points
-        for result in search_results:
-            hex_id = uuid_to_object_id(result.id)
-            if hex_id in candidate_id_set:
-                hotel_similarity[hex_id] = max(
-                    hotel_similarity.get(hex_id, 0), result.score,
-                )
-    except Exception as e:
-        logger.warning(f"Qdrant activity search failed: {e}")
+    client = get_vector_store()
 
+    hotel_similarity: dict[str, float] = {}
+    activity_answered = False
+    if await centroids_available(client):
+        try:
+            from qdrant_client import models
+
+            candidate_uuids = [object_id_to_uuid(i) for i in candidate_id_set if is_object_id(i)]
+            async with admission.bulkhead(admission.POOL_VECTOR_SEARCH):
+                with span("qdrant.hotels_activity_centroids"):
+                    centroid_results = (await deadline.call_sync(
+                        "qdrant.hotels_activity_centroids",
+                        client.query_points,
+                        collection_name=CENTROIDS_COLLECTION,
+                        query=event_vector,
+                        query_filter=models.Filter(must=[models.HasIdCondition(has_id=candidate_uuids)]),
+                        limit=max(len(candidate_uuids), 1),
+                    )).points
+            for result in centroid_results:
+                hotel_similarity[uuid_to_object_id(str(result.id))] = result.score
+            activity_answered = True
+        except (deadline.DeadlineExceeded, admission.Overloaded):
+            raise
+        except Exception as e:
+            logger.warning(f"Qdrant centroid search failed: {e}")
+
+    # Candidates without a centroid (never ingested; the backend still writes
+    # live activity only to hotels_activity_vectors) keep the per-hotel scan
+    missing = candidate_id_set.difference(hotel_similarity)
+    if missing:
+        try:
+            async with admission.bulkhead(admission.POOL_VECTOR_SEARCH):
+                with span("qdrant.hotels_activity_vectors"):
+                    search_results = (await deadline.call_sync(
+                        "qdrant.hotels_activity_vectors",
+                        client.query_points,
+                        collection_name="hotels_activity_vectors",
+                        query=event_vector,
+                        limit=200,
+                        with_payload=True,
+                    )).points
+            for result in search_results:
+                hex_id = uuid_to_object_id(result.id)
+                if hex_id in missing:
+                    hotel_similarity[hex_id] = max(
+                        hotel_similarity.get(hex_id, 0), result.score,
+                    )
+            activity_answered = True
+        except (deadline.DeadlineExceeded, admission.Overloaded):
+            raise
+        except Exception as e:
+            logger.warning(f"Qdrant activity search failed: {e}")
+
+    return await _add_profile_scores(client, event_vector, candidate_id_set, hotel_similarity, activity_answered)
+
+
+async def _add_profile_scores(
+    client,
+    event_vector,
+    candidate_id_set: set,
+    hotel_similarity: dict[str, float],
+    activity_answered: bool,
+) -> dict[str, float]:
+    """Average `hotels_vectors` profile similarity into the activity scores."""
     try:
-        profile_results = client.query_points(
-            collection_name="hotels_vectors",
-            query=event_vector,
-            limit=200,
-            with_payload=True,
-        ).points
+        async with admission.bulkhead(admission.POOL_VECTOR_SEARCH):
+            with span("qdrant.hotels_vectors"):
+                profile_results = (await deadline.call_sync(
+                    "qdrant.hotels_vectors",
+                    client.query_points,
+                    collection_name="hotels_vectors",
+                    query=event_vector,
+                    limit=200,
+                    with_payload=True,
+                )).points
         for result in profile_results:
             hex_id = uuid_to_object_id(result.id)
             if hex_id in candidate_id_set:
@@ -508,80 +918,223 @@ async def _recommend_with_ml(
                     hotel_similarity[hex_id] = (existing + result.score) / 2
                 else:
                     hotel_similarity[hex_id] = result.score
+    except (deadline.DeadlineExceeded, admission.Overloaded):
+        raise
     except Exception as e:
         logger.warning(f"Qdrant profile search failed: {e}")
+        if not activity_answered:
+            raise SimilarityUnavailable(f"Qdrant activity and profile searches failed: {e}")
 
-    for c in candidates:
-        c["similarity_score"] = round(hotel_similarity.get(c["hotel"].id, 0), 4)
+    return hotel_similarity
 
-    # ── Step 3: Best hotel ────────────────────────────────────────────
-    best_hotel = max(candidates, key=lambda c: c["similarity_score"])
-    if best_hotel["similarity_score"] <= 0:
-        best_hotel = min(candidates, key=lambda c: c["distance_from_event_km"])
 
-    best_lat = best_hotel["hotel"].latitude
-    best_lng = best_hotel["hotel"].longitude
+# ──────────────────────────────────────────────
+# Shared: similarity cache + time budget
+# ──────────────────────────────────────────────
+# Scores are cached per (event text, candidate ids) and computed once per
+# key at a time.  Callers wait up to a budget; the computation itself runs
+# in a task with its own deadline, so a caller that gives up (Mode A's
+# degraded answer) still leaves the cache warm for the next call.
+
+ML_BUDGET_MS = float(os.getenv("HOTEL_ML_BUDGET_MS", "2000"))
+BACKGROUND_SCORING_BUDGET_S = 30.0
+
+DEGRADED_RECOMMENDATIONS = Counter(
+    "mlserver_degraded_recommendations_total",
+    "Mode A answers ranked without similarity scores",
+    ["reason"],
+)
+
+
+class SimilarityCache:
+    """LRU of hotel id → similarity maps keyed by (event text, candidate ids)."""
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 900, name: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.name = name  # publishes / receives cross-worker clears under this name
+        self._entries: OrderedDict[str, tuple[float, dict[str, float]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if name:
+            invalidations.subscribe(name, lambda op, keys: self._clear())
+
+    @staticmethod
+    def key(candidates: Sequence[Candidate], event: EventInput) -> str:
+        h = hashlib.blake2b(_event_text(event).encode("utf-8"), digest_size=16)
+        h.update(b"\x00")
+        h.update("\x00".join(c.id for c in candidates).encode("utf-8"))
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[dict[str, float]]:
+        invalidations.poll()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or now - entry[0] > self.ttl_seconds:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, scores: dict[str, float]):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), scores)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def clear(self):
+        if self.name:
+            invalidations.publish(self.name, "clear")
+        self._clear()
+
+
+similarity_cache = SimilarityCache(
+    max_entries=int(os.getenv("HOTEL_SIMILARITY_CACHE_SIZE", "256")),
+    ttl_seconds=float(os.getenv("HOTEL_SIMILARITY_CACHE_TTL_SECONDS", "900")),
+    name="hotel.similarity_cache",
+)
+_similarity_inflight: dict[str, asyncio.Task] = {}
+
+
+async def _score_and_cache(key: str, candidates: List[Candidate], event: EventInput) -> dict[str, float]:
+    # Runs as its own task: outlive the request that started it
+    deadline.set_deadline(BACKGROUND_SCORING_BUDGET_S)
+    try:
+        scores = await _similarity_scores(candidates, event)
+        similarity_cache.put(key, scores)
+        return scores
+    finally:
+        _similarity_inflight.pop(key, None)
 
-    # ── Step 4: Sort remaining by distance from best ──────────────────
-    recommendations: List[RecommendedHotel] = []
-    recommendations.append(
-        RecommendedHotel(
-            hotel_id=best_hotel["hotel"].id,
-            hotel_name=best_hotel["hotel"].name,
-            rank=1,
-            is_best_match=True,
-            similarity_score=best_hotel["similarity_score"],
-            distance_from_event_km=best_hotel["distance_from_event_km"],
-            distance_from_best_km=0.0,
-            reasons=_generate_reasons(best_hotel, is_best=True),
-            city=best_hotel["hotel"].city,
-            country=best_hotel["hotel"].country,
-            totalRooms=best_hotel["hotel"].totalRooms,
-            specialization=best_hotel["hotel"].specialization,
-            priceRange=best_hotel["hotel"].priceRange,
-            averageRating=best_hotel["hotel"].averageRating,
-        )
-    )
 
-    remaining = [c for c in candidates if c["hotel"].id != best_hotel["hotel"].id]
+def _log_scoring_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"⚠️  Background similarity scoring failed: {task.exception()}")
+
+
+async def _similarity_within_budget(
+    candidates: List[Candidate],
+    event: EventInput,
+    budget_s: Optional[float],
+) -> Tuple[Optional[dict[str, float]], Optional[str]]:
+    """
+    (scores, None) from cache or a scoring run finished within `budget_s`
+    (None: no limit beyond the request deadline), else (None, reason) with
+    reason "timeout", "busy" (a bulkhead turned the scoring away) or "error".
+    """
+    key = SimilarityCache.key(candidates, event)
+    scores = similarity_cache.get(key)
+    if scores is not None:
+        return scores, None
+
+    task = _similarity_inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(_score_and_cache(key, candidates, event))
+        task.add_done_callback(_log_scoring_failure)
+        _similarity_inflight[key] = task
+
+    left = deadline.remaining()
+    if left is not None:
+        # Keep part of the request budget for ranking + the response
+        budget_s = left * 0.8 if budget_s is None else min(budget_s, left * 0.8)
+    try:
+        with span("similarity.wait"):
+            return await asyncio.wait_for(asyncio.shield(task), budget_s), None
+    except asyncio.TimeoutError:
+        return None, "timeout"
+    except admission.Overloaded:
+        return None, "busy"
+    except Exception as e:
+        logger.warning(f"⚠️  Similarity scoring failed: {e}")
+        return None, "error"
+
+
+# ──────────────────────────────────────────────
+# Mode A: Full ML pipeline (first selection)
+# ──────────────────────────────────────────────
+
+async def _recommend_with_ml(
+    candidates: List[Candidate],
+    hotels: Sequence[HotelInput],
+    event: EventInput,
+    limit: int,
+    fingerprint: Optional[str] = None,
+    ml_budget_s: Optional[float] = None,
+) -> Ranking:
+    """Full 4-step ML pipeline (distance filter already done)."""
+    # ── Step 2: Vector similarity search (within the ML budget) ───────
+    hotel_similarity, degraded_reason = await _similarity_within_budget(candidates, event, ml_budget_s)
+
+    # ── Step 3: Best hotel ────────────────────────────────────────────
+    if hotel_similarity is None:
+        DEGRADED_RECOMMENDATIONS.labels(degraded_reason).inc()
+        logger.warning(f"⚠️  Mode A degraded ({degraded_reason}) — ranking on local signals")
+        best = candidates[int(np.argmax(_local_scores(candidates, hotels, event)))]
+        best_role = "best_local"
+    else:
+        for c in candidates:
+            c.similarity_score = round(hotel_similarity.get(c.id, 0), 4)
+        best = max(candidates, key=lambda c: c.similarity_score)
+        if best.similarity_score <= 0:
+            best = min(candidates, key=lambda c: c.distance_from_event_km)
+        best_role = "best"
+    best.distance_from_best_km = 0.0
+    best_name = hotels[best.index].name
+
+    # ── Step 4: Sort remaining by distance from best ──────────────────
+    remaining = [c for c in candidates if c.id != best.id]
+    best_has_coords = _coords_valid(best.latitude, best.longitude)
     for c in remaining:
-        if _coords_valid(best_lat, best_lng) and _coords_valid(c["hotel"].latitude, c["hotel"].longitude):
-            c["distance_from_best_km"] = round(
-                haversine(best_lat, best_lng, c["hotel"].latitude, c["hotel"].longitude), 2,
+        if best_has_coords and _coords_valid(c.latitude, c.longitude):
+            c.distance_from_best_km = round(
+                haversine(best.latitude, best.longitude, c.latitude, c.longitude), 2,
             )
         else:
-            c["distance_from_best_km"] = 0.0
-    remaining.sort(key=lambda c: c["distance_from_best_km"])
-
-    for i, c in enumerate(remaining):
-        if len(recommendations) >= limit:
-            break
-        recommendations.append(
-            RecommendedHotel(
-                hotel_id=c["hotel"].id,
-                hotel_name=c["hotel"].name,
-                rank=i + 2,
-                is_best_match=False,
-                similarity_score=c["similarity_score"],
-                distance_from_event_km=c["distance_from_event_km"],
-                distance_from_best_km=c["distance_from_best_km"],
-                reasons=_generate_reasons(
-                    c, is_best=False, best_hotel_name=best_hotel["hotel"].name,
-                ),
-                city=c["hotel"].city,
-                country=c["hotel"].country,
-                totalRooms=c["hotel"].totalRooms,
-                specialization=c["hotel"].specialization,
-                priceRange=c["hotel"].priceRange,
-                averageRating=c["hotel"].averageRating,
-            )
-        )
+            c.distance_from_best_km = 0.0
+    remaining.sort(key=lambda c: c.distance_from_best_km)
+
+    rows = [(best, best_role, "")]
+    rows += [(c, "ranked", best_name) for c in remaining[: max(limit - 1, 0)]]
+
+    logger.info(f"✅ Mode A: {len(rows)} hotels (best={best_name})")
+    return Ranking(
+        rows, len(hotels), len(candidates), best_name, fingerprint, hotels,
+        degraded=hotel_similarity is None,
+    )
 
-    print(f"✅ Mode A: {len(recommendations)} hotels (best={best_hotel['hotel'].name})")
-    return RecommendationResponse(
-        status="success",
-        recommendations=recommendations,
-        total_candidates=total_candidates,
-        hotels_within_radius=hotels_within_radius,
-        best_hotel_name=best_hotel["hotel"].name,
+
+def _local_scores(candidates: List[Candidate], hotels: Sequence[HotelInput], event: EventInput) -> np.ndarray:
+    """
+    Degraded-mode score from what the request already carries: proximity to
+    the event (0.4), rating (0.25), events hosted (0.15, log-scaled,
+    saturating at 50) and a specialization matching the event type (0.2).
+    """
+    n = len(candidates)
+    distance = np.fromiter((c.distance_from_event_km for c in candidates), dtype=np.float64, count=n)
+    rating = np.empty(n)
+    hosted = np.empty(n)
+    type_match = np.zeros(n)
+    event_type = event.type.strip().lower()
+    for k, c in enumerate(candidates):
+        hotel = hotels[c.index]
+        rating[k] = hotel.averageRating
+        hosted[k] = hotel.eventsHostedCount
+        if event_type and any(event_type in s.lower() for s in hotel.specialization):
+            type_match[k] = 1.0
+    proximity = 1.0 - distance / max(float(distance.max(initial=0.0)), 1e-9)
+    return (
+        0.4 * proximity
+        + 0.25 * np.clip(rating / 5.0, 0.0, 1.0)
+        + 0.15 * np.minimum(np.log1p(np.maximum(hosted, 0)) / np.log1p(50), 1.0)
+        + 0.2 * type_match
     )
@@ -0,0 +1,244 @@
+"""
+/hotel/recommend response cache
+───────────────────────────────
+Page reloads, retries and several planners looking at the same event send
+identical recommendation requests.  Finished rankings are kept per request
+key, so a repeat skips geocoding, the event embedding, the Qdrant searches
+and the ranking.  The key is a blake2b digest of the canonical JSON of the
+event fields, the hotel-set fingerprint, the selected hotels and anchor,
+radius_km and limit.
+
+The cache stores the ranking (which candidates, in which order, with their
+scores and reason roles), not the rendered bytes.  Rows are rendered from
+the calling request's own hotel details and `?fields=` / `?compact=`, so
+those are not part of the key.  A stored ranking keeps only its returned
+rows' hotels (for callers that send just the fingerprint), never the
+request's full hotel list.
+
+  • single-flight   concurrent requests with the same key wait on one
+                    computation.  It runs as a shielded task, so the first
+                    caller going away doesn't fail the others
+  • degraded        answers are never cached; the next call retries the
+                    similarity scoring, whose own cache is warming
+  • TTL / LRU       HOTEL_RESPONSE_CACHE_TTL_SECONDS (default 300),
+                    HOTEL_RESPONSE_CACHE_MB (default 32, from an estimate
+                    of each ranking's rows and hotels)
+  • invalidation    activity ingest and centroid rebuilds clear it.
+                    POST /hotel/recommend/cache/invalidate drops entries by
+                    event id or hotel-set fingerprint, or clears everything
+                    (use that after hotels_vectors changes).  A computation
+                    that was running during an invalidation is not stored.
+                    With several workers, invalidations reach all of them
+                    (utils/invalidation.py)
+
+HOTEL_RESPONSE_CACHE=0 turns it off.  Lookups are counted in
+mlserver_hotel_response_cache_total{outcome}: hit, miss, coalesced, and
+degraded (computed but not stored).
+"""
+
+import asyncio
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Iterable, Mapping, Optional, Sequence, Union
+
+from prometheus_client import Counter
+
+from hotel.candidates import Candidate
+from utils.invalidation import invalidations
+
+logger = logging.getLogger("hotel_recommendation")
+
+LOOKUPS = Counter(
+    "mlserver_hotel_response_cache_total",
+    "/hotel/recommend response cache lookups by outcome (hit, miss, coalesced, degraded)",
+    ["outcome"],
+)
+
+
+@dataclass(slots=True)
+class Ranking:
+    """A ranked answer before rendering; rows are (candidate, reason role, anchor name)."""
+    rows: list[tuple[Candidate, str, str]]
+    total_candidates: int
+    hotels_within_radius: int
+    best_hotel_name: str
+    fingerprint: Optional[str]
+    # What the candidates' indices point into: the hotel list, or once
+    # cached only the rows' hotels keyed by index
+    hotels: Union[Sequence, Mapping]
+    degraded: bool = False
+
+
+# Rough heap cost of a cached row: Candidate + row tuple + index entry, and
+# the HotelInput with its dicts and boxed numbers (measured with tracemalloc)
+ROW_BYTES = 256
+HOTEL_BYTES = 1024
+
+
+def _compact(ranking: Ranking) -> tuple[Ranking, int]:
+    """The ranking holding only its rows' hotels → (ranking, approximate bytes)."""
+    hotels = {}
+    size = 512
+    for candidate, _, anchor_name in ranking.rows:
+        hotel = hotels[candidate.index] = ranking.hotels[candidate.index]
+        size += (
+            ROW_BYTES + HOTEL_BYTES + len(anchor_name)
+            + len(hotel.name) + len(hotel.city) + len(hotel.country)
+            + sum(64 + len(s) for s in hotel.specialization) + 96 * len(hotel.priceRange)
+        )
+    return dataclasses.replace(ranking, hotels=hotels), size
+
+
+def request_key(request, fingerprint: str) -> str:
+    """Canonical digest of a RecommendationRequest for a hotel-set fingerprint."""
+    canonical = json.dumps(
+        {
+            "event": request.event.model_dump(),
+            "hotels": fingerprint,
+            "selected": [s.model_dump() for s in request.all_selected()],
+            "anchor": request.selected_anchor,
+            "radius_km": request.radius_km,
+            "limit": request.limit,
+        },
+        sort_keys=True, separators=(",", ":"),
+    )
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class ResponseCache:
+    """LRU + TTL of rankings per request key, with single-flight computation."""
+
+    def __init__(
+        self, max_bytes: int = 32 << 20, ttl_seconds: float = 300, enabled: bool = True, name: Optional[str] = None,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self.name = name  # publishes / receives cross-worker invalidations under this name
+        # key -> (created, ranking, event id, approximate bytes)
+        self._entries: OrderedDict[str, tuple[float, Ranking, str, int]] = OrderedDict()
+        self._bytes = 0
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        if name:
+            invalidations.subscribe(name, self._apply)
+
+    # ── Entries ───────────────────────────────────────────────────────
+    def get(self, key: str) -> Optional[Ranking]:
+        invalidations.poll()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if now - entry[0] > self.ttl_seconds:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def _remove(self, key: str):
+        self._bytes -= self._entries.pop(key)[3]
+
+    def put(self, key: str, ranking: Ranking, event_id: str, generation: Optional[int] = None):
+        invalidations.poll()  # another worker's invalidation bumps the generation too
+        ranking, size = _compact(ranking)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return  # invalidated while it was being computed
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic(), ranking, event_id, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    # ── Single-flight ─────────────────────────────────────────────────
+    async def get_or_compute(
+        self, key: str, event_id: str, compute: Callable[[], Awaitable[Ranking]],
+    ) -> Ranking:
+        ranking = self.get(key)
+        if ranking is not None:
+            LOOKUPS.labels("hit").inc()
+            return ranking
+        task = self._inflight.get(key)
+        if task is None:
+            LOOKUPS.labels("miss").inc()
+            task = asyncio.create_task(self._compute(key, event_id, compute))
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        else:
+            LOOKUPS.labels("coalesced").inc()
+        return await asyncio.shield(task)
+
+    async def _compute(self, key: str, event_id: str, compute: Callable[[], Awaitable[Ranking]]) -> Ranking:
+        generation = self._generation
+        try:
+            ranking = await compute()
+            if ranking.degraded:
+                LOOKUPS.labels("degraded").inc()
+            else:
+                self.put(key, ranking, event_id, generation)
+            return ranking
+        finally:
+            self._inflight.pop(key, None)
+
+    # ── Invalidation ──────────────────────────────────────────────────
+    def _drop(self, match) -> int:
+        with self._lock:
+            self._generation += 1
+            stale = [k for k, (_, ranking, event_id, _) in self._entries.items() if match(ranking, event_id)]
+            for k in stale:
+                self._remove(k)
+        return len(stale)
+
+    def _apply(self, op: str, keys: list) -> int:
+        if op == "clear":
+            with self._lock:
+                self._generation += 1
+                dropped = len(self._entries)
+                self._entries.clear()
+                self._bytes = 0
+            return dropped
+        keys = set(keys)
+        if op == "events":
+            return self._drop(lambda ranking, event_id: event_id in keys)
+        if op == "fingerprints":
+            return self._drop(lambda ranking, event_id: ranking.fingerprint in keys)
+        return 0
+
+    def _invalidate(self, op: str, keys: Iterable[str] = ()) -> int:
+        keys = list(keys)
+        if self.name:
+            invalidations.publish(self.name, op, keys)
+        return self._apply(op, keys)
+
+    def invalidate_events(self, event_ids: Iterable[str]) -> int:
+        return self._invalidate("events", event_ids)
+
+    def invalidate_fingerprints(self, fingerprints: Iterable[str]) -> int:
+        return self._invalidate("fingerprints", fingerprints)
+
+    def clear(self):
+        self._invalidate("clear")
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "bytes": self._bytes, "in_flight": len(self._inflight)}
+
+
+response_cache = ResponseCache(
+    max_bytes=int(float(os.getenv("HOTEL_RESPONSE_CACHE_MB", "32")) * (1 << 20)),
+    ttl_seconds=float(os.getenv("HOTEL_RESPONSE_CACHE_TTL_SECONDS", "300")),
+    enabled=os.getenv("HOTEL_RESPONSE_CACHE", "1") == "1",
+    name="hotel.response_cache",
+)
@@ -1,17 +1,63 @@
+import asyncio
+import os
+import shutil
+import sys
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 import uvicorn
 
-# Register routers
+load_dotenv()
+
+from utils.log import configure_logging
+
+configure_logging()
+
+# Register routers (heavy dependencies are imported lazily inside them)
 from event.embedding import router as embedding_router
 from event.event_fetch import router as event_fetch_router
 from agent.routes import router as agent_router
 from hotel.recommendation import router as hotel_recommendation_router
+from hotel.allocation import router as hotel_allocation_router
+from hotel.activity_index import router as hotel_activity_router
+from hotel.precompute import PRECOMPUTE_ENABLED, precompute_queue
+from utils.deadline import DeadlineMiddleware
+from utils.metrics import MetricsMiddleware, metrics_router
+from utils.profiling import PROFILING_ENABLED, ProfilingMiddleware, profiling_router
+from utils.shared_arrays import shared_dir, worker_count
+from utils.vector_store import LOCAL_ENABLED as LOCAL_VECTORS_ENABLED, local_vectors
+from utils.warmup import readiness, warm_up, warmup_enabled
 
-load_dotenv()
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warmup_task = None
+    if warmup_enabled():
+        warmup_task = asyncio.create_task(warm_up())
+    else:
+        readiness.mark_all_ready()
+    if PRECOMPUTE_ENABLED:
+        precompute_queue.start()
+    if LOCAL_VECTORS_ENABLED:
+        local_vectors.start()
+
+    yield
+
+    if warmup_task is not None:
+        warmup_task.cancel()
+    await precompute_queue.close()
+    await local_vectors.close()
+    # Drain the mem0 write-behind queue and close MCP (only if the agent was used)
+    resolver = sys.modules.get("agent.query_resolver")
+    if resolver is not None:
+        await resolver.memory_writer.close()
+        await resolver.mcp_connection.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 
@@ -23,6 +69,10 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+app.add_middleware(DeadlineMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 
 
@@ -35,10 +85,29 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: 200 only once heavy modules and upstream clients are warm."""
+    return JSONResponse(readiness.report(), status_code=200 if readiness.ready else 503)
+
+app.include_router(metrics_router)
 app.include_router(embedding_router, prefix="/event")
 app.include_router(event_fetch_router, prefix="/event")
 app.include_router(agent_router, prefix="/agent")
 app.include_router(hotel_recommendation_router, prefix="/hotel")
+app.include_router(hotel_allocation_router, prefix="/hotel")
+app.include_router(hotel_activity_router, prefix="/hotel")
+if PROFILING_ENABLED:
+    app.include_router(profiling_router, prefix="/admin")
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8020)
\ No newline at end of file
+    workers = worker_count()
+    if workers > 1:
+        # Workers are separate processes: metrics are aggregated through files
+        prom_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(shared_dir(), "prometheus"))
+        shutil.rmtree(prom_dir, ignore_errors=True)
+        os.makedirs(prom_dir, exist_ok=True)
+        uvicorn.run("index:app", host="0.0.0.0", port=8020, workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8020)
@@ -0,0 +1,408 @@
+"""
+Local stand-ins for every upstream the ML server talks to
+─────────────────────────────────────────────────────────
+One FastAPI app emulates (paths don't collide, so a single port is enough):
+
+  • OpenAI     POST /v1/embeddings, /v1/chat/completions, /v1/responses
+  • Qdrant     the REST subset used by qdrant-client, langchain-qdrant and mem0
+               (collections, exists, upsert, query) with brute-force cosine search
+  • Nominatim  GET  /search
+  • Node API   GET  /api/hotel-proposals/microsite/{slug}/selected
+
+Each upstream sleeps according to a configurable latency distribution:
+    fixed:<ms> | uniform:<lo_ms>:<hi_ms> | lognormal:<median_ms>:<sigma>
+optionally followed by ",spike:<probability>:<ms>" for tail hiccups.
+
+Point the ML server at it with:
+    OPENAI_BASE_URL=http://127.0.0.1:9100/v1  OPENAI_API_KEY=mock
+    QDRANT_URL=http://127.0.0.1:9100  NOMINATIM_URL=http://127.0.0.1:9100/search
+    BACKEND_URL=http://127.0.0.1:9100
+
+Run standalone:
+    python -m loadtest.mock_upstreams --port 9100 --latency openai=lognormal:120:0.4
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+from fastapi import FastAPI, Request
+
+EMBEDDING_DIMS = {"text-embedding-3-large": 3072, "text-embedding-3-small": 1536}
+
+
+# ── Latency model ─────────────────────────────────────────────────────
+
+@dataclass
+class Latency:
+    kind: str = "fixed"
+    a: float = 0.0
+    b: float = 0.0
+    spike_p: float = 0.0
+    spike_ms: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "Latency":
+        main, _, spike = spec.partition(",spike:")
+        kind, *params = main.split(":")
+        lat = cls(kind, *(float(p) for p in params))
+        if spike:
+            p, ms = spike.split(":")
+            lat.spike_p, lat.spike_ms = float(p), float(ms)
+        return lat
+
+    def sample_ms(self) -> float:
+        if self.kind == "uniform":
+            ms = random.uniform(self.a, self.b)
+        elif self.kind == "lognormal":
+            ms = random.lognormvariate(np.log(max(self.a, 0.001)), self.b)
+        else:
+            ms = self.a
+        if self.spike_p and random.random() < self.spike_p:
+            ms += self.spike_ms
+        return ms
+
+    async def wait(self):
+        ms = self.sample_ms()
+        if ms > 0:
+            await asyncio.sleep(ms / 1000)
+
+
+DEFAULT_LATENCY = {
+    "openai_embeddings": "lognormal:90:0.35",
+    "openai_chat": "lognormal:700:0.4",
+    "qdrant": "lognormal:8:0.5",
+    "nominatim": "lognormal:250:0.5",
+    "backend": "lognormal:40:0.4",
+}
+
+
+def _unit_vector(key: str, dim: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(key.encode("utf-8")).digest()[:8], "little")
+    v = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return v / np.linalg.norm(v)
+
+
+# ── In-memory Qdrant ──────────────────────────────────────────────────
+
+class _Collection:
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.ids: list = []
+        self.index: dict = {}
+        self.payloads: list[dict] = []
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+
+    def upsert(self, points: list[dict]):
+        new_vectors = []
+        for p in points:
+            vec = np.asarray(p["vector"], dtype=np.float32)
+            norm = np.linalg.norm(vec)
+            vec = vec / norm if norm else vec
+            if p["id"] in self.index:
+                i = self.index[p["id"]]
+                self.vectors[i] = vec
+                self.payloads[i] = p.get("payload") or {}
+            else:
+                self.index[p["id"]] = len(self.ids)
+                self.ids.append(p["id"])
+                self.payloads.append(p.get("payload") or {})
+                new_vectors.append(vec)
+        if new_vectors:
+            self.vectors = np.vstack([self.vectors, np.stack(new_vectors)])
+
+    def query(self, vector, limit: int) -> list[dict]:
+        if not self.ids:
+            return []
+        q = np.asarray(vector, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        scores = self.vectors @ q
+        top = np.argsort(scores)[::-1][:limit]
+        return [
+            {"id": self.ids[i], "version": 0, "score": float(scores[i]),
+             "payload": self.payloads[i], "vector": None}
+            for i in top
+        ]
+
+
+def _collection_info(col: _Collection) -> dict:
+    return {
+        "status": "green", "optimizer_status": "ok",
+        "points_count": len(col.ids), "indexed_vectors_count": len(col.ids), "segments_count": 1,
+        "config": {
+            "params": {"vectors": {"size": col.dim, "distance": "Cosine"}, "shard_number": 1,
+                       "replication_factor": 1, "write_consistency_factor": 1, "on_disk_payload": True},
+            "hnsw_config": {"m": 16, "ef_construct": 100, "full_scan_threshold": 10000},
+            "optimizer_config": {"deleted_threshold": 0.2, "vacuum_min_vector_number": 1000,
+                                 "default_segment_number": 0, "flush_interval_sec": 5},
+            "wal_config": {"wal_capacity_mb": 32, "wal_segments_ahead": 0},
+        },
+        "payload_schema": {},
+    }
+
+
+def _ok(result, started: float) -> dict:
+    return {"result": result, "status": "ok", "time": time.perf_counter() - started}
+
+
+# ── App factory ───────────────────────────────────────────────────────
+
+def create_app(
+    latency: Optional[dict[str, str]] = None,
+    n_events: int = 300,
+    n_hotels: int = 2000,
+    seed: int = 5,
+) -> FastAPI:
+    specs = {**DEFAULT_LATENCY, **(latency or {})}
+    lat = {name: Latency.parse(spec) for name, spec in specs.items()}
+    collections: dict[str, _Collection] = {}
+    app = FastAPI(title="SyncStay upstream mocks")
+    app.state.counters = {name: 0 for name in lat}
+
+    def hit(name: str):
+        app.state.counters[name] += 1
+        return lat[name].wait()
+
+    # Seed collections shaped like production
+    rng = random.Random(seed)
+    events = _Collection(EMBEDDING_DIMS["text-embedding-3-large"])
+    events.upsert([
+        {
+            "id": str(uuid.UUID(int=i)),
+            "vector": _unit_vector(f"event-{i}", events.dim),
+            "payload": {"page_content": f"Event {i}", "metadata": {
+                "id": f"{i:024x}", "name": f"Event {i}", "type": rng.choice(["conference", "seminar", "wedding"]),
+                "location": "Panaji, India", "startDate": "2027-08-12", "endDate": "2027-08-14",
+                "customSlug": f"event-{i}",
+            }},
+        }
+        for i in range(n_events)
+    ])
+    collections["events_vectors"] = events
+    for name in ("hotels_vectors", "hotels_activity_vectors"):
+        col = _Collection(EMBEDDING_DIMS["text-embedding-3-small"])
+        col.upsert([
+            {
+                "id": str(uuid.UUID(hex=f"{h:024x}".ljust(32, "0"))),
+                "vector": _unit_vector(f"{name}-{h}", col.dim),
+                "payload": {"hotelId": f"{h:024x}"},
+            }
+            for h in range(n_hotels)
+        ])
+        collections[name] = col
+
+    # ── OpenAI ────────────────────────────────────────────────────────
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        await hit("openai_embeddings")
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        if inputs and isinstance(inputs[0], int):  # a single pre-tokenised input
+            inputs = [inputs]
+        dim = body.get("dimensions") or EMBEDDING_DIMS.get(body.get("model"), 1536)
+        data = []
+        for i, item in enumerate(inputs):
+            vec = _unit_vector(json.dumps(item), dim)
+            emb = base64.b64encode(vec.tobytes()).decode() if body.get("encoding_format") == "base64" else vec.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": emb})
+        return {"object": "list", "data": data, "model": body.get("model"),
+                "usage": {"prompt_tokens": 8 * len(inputs), "total_tokens": 8 * len(inputs)}}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        await hit("openai_chat")
+        # mem0 fact extraction / update expect JSON; nothing to remember keeps it cheap
+        content = '{"facts": []}' if body.get("response_format") else "OK"
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "object": "chat.completion",
+            "created": int(time.time()), "model": body.get("model", "mock"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": 50, "completion_tokens": 5, "total_tokens": 55},
+        }
+
+    @app.post("/v1/responses")
+    async def responses(request: Request):
+        body = await request.json()
+        await hit("openai_chat")
+        inputs = body.get("input") if isinstance(body.get("input"), list) else []
+        tool_names = {t.get("name") for t in body.get("tools") or []}
+        has_tool_output = any(isinstance(i, dict) and i.get("type") == "function_call_output" for i in inputs)
+        fmt = ((body.get("text") or {}).get("format") or {}).get("type")
+
+        if fmt == "json_schema":  # guardrail classifiers
+            output = [_message('{"is_safe": true, "reason": "ok"}')]
+        elif "search_events" in tool_names and not has_tool_output:
+            last_user = next((i.get("content") for i in reversed(inputs)
+                              if isinstance(i, dict) and i.get("role") == "user"), "events")
+            output = [{
+                "type": "function_call", "id": f"fc_{uuid.uuid4().hex[:8]}",
+                "call_id": f"call_{uuid.uuid4().hex[:8]}", "name": "search_events",
+                "arguments": json.dumps({"query": str(last_user), "top_k": 5}), "status": "completed",
+            }]
+        else:
+            output = [_message("Here are some events that match your request.")]
+
+        return {
+            "id": f"resp_{uuid.uuid4().hex[:12]}", "object": "response", "created_at": int(time.time()),
+            "model": body.get("model", "mock"), "status": "completed", "output": output,
+            "parallel_tool_calls": True, "tool_choice": "auto", "tools": [],
+            "usage": {"input_tokens": 400, "output_tokens": 40, "total_tokens": 440,
+                      "input_tokens_details": {"cached_tokens": 0},
+                      "output_tokens_details": {"reasoning_tokens": 0}},
+        }
+
+    # ── Qdrant ────────────────────────────────────────────────────────
+    @app.get("/")
+    async def qdrant_root():
+        return {"title": "qdrant - vector search engine (mock)", "version": "1.15.0"}
+
+    @app.get("/collections")
+    async def list_collections():
+        started = time.perf_counter()
+        await hit("qdrant")
+        return _ok({"collections": [{"name": n} for n in collections]}, started)
+
+    @app.get("/collections/{name}/exists")
+    async def collection_exists(name: str):
+        started = time.perf_counter()
+        await hit("qdrant")
+        return _ok({"exists": name in collections}, started)
+
+    @app.get("/collections/{name}")
+    async def get_collection(name: str):
+        started = time.perf_counter()
+        await hit("qdrant")
+        if name not in collections:
+            from fastapi.responses import JSONResponse
+            return JSONResponse({"status": {"error": f"Collection `{name}` doesn't exist!"}, "time": 0}, 404)
+        return _ok(_collection_info(collections[name]), started)
+
+    @app.put("/collections/{name}")
+    async def create_collection(name: str, request: Request):
+        started = time.perf_counter()
+        body = await request.json()
+        await hit("qdrant")
+        vectors = body.get("vectors") or {}
+        collections.setdefault(name, _Collection(int(vectors.get("size", 1536))))
+        return _ok(True, started)
+
+    @app.put("/collections/{name}/points")
+    async def upsert(name: str, request: Request):
+        started = time.perf_counter()
+        body = await request.json()
+        await hit("qdrant")
+        points = body.get("points")
+        if points is None and "batch" in body:  # column-oriented batch format
+            b = body["batch"]
+            payloads = b.get("payloads") or [{}] * len(b["ids"])
+            points = [{"id": i, "vector": v, "payload": p} for i, v, p in zip(b["ids"], b["vectors"], payloads)]
+        col = collections.setdefault(name, _Collection(len(points[0]["vector"]) if points else 1536))
+        col.upsert(points or [])
+        return _ok({"operation_id": 0, "status": "completed"}, started)
+
+    @app.post("/collections/{name}/points/query")
+    async def query_points(name: str, request: Request):
+        started = time.perf_counter()
+        body = await request.json()
+        await hit("qdrant")
+        col = collections.get(name)
+        query = body.get("query")
+        if isinstance(query, dict):  # {"nearest": [...]} form
+            query = query.get("nearest") or query.get("vector")
+        points = col.query(query, int(body.get("limit", 10))) if col and query else []
+        return _ok({"points": points}, started)
+
+    @app.post("/collections/{name}/points/search")
+    async def search_points(name: str, request: Request):
+        started = time.perf_counter()
+        body = await request.json()
+        await hit("qdrant")
+        col = collections.get(name)
+        vector = body["vector"]["vector"] if isinstance(body["vector"], dict) else body["vector"]
+        return _ok(col.query(vector, int(body.get("limit", 10))) if col else [], started)
+
+    @app.api_route("/collections/{name}/{rest:path}", methods=["GET", "POST", "PUT", "DELETE"])
+    async def qdrant_other(name: str, rest: str):
+        """Payload indexes, scroll, delete … — acknowledged but not modelled."""
+        started = time.perf_counter()
+        await hit("qdrant")
+        if rest.startswith("points/scroll"):
+            return _ok({"points": [], "next_page_offset": None}, started)
+        return _ok({"operation_id": 0, "status": "completed"}, started)
+
+    # ── Nominatim ─────────────────────────────────────────────────────
+    @app.get("/search")
+    async def nominatim(q: str = ""):
+        await hit("nominatim")
+        key = int(hashlib.md5(q.lower().encode()).hexdigest()[:8], 16)
+        return [{"lat": str(15.0 + (key % 1000) / 1000), "lon": str(73.5 + (key // 1000 % 1000) / 1000),
+                 "display_name": q}]
+
+    # ── Node backend ──────────────────────────────────────────────────
+    @app.get("/api/hotel-proposals/microsite/{slug}/selected")
+    async def selected_hotels(slug: str):
+        await hit("backend")
+        return {"success": True, "message": "ok", "data": [
+            {
+                "hotelName": f"Hotel {i} ({slug})", "totalRoomsOffered": 40 + i,
+                "totalEstimatedCost": 250000 + 1000 * i,
+                "pricing": {"singleRoom": {"pricePerNight": 4500, "availableRooms": 20},
+                            "doubleRoom": {"pricePerNight": 6500, "availableRooms": 15}},
+                "facilities": {"conferenceRoom": True, "pool": True},
+                "amenities": ["WiFi", "Breakfast"], "additionalServices": {},
+            }
+            for i in range(3)
+        ]}
+
+    @app.get("/_mock/counters")
+    async def counters():
+        return app.state.counters
+
+    return app
+
+
+def _message(text: str) -> dict:
+    return {
+        "type": "message", "id": f"msg_{uuid.uuid4().hex[:8]}", "status": "completed", "role": "assistant",
+        "content": [{"type": "output_text", "text": text, "annotations": []}],
+    }
+
+
+def parse_latency_args(items: list[str]) -> dict[str, str]:
+    """['openai_chat=fixed:200', ...] → {'openai_chat': 'fixed:200'}"""
+    out = {}
+    for item in items or []:
+        name, _, spec = item.partition("=")
+        if name not in DEFAULT_LATENCY:
+            raise SystemExit(f"Unknown upstream '{name}' (choose from {', '.join(DEFAULT_LATENCY)})")
+        out[name] = spec
+    return out
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", action="append", help="upstream=distribution (repeatable)")
+    parser.add_argument("--events", type=int, default=300)
+    parser.add_argument("--hotels", type=int, default=2000)
+    args = parser.parse_args()
+
+    app = create_app(parse_latency_args(args.latency), n_events=args.events, n_hotels=args.hotels)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+End-to-end load test for the ML server
+──────────────────────────────────────
+Closed-loop load generator (k6/locust style): at each concurrency level,
+N virtual users per endpoint send requests back-to-back for a fixed
+duration.  Reports throughput, errors and p50/p95/p99 per endpoint.
+
+With --spawn, the upstream mocks (loadtest/mock_upstreams.py) and an ML
+server wired to them are started automatically, so no OpenAI credits are
+used and Nominatim is never hit:
+
+    python -m loadtest.run --spawn --concurrency 1,8,32 --duration 20
+    python -m loadtest.run --spawn --latency openai_chat=lognormal:900:0.5,spike:0.02:5000
+    python -m loadtest.run --target http://127.0.0.1:8020 --endpoints hotel_recommend
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+
+import httpx
+
+ML_SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+QUERIES = [
+    "network seminar in Pune next month",
+    "wedding venues in Goa in December",
+    "tech conference in Bangalore",
+    "music concert this weekend in Mumbai",
+    "startup expo in Delhi between 12/08/2027 to 14/08/2027",
+]
+
+
+# ── Request builders ──────────────────────────────────────────────────
+
+def _event_fetch(rng: random.Random) -> tuple[str, str, dict]:
+    return "POST", "/event/fetch", {"query": rng.choice(QUERIES), "top_k": 5}
+
+
+def _hotel_recommend(rng: random.Random, n_hotels: int) -> tuple[str, str, dict]:
+    hotels = [
+        {
+            "id": f"{h:024x}", "name": f"Hotel {h}",
+            "latitude": 15.49 + rng.uniform(-0.05, 0.05), "longitude": 73.83 + rng.uniform(-0.05, 0.05),
+            "city": "Panaji", "country": "India", "totalRooms": rng.randint(20, 300),
+            "specialization": ["conference"], "priceRange": {"min": 2000, "max": 8000},
+            "averageRating": round(rng.uniform(3, 5), 1), "eventsHostedCount": rng.randint(0, 50),
+        }
+        for h in range(n_hotels)
+    ]
+    event = {"id": f"{rng.randint(0, 10**6):024x}", "name": "Load Test Summit", "type": "conference",
+             "description": "A synthetic event", "latitude": 15.49, "longitude": 73.83,
+             "city": "Panaji", "country": "India"}
+    return "POST", "/hotel/recommend", {"event": event, "hotels": hotels, "radius_km": 5.0, "limit": 10}
+
+
+def _agent_query(rng: random.Random) -> tuple[str, str, dict]:
+    return "POST", "/agent/query", {"user_id": f"load-{rng.randint(0, 200)}", "query": rng.choice(QUERIES)}
+
+
+# ── Measurement ───────────────────────────────────────────────────────
+
+@dataclass
+class Stats:
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+
+    def summary(self, elapsed: float) -> dict:
+        lat = sorted(self.latencies)
+
+        def pct(p):
+            return round(lat[min(len(lat) - 1, int(p * len(lat)))] * 1000, 1) if lat else None
+
+        return {
+            "requests": len(lat) + self.errors,
+            "errors": self.errors,
+            "rps": round(len(lat) / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": pct(0.50), "p95_ms": pct(0.95), "p99_ms": pct(0.99),
+        }
+
+
+async def _virtual_user(client, build, stats: Stats, stop_at: float, seed: int):
+    rng = random.Random(seed)
+    while time.perf_counter() < stop_at:
+        method, path, body = build(rng)
+        started = time.perf_counter()
+        try:
+            resp = await client.request(method, path, json=body)
+            if resp.status_code >= 400:
+                stats.errors += 1
+                continue
+        except httpx.HTTPError:
+            stats.errors += 1
+            continue
+        stats.latencies.append(time.perf_counter() - started)
+
+
+async def run_level(target: str, builders: dict, concurrency: int, duration: float) -> dict:
+    limits = httpx.Limits(max_connections=concurrency * len(builders) + 10)
+    async with httpx.AsyncClient(base_url=target, timeout=120.0, limits=limits) as client:
+        stats = {name: Stats() for name in builders}
+        started = time.perf_counter()
+        stop_at = started + duration
+        await asyncio.gather(*(
+            _virtual_user(client, build, stats[name], stop_at, seed=hash((name, i)))
+            for name, build in builders.items()
+            for i in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+    return {name: s.summary(elapsed) for name, s in stats.items()}
+
+
+# ── Process management for --spawn ───────────────────────────────────
+
+def _wait_until_up(url: str, timeout: float = 60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=2).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.3)
+    raise SystemExit(f"{url} did not come up within {timeout}s")
+
+
+def spawn(mock_port: int, ml_port: int, latency: list[str]) -> list[subprocess.Popen]:
+    mock_cmd = [sys.executable, "-m", "loadtest.mock_upstreams", "--port", str(mock_port)]
+    for item in latency or []:
+        mock_cmd += ["--latency", item]
+    mock = subprocess.Popen(mock_cmd, cwd=ML_SERVER_DIR)
+    _wait_until_up(f"http://127.0.0.1:{mock_port}/")
+
+    upstream = f"http://127.0.0.1:{mock_port}"
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": "mock", "OPENAI_BASE_URL": f"{upstream}/v1",
+        "QDRANT_URL": upstream, "QDRANT_API_KEY": "",
+        "NOMINATIM_URL": f"{upstream}/search", "BACKEND_URL": upstream,
+        "ML_SERVER_URL": f"http://127.0.0.1:{ml_port}",
+        "LOG_LEVEL": "WARNING",
+        "OPENAI_AGENTS_DISABLE_TRACING": "1",
+    }
+    ml = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "index:app", "--port", str(ml_port), "--log-level", "warning"],
+        cwd=ML_SERVER_DIR, env=env,
+    )
+    _wait_until_up(f"http://127.0.0.1:{ml_port}/health")
+    return [ml, mock]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", default="http://127.0.0.1:8020")
+    parser.add_argument("--endpoints", default="event_fetch,hotel_recommend,agent_query")
+    parser.add_argument("--concurrency", default="1,4,16,64")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per concurrency level")
+    parser.add_argument("--hotels", type=int, default=500, help="Hotels per /hotel/recommend request")
+    parser.add_argument("--spawn", action="store_true", help="Start mocks + ML server locally")
+    parser.add_argument("--mock-port", type=int, default=9100)
+    parser.add_argument("--ml-port", type=int, default=8021)
+    parser.add_argument("--latency", action="append", help="Mock latency, upstream=distribution (repeatable)")
+    parser.add_argument("--output", help="Write the report JSON here")
+    args = parser.parse_args()
+
+    all_builders = {
+        "event_fetch": _event_fetch,
+        "hotel_recommend": lambda rng: _hotel_recommend(rng, args.hotels),
+        "agent_query": _agent_query,
+    }
+    builders = {name: all_builders[name] for name in args.endpoints.split(",") if name}
+
+    procs = []
+    target = args.target
+    if args.spawn:
+        procs = spawn(args.mock_port, args.ml_port, args.latency)
+        target = f"http://127.0.0.1:{args.ml_port}"
+
+    report = {}
+    try:
+        print(f"{'conc':>5} {'endpoint':18} {'reqs':>7} {'err':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for level in (int(c) for c in args.concurrency.split(",")):
+            results = asyncio.run(run_level(target, builders, level, args.duration))
+            report[level] = results
+            for name, r in results.items():
+                print(f"{level:>5} {name:18} {r['requests']:>7} {r['errors']:>5} {r['rps']:>8} "
+                      f"{r['p50_ms']!s:>9} {r['p95_ms']!s:>9} {r['p99_ms']!s:>9}")
+    finally:
+        for p in procs:
+            p.terminate()
+            p.wait(timeout=10)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+import json
 import httpx
 from dotenv import load_dotenv
 from mcp.server.fastmcp import FastMCP
@@ -8,53 +9,190 @@ load_dotenv(os.path.join(os.path.dirname(__file__), "..", ".env"))
 
 ML_SERVER_URL = os.getenv("ML_SERVER_URL", "http://localhost:8020")
 BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:5001")
+# The agent's MCP session waits slightly longer than this (agent/query_resolver.py)
+TOOL_TIMEOUT_SECONDS = float(os.getenv("MCP_TOOL_TIMEOUT_SECONDS", "15"))
+# Plain rows / one JSON object per hotel instead of emoji markdown (fewer prompt
+# tokens, see scripts/prompt_budget_report.py); 0 restores the markdown
+COMPACT_OUTPUT = os.getenv("MCP_COMPACT_OUTPUT", "1") == "1"
+COMPACT_EVENT_FIELDS = "id,name,type,location,startDate,endDate,customSlug,percentage_similarity"
 
 mcp = FastMCP("SyncStay Event Search")
 
+# One pooled client for every tool call: the tools are async, so the MCP
+# server runs concurrent agent requests' calls side by side instead of one
+# blocking request at a time
+http = httpx.AsyncClient(
+    timeout=TOOL_TIMEOUT_SECONDS,
+    limits=httpx.Limits(max_connections=64, max_keepalive_connections=16),
+)
+
+
+# ─────────────────────────────────────────────
+# Tool output formatting
+# ─────────────────────────────────────────────
+def _json_line(obj: dict) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def _compact_event(event: dict) -> str:
+    return " | ".join(str(v).replace("|", "/") for v in (
+        event["id"],
+        event["name"],
+        event["type"],
+        event["location"],
+        f"{event['startDate'][:10]}..{event['endDate'][:10]}",
+        event.get("customSlug", ""),
+        event["percentage_similarity"],
+    ))
+
+
+def _compact_hotel(hotel: dict) -> dict:
+    prices = {}
+    for room_type, label in [("singleRoom", "single"), ("doubleRoom", "double"), ("suite", "suite")]:
+        room = (hotel.get("pricing") or {}).get(room_type) or {}
+        if room.get("availableRooms", 0) > 0:
+            prices[label] = [room.get("pricePerNight"), room["availableRooms"]]
+    services = [
+        (val.get("description", key) if isinstance(val, dict) else val)
+        for key, val in (hotel.get("additionalServices") or {}).items()
+        if (isinstance(val, dict) and val.get("available")) or (isinstance(val, str) and val)
+    ]
+    row = {
+        "hotel": hotel.get("hotelName", "Unknown Hotel"),
+        "rooms": hotel.get("totalRoomsOffered"),
+        "prices": prices,
+        "total": hotel.get("totalEstimatedCost"),
+        "amenities": hotel.get("amenities") or [],
+        "facilities": [key.replace("Room", " Room") for key, val in (hotel.get("facilities") or {}).items() if val],
+        "services": services,
+        "offer": hotel.get("specialOffer", ""),
+        "notes": hotel.get("notes", ""),
+    }
+    return {k: v for k, v in row.items() if v not in (None, "", [], {})}
+
+
+def format_events(events: list, compact: bool) -> str:
+    if not events:
+        return "No matching events found for your query."
+    if compact:
+        return "\n".join([
+            f"{len(events)} event(s); event page is /microsite/<slug>",
+            "id | name | type | location | dates | slug | similarity %",
+            *(_compact_event(e) for e in events),
+        ])
+
+    lines = [f"Found {len(events)} matching event(s):\n"]
+    for i, event in enumerate(events, 1):
+        slug = event.get('customSlug', '')
+        microsite_url = event.get('micrositeUrl', '')
+        block = (
+            f"{i}. **{event['name']}** ({event['type']})\n"
+            f"   📍 Location: {event['location']}\n"
+            f"   📅 {event['startDate']} → {event['endDate']}\n"
+            f"   🎯 Similarity: {event['percentage_similarity']}%\n"
+            f"   🆔 ID: {event['id']}\n"
+        )
+        if slug:
+            block += f"   🔗 Slug: {slug}\n"
+        if microsite_url:
+            block += f"   🌐 Event Page: {microsite_url}\n"
+        lines.append(block)
+
+    return "\n".join(lines)
+
+
+def format_hotels(hotels: list, message: str, compact: bool) -> str:
+    if not hotels:
+        return f"No hotels have been selected for this event yet. {message}"
+    if compact:
+        return "\n".join([
+            f"{len(hotels)} hotel(s); prices in INR per night, [price, rooms available]:",
+            *(_json_line(_compact_hotel(h)) for h in hotels),
+        ])
+
+    lines = [f"Found {len(hotels)} hotel(s) for this event:\n"]
+    for i, hotel in enumerate(hotels, 1):
+        name = hotel.get("hotelName", "Unknown Hotel")
+        rooms = hotel.get("totalRoomsOffered", "N/A")
+        total_cost = hotel.get("totalEstimatedCost", "N/A")
+        special_offer = hotel.get("specialOffer", "")
+        notes = hotel.get("notes", "")
+
+        # Pricing breakdown per room type
+        pricing = hotel.get("pricing", {})
+        pricing_lines = []
+        for room_type, label in [("singleRoom", "Single Room"), ("doubleRoom", "Double Room"), ("suite", "Suite")]:
+            room = pricing.get(room_type, {})
+            if room and room.get("availableRooms", 0) > 0:
+                price = room.get("pricePerNight", "N/A")
+                avail = room.get("availableRooms", 0)
+                pricing_lines.append(f"{label}: ₹{price}/night ({avail} rooms)")
+        pricing_str = " | ".join(pricing_lines) if pricing_lines else "Contact hotel"
+
+        # Facilities (object of booleans)
+        facilities_obj = hotel.get("facilities", {})
+        facility_names = [key.replace("Room", " Room") for key, val in facilities_obj.items() if val]
+
+        # Amenities (array of strings)
+        amenities = hotel.get("amenities", [])
+
+        # Additional services (nested object)
+        additional_obj = hotel.get("additionalServices", {})
+        additional_lines = []
+        for svc_key, svc_val in additional_obj.items():
+            if isinstance(svc_val, dict) and svc_val.get("available"):
+                desc = svc_val.get("description", svc_key)
+                additional_lines.append(desc)
+            elif isinstance(svc_val, str) and svc_val:
+                additional_lines.append(svc_val)
+
+        lines.append(
+            f"{i}. 🏨 **{name}**\n"
+            f"   🛏️ Rooms Offered: {rooms}\n"
+            f"   💰 Pricing: {pricing_str}\n"
+            f"   💵 Total Estimated Cost: ₹{total_cost}\n"
+        )
+        if amenities:
+            lines.append(f"   ✨ Amenities: {', '.join(amenities)}\n")
+        if facility_names:
+            lines.append(f"   🏢 Facilities: {', '.join(facility_names)}\n")
+        if additional_lines:
+            lines.append(f"   🎁 Additional Services: {', '.join(additional_lines)}\n")
+        if special_offer:
+            lines.append(f"   🎉 Special Offer: {special_offer}\n")
+        if notes:
+            lines.append(f"   📝 Notes: {notes}\n")
+
+    return "\n".join(lines)
+
 
 @mcp.tool()
-def search_events(query: str, top_k: int = 5) -> str:
+async def search_events(query: str, top_k: int = 5) -> str:
     """
     Search for public events matching a natural language query.
 
     Args:
         query: A natural language description of the event you're looking for.
                Example: "i want to attend a network related seminar between 12/08/2027 to 14/08/2027"
+               Dates (DD/MM/YYYY, "12 Aug 2027", "August 2027", ranges) and city names
+               in the query are applied as filters, so only matching events come back.
         top_k: Number of top matching events to return (default 5).
 
     Returns:
         A formatted string listing the most similar events with details and similarity scores.
     """
     try:
-        response = httpx.post(
+        response = await http.post(
             f"{ML_SERVER_URL}/event/fetch",
             json={"query": query, "top_k": top_k},
-            timeout=60.0,
+            params={"fields": COMPACT_EVENT_FIELDS} if COMPACT_OUTPUT else None,
+            # Pass the budget on so /event/fetch gives up when we do
+            headers={"X-Request-Deadline-Ms": str(int(TOOL_TIMEOUT_SECONDS * 1000))},
         )
         response.raise_for_status()
         events = response.json()
 
-        if not events:
-            return "No matching events found for your query."
-
-        lines = [f"Found {len(events)} matching event(s):\n"]
-        for i, event in enumerate(events, 1):
-            slug = event.get('customSlug', '')
-            microsite_url = event.get('micrositeUrl', '')
-            block = (
-                f"{i}. **{event['name']}** ({event['type']})\n"
-                f"   📍 Location: {event['location']}\n"
-                f"   📅 {event['startDate']} → {event['endDate']}\n"
-                f"   🎯 Similarity: {event['percentage_similarity']}%\n"
-                f"   🆔 ID: {event['id']}\n"
-            )
-            if slug:
-                block += f"   🔗 Slug: {slug}\n"
-            if microsite_url:
-                block += f"   🌐 Event Page: {microsite_url}\n"
-            lines.append(block)
-
-        return "\n".join(lines)
+        return format_events(events, COMPACT_OUTPUT)
 
     except httpx.HTTPStatusError as e:
         return f"Error from ML server: {e.response.status_code} — {e.response.text}"
@@ -65,7 +203,7 @@ def search_events(query: str, top_k: int = 5) -> str:
 
 
 @mcp.tool()
-def get_event_hotels(event_slug: str) -> str:
+async def get_event_hotels(event_slug: str) -> str:
     """
     Get the selected hotels and booking options for a specific event using its microsite slug.
 
@@ -83,9 +221,8 @@ def get_event_hotels(event_slug: str) -> str:
         A formatted string listing all selected hotels with pricing, rooms, amenities, and facilities.
     """
     try:
-        response = httpx.get(
+        response = await http.get(
             f"{BACKEND_URL}/api/hotel-proposals/microsite/{event_slug}/selected",
-            timeout=60.0,
         )
         response.raise_for_status()
         result = response.json()
@@ -93,64 +230,7 @@ def get_event_hotels(event_slug: str) -> str:
         if not result.get("success"):
             return result.get("message", "Failed to fetch hotel data.")
 
-        hotels = result.get("data", [])
-        if not hotels:
-            return f"No hotels have been selected for this event yet. {result.get('message', '')}"
-
-        lines = [f"Found {len(hotels)} hotel(s) for this event:\n"]
-        for i, hotel in enumerate(hotels, 1):
-            name = hotel.get("hotelName", "Unknown Hotel")
-            rooms = hotel.get("totalRoomsOffered", "N/A")
-            total_cost = hotel.get("totalEstimatedCost", "N/A")
-            special_offer = hotel.get("specialOffer", "")
-            notes = hotel.get("notes", "")
-
-            # Pricing breakdown per room type
-            pricing = hotel.get("pricing", {})
-            pricing_lines = []
-            for room_type, label in [("singleRoom", "Single Room"), ("doubleRoom", "Double Room"), ("suite", "Suite")]:
-                room = pricing.get(room_type, {})
-                if room and room.get("availableRooms", 0) > 0:
-                    price = room.get("pricePerNight", "N/A")
-                    avail = room.get("availableRooms", 0)
-                    pricing_lines.append(f"{label}: ₹{price}/night ({avail} rooms)")
-            pricing_str = " | ".join(pricing_lines) if pricing_lines else "Contact hotel"
-
-            # Facilities (object of booleans)
-            facilities_obj = hotel.get("facilities", {})
-            facility_names = [key.replace("Room", " Room") for key, val in facilities_obj.items() if val]
-
-            # Amenities (array of strings)
-            amenities = hotel.get("amenities", [])
-
-            # Additional services (nested object)
-            additional_obj = hotel.get("additionalServices", {})
-            additional_lines = []
-            for svc_key, svc_val in additional_obj.items():
-                if isinstance(svc_val, dict) and svc_val.get("available"):
-                    desc = svc_val.get("description", svc_key)
-                    additional_lines.append(desc)
-                elif isinstance(svc_val, str) and svc_val:
-                    additional_lines.append(svc_val)
-
-            lines.append(
-                f"{i}. 🏨 **{name}**\n"
-                f"   🛏️ Rooms Offered: {rooms}\n"
-                f"   💰 Pricing: {pricing_str}\n"
-                f"   💵 Total Estimated Cost: ₹{total_cost}\n"
-            )
-            if amenities:
-                lines.append(f"   ✨ Amenities: {', '.join(amenities)}\n")
-            if facility_names:
-                lines.append(f"   🏢 Facilities: {', '.join(facility_names)}\n")
-            if additional_lines:
-                lines.append(f"   🎁 Additional Services: {', '.join(additional_lines)}\n")
-            if special_offer:
-                lines.append(f"   🎉 Special Offer: {special_offer}\n")
-            if notes:
-                lines.append(f"   📝 Notes: {notes}\n")
-
-        return "\n".join(lines)
+        return format_hotels(result.get("data", []), result.get("message", ""), COMPACT_OUTPUT)
 
     except httpx.HTTPStatusError as e:
         return f"Error from backend: {e.response.status_code} — {e.response.text}"
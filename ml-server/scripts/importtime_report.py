@@ -0,0 +1,98 @@
+"""
+Import-time profile for the ML server
+─────────────────────────────────────
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter and
+summarises the slowest imports, so cold-start regressions are visible.
+
+Usage (from ml-server/):
+    python scripts/importtime_report.py                      # profile `index`
+    python scripts/importtime_report.py --module agent.query_resolver --top 30
+    python scripts/importtime_report.py --json > importtime.json
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+ML_SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# "import time:       123 |       4567 |   package.module"
+_LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def profile_imports(module: str) -> tuple[float, list[dict]]:
+    """Import *module* in a subprocess; return (wall seconds, per-import rows)."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ML_SERVER_DIR,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = _LINE_RE.match(line)
+        if not m:
+            continue
+        self_us, cumulative_us, indent, name = m.groups()
+        rows.append({
+            "module": name,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+            "depth": (len(indent) - 1) // 2,
+        })
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr[-2000:])
+        raise SystemExit(f"Importing '{module}' failed (exit {proc.returncode})")
+
+    target = next((r for r in rows if r["module"] == module), None)
+    total_ms = target["cumulative_ms"] if target else sum(r["self_ms"] for r in rows)
+    return total_ms / 1000, rows
+
+
+def top_level_packages(rows: list[dict]) -> list[dict]:
+    """Sum self time by top-level package (langchain, qdrant_client, ...)."""
+    totals: dict[str, float] = {}
+    for r in rows:
+        pkg = r["module"].split(".")[0]
+        totals[pkg] = totals.get(pkg, 0.0) + r["self_ms"]
+    return [
+        {"package": pkg, "self_ms": round(ms, 1)}
+        for pkg, ms in sorted(totals.items(), key=lambda kv: kv[1], reverse=True)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="index", help="Module to import (default: index)")
+    parser.add_argument("--top", type=int, default=20, help="Rows to show per table")
+    parser.add_argument("--json", action="store_true", help="Emit machine-readable JSON")
+    args = parser.parse_args()
+
+    total_s, rows = profile_imports(args.module)
+    packages = top_level_packages(rows)
+    slowest = sorted(rows, key=lambda r: r["cumulative_ms"], reverse=True)
+
+    if args.json:
+        print(json.dumps({
+            "module": args.module,
+            "total_seconds": round(total_s, 4),
+            "packages": packages[: args.top],
+            "imports": slowest[: args.top],
+        }, indent=2))
+        return
+
+    print(f"Import of '{args.module}': {total_s * 1000:.1f} ms total, {len(rows)} modules\n")
+    print(f"{'package':40} {'self ms':>10}")
+    for p in packages[: args.top]:
+        print(f"{p['package']:40} {p['self_ms']:>10.1f}")
+    print(f"\n{'module (slowest cumulative)':60} {'cum ms':>10} {'self ms':>10}")
+    for r in slowest[: args.top]:
+        print(f"{r['module'][:60]:60} {r['cumulative_ms']:>10.1f} {r['self_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Agent prompt size report: before / after the token budget
+─────────────────────────────────────────────────────────
+Builds one representative agent turn from synthetic data: five chat
+exchanges with event-list answers, five memories, a search_events call and
+a get_event_hotels call.  It counts the tokens the model is sent
+
+  before  history formatted into the instructions *and* sent as messages,
+          untrimmed memories, markdown tool outputs
+  after   history sent once and trimmed to AGENT_PROMPT_HISTORY_TOKENS,
+          memories trimmed to AGENT_PROMPT_MEMORY_TOKENS, compact tool outputs
+
+With --live N (needs OPENAI_API_KEY) both prompts are also sent N times to
+the chat model with max_tokens=1.  The median latency is then mostly the
+prefill cost of the extra tokens.
+
+Usage (from ml-server/):
+    python scripts/prompt_budget_report.py
+    python scripts/prompt_budget_report.py --live 10 --model gpt-4.1 --json
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import time
+
+ML_SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ML_SERVER_DIR)
+
+from agent import prompt_budget  # noqa: E402
+from agent.query_resolver import SYSTEM_INSTRUCTIONS, _history_text  # noqa: E402
+
+# The instructions' history section as it was before the budget
+OLD_HISTORY_SECTION = """
+RECENT CONVERSATION (last few messages for short-term context):
+{chat_history}
+"""
+
+
+def _load_tools():
+    path = os.path.join(ML_SERVER_DIR, "mcp-server", "event.py")
+    spec = importlib.util.spec_from_file_location("mcp_event_tools", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def sample_events(n: int = 5) -> list[dict]:
+    cities = ["Pune", "Mumbai", "Goa", "Bengaluru", "Delhi"]
+    return [
+        {
+            "id": f"{0x65a000000000000000000000 + i:024x}",
+            "name": f"Cloud Networking Summit {2027 + i % 2}",
+            "type": "conference",
+            "location": f"Convention Centre, {cities[i % len(cities)]}, India",
+            "startDate": "2027-08-12T04:30:00.000Z",
+            "endDate": "2027-08-14T12:30:00.000Z",
+            "customSlug": f"cloud-networking-summit-{1771170534178 + i}",
+            "micrositeUrl": f"/microsite/cloud-networking-summit-{1771170534178 + i}",
+            "percentage_similarity": round(71.5 - 3.2 * i, 2),
+        }
+        for i in range(n)
+    ]
+
+
+def sample_hotels(n: int = 3) -> list[dict]:
+    return [
+        {
+            "hotelName": f"Seaside Grand {i}",
+            "totalRoomsOffered": 40 + 10 * i,
+            "totalEstimatedCost": 185000 + 20000 * i,
+            "pricing": {
+                "singleRoom": {"pricePerNight": 4200 + 300 * i, "availableRooms": 12},
+                "doubleRoom": {"pricePerNight": 5600 + 300 * i, "availableRooms": 20},
+                "suite": {"pricePerNight": 11000, "availableRooms": 0},
+            },
+            "facilities": {"conferenceRoom": True, "banquetHall": i % 2 == 0, "pool": True},
+            "amenities": ["Free WiFi", "Breakfast included", "Airport shuttle"],
+            "additionalServices": {
+                "transport": {"available": True, "description": "Venue shuttle every 30 minutes"},
+                "catering": {"available": False},
+            },
+            "specialOffer": "10% off for bookings before July" if i == 0 else "",
+            "notes": "",
+        }
+        for i in range(n)
+    ]
+
+
+def build_turn(tools, compact: bool) -> dict:
+    events, hotels = sample_events(), sample_hotels()
+    history = []
+    for i in range(5):
+        history.append({"role": "user", "content": f"any networking conferences in august, option {i}?"})
+        history.append({"role": "assistant", "content": "Here is what I found:\n" + tools.format_events(events, False)})
+    memories = [
+        "Prefers conferences about cloud networking and SRE",
+        "Usually travels from Mumbai",
+        "Prefers cloud networking and SRE conferences",
+        "Budget up to ₹6000 per night",
+        "Attended DevOps Days Pune in 2026",
+    ]
+    return {
+        "history": history,
+        "memories": memories,
+        "query": "show me hotels for the first one",
+        "tool_outputs": [tools.format_events(events, compact), tools.format_hotels(hotels, "", compact)],
+    }
+
+
+def assemble(turn: dict, budgeted: bool) -> list[dict]:
+    """The chat messages the agent model receives for this turn."""
+    if budgeted:
+        history = prompt_budget.trim_history(turn["history"])
+        memories = prompt_budget.trim_memories(turn["memories"])
+        instructions = SYSTEM_INSTRUCTIONS.format(memory_context="\n".join(f"- {m}" for m in memories))
+    else:
+        history = turn["history"]
+        instructions = (SYSTEM_INSTRUCTIONS + OLD_HISTORY_SECTION).format(
+            memory_context="\n".join(f"- {m}" for m in turn["memories"]),
+            chat_history=_history_text(history),
+        )
+    return (
+        [{"role": "system", "content": instructions}]
+        + history
+        + [{"role": "user", "content": turn["query"]}]
+        + [{"role": "user", "content": f"[tool output]\n{out}"} for out in turn["tool_outputs"]]
+    )
+
+
+def count(messages: list[dict]) -> int:
+    return sum(prompt_budget.count_tokens(m["content"]) + prompt_budget.MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def time_live(messages: list[dict], model: str, repeats: int) -> float:
+    from openai import OpenAI
+    client = OpenAI()
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        client.chat.completions.create(model=model, messages=messages, max_tokens=1)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--live", type=int, default=0, help="Send each prompt N times and time it")
+    parser.add_argument("--model", default="gpt-4.1")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    try:
+        prompt_budget.load_encoding()
+        counter = f"tiktoken {prompt_budget.ENCODING}"
+    except Exception as e:
+        counter = f"≈{prompt_budget._CHARS_PER_TOKEN} chars/token (tiktoken unavailable: {type(e).__name__})"
+
+    tools = _load_tools()
+    before = assemble(build_turn(tools, compact=False), budgeted=False)
+    after = assemble(build_turn(tools, compact=True), budgeted=True)
+    report = {
+        "counter": counter,
+        "before": {"messages": len(before), "prompt_tokens": count(before)},
+        "after": {"messages": len(after), "prompt_tokens": count(after)},
+        "tool_output_tokens": {
+            "markdown": sum(prompt_budget.count_tokens(m["content"]) for m in before[-2:]),
+            "compact": sum(prompt_budget.count_tokens(m["content"]) for m in after[-2:]),
+        },
+    }
+    if args.live:
+        report["before"]["median_ms"] = round(time_live(before, args.model, args.live), 1)
+        report["after"]["median_ms"] = round(time_live(after, args.model, args.live), 1)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"token counter: {counter}\n")
+    print(f"{'':10} {'messages':>9} {'prompt tokens':>14} {'median ms':>10}")
+    for name in ("before", "after"):
+        r = report[name]
+        ms = f"{r['median_ms']:>10.1f}" if "median_ms" in r else f"{'-':>10}"
+        print(f"{name:10} {r['messages']:>9} {r['prompt_tokens']:>14} {ms}")
+    saved = report["before"]["prompt_tokens"] - report["after"]["prompt_tokens"]
+    print(f"\nsaved {saved} tokens ({saved / report['before']['prompt_tokens']:.0%}); tool outputs "
+          f"{report['tool_output_tokens']['markdown']} → {report['tool_output_tokens']['compact']} tokens")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+event/query_parser.py
+─────────────────────
+/event/fetch filters on whatever parse_query extracts, so a pattern that
+stops matching drops valid events and one that over-matches filters on a
+date or city the user never asked for.
+
+    python -m pytest tests          (from ml-server/)
+"""
+
+from datetime import date
+
+import pytest
+
+from event.query_parser import city_names, parse_query
+
+
+# ── Dates ──────────────────────────────────────────────────────────────
+
+@pytest.mark.parametrize("query, text, date_from, date_to", [
+    ("music festivals on 12/08/2027", "music festivals", date(2027, 8, 12), date(2027, 8, 12)),
+    ("tech meetups 2027-08-12", "tech meetups", date(2027, 8, 12), date(2027, 8, 12)),
+    ("12/13/2027 hackathon", "hackathon", date(2027, 12, 13), date(2027, 12, 13)),  # only month-first is valid
+    ("events between 12 Aug 2027 and 20 Aug 2027", "events", date(2027, 8, 12), date(2027, 8, 20)),
+    ("conferences from 1/9/2027 to 15/9/2027", "conferences", date(2027, 9, 1), date(2027, 9, 15)),
+    ("food fairs 12-14 August 2027", "food fairs", date(2027, 8, 12), date(2027, 8, 14)),
+    ("concerts in Aug 2027", "concerts", date(2027, 8, 1), date(2027, 8, 31)),
+    ("hackathons in February 2028", "hackathons", date(2028, 2, 1), date(2028, 2, 29)),
+])
+def test_dates(query, text, date_from, date_to):
+    parsed = parse_query(query)
+    assert (parsed.text, parsed.date_from, parsed.date_to) == (text, date_from, date_to)
+
+
+@pytest.mark.parametrize("query, date_from, date_to", [
+    ("art shows after 1 March 2027", date(2027, 3, 1), None),
+    ("workshops before Dec 5, 2027", None, date(2027, 12, 5)),
+])
+def test_open_ended_dates(query, date_from, date_to):
+    parsed = parse_query(query)
+    assert (parsed.date_from, parsed.date_to) == (date_from, date_to)
+
+
+# ── Cities ─────────────────────────────────────────────────────────────
+
+def test_city_alias_is_canonical():
+    parsed = parse_query("startup events in Bangalore")
+    assert parsed.text == "startup events"
+    assert parsed.cities == ["Bengaluru"]
+    assert "Bangalore" in city_names("Bengaluru")
+
+
+def test_cities_and_dates_together():
+    parsed = parse_query("art shows in Bengaluru or Mumbai after 1 March 2027")
+    assert parsed.text == "art shows"
+    assert parsed.cities == ["Bengaluru", "Mumbai"]
+    assert (parsed.date_from, parsed.date_to) == (date(2027, 3, 1), None)
+
+
+# ── Rejects ────────────────────────────────────────────────────────────
+
+@pytest.mark.parametrize("query", [
+    "may i see comedy nights",
+    "march past parade",
+    "events on 31/02/2027",
+    "comedy nights",
+])
+def test_no_constraints(query):
+    parsed = parse_query(query)
+    assert not parsed.has_constraints
+    assert parsed.text == query
+
+
+def test_month_word_with_city_keeps_the_word():
+    parsed = parse_query("may i see events in Pune")
+    assert parsed.text == "may i see events"
+    assert parsed.cities == ["Pune"]
+    assert (parsed.date_from, parsed.date_to) == (None, None)
@@ -0,0 +1,277 @@
+"""
+Admission control: bulkheads and per-user limits
+────────────────────────────────────────────────
+  • bulkhead(pool)    — bounded concurrency per kind of work, so one kind
+                        can't take every connection / thread in the process:
+
+                          pool            limit  queue  queue timeout
+                          agent               8     16        5000 ms
+                          embedding          16     64        1000 ms
+                          vector_search      32    128        1000 ms
+                          geocode             2      8        3000 ms
+
+                        (ML_BULKHEAD_<POOL>, ML_BULKHEAD_<POOL>_QUEUE,
+                        ML_BULKHEAD_<POOL>_TIMEOUT_MS).  A call beyond the
+                        limit waits in a FIFO queue; a full queue or a wait
+                        past the queue timeout raises Overloaded.  The wait
+                        is also clipped to the request deadline; running
+                        out of deadline while queued raises DeadlineExceeded.
+  • user_limiter      — per user_id for /agent/query: at most
+                        AGENT_USER_MAX_IN_FLIGHT concurrent queries (2) and a
+                        token bucket of AGENT_USER_RATE_PER_MIN (20) refilling
+                        up to AGENT_USER_BURST (5).  Checked before the agent
+                        bulkhead, so a tenant over its share is turned away
+                        without queueing.
+
+Overloaded is an HTTPException(429) with a Retry-After header, so the
+routers' `except HTTPException: raise` passes it through.  Retry-After is
+the token bucket's refill time, or the pool's recent mean hold time scaled
+by the queue ahead.  Hotel similarity scoring treats it like any other
+scoring failure and answers degraded.
+
+Metrics: mlserver_bulkhead_in_flight{pool}, mlserver_bulkhead_queue_depth{pool},
+mlserver_bulkhead_queue_wait_seconds{pool} and
+mlserver_admission_rejected_total{pool,reason}.  Limits are per process:
+with ML_WORKERS > 1 each worker admits its own share.  ML_ADMISSION=0
+turns everything off.
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import HTTPException
+from prometheus_client import Counter, Gauge, Histogram
+
+from utils import deadline
+
+ADMISSION_ENABLED = os.getenv("ML_ADMISSION", "1") == "1"
+
+POOL_AGENT = "agent"
+POOL_EMBEDDING = "embedding"
+POOL_VECTOR_SEARCH = "vector_search"
+POOL_GEOCODE = "geocode"
+
+# pool -> (limit, queue, queue timeout ms)
+_POOL_DEFAULTS = {
+    POOL_AGENT: (8, 16, 5000),
+    POOL_EMBEDDING: (16, 64, 1000),
+    POOL_VECTOR_SEARCH: (32, 128, 1000),
+    POOL_GEOCODE: (2, 8, 3000),
+}
+
+USER_MAX_IN_FLIGHT = int(os.getenv("AGENT_USER_MAX_IN_FLIGHT", "2"))
+USER_RATE_PER_MIN = float(os.getenv("AGENT_USER_RATE_PER_MIN", "20"))
+USER_BURST = float(os.getenv("AGENT_USER_BURST", "5"))
+_MAX_TRACKED_USERS = 10000
+
+IN_FLIGHT = Gauge(
+    "mlserver_bulkhead_in_flight",
+    "Calls holding a bulkhead slot",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+QUEUE_DEPTH = Gauge(
+    "mlserver_bulkhead_queue_depth",
+    "Calls waiting for a bulkhead slot",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+QUEUE_WAIT = Histogram(
+    "mlserver_bulkhead_queue_wait_seconds",
+    "Time spent waiting for a bulkhead slot",
+    ["pool"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+REJECTED = Counter(
+    "mlserver_admission_rejected_total",
+    "Calls turned away with 429 (queue_full, queue_timeout, user_concurrency, user_rate)",
+    ["pool", "reason"],
+)
+
+
+class Overloaded(HTTPException):
+    def __init__(self, pool: str, reason: str, retry_after_s: float):
+        REJECTED.labels(pool, reason).inc()
+        self.pool = pool
+        self.reason = reason
+        super().__init__(
+            status_code=429,
+            detail=f"Too many requests ({pool}: {reason.replace('_', ' ')})",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after_s)))},
+        )
+
+
+# ──────────────────────────────────────────────
+# Bulkheads
+# ──────────────────────────────────────────────
+
+class Bulkhead:
+    """
+    An asyncio semaphore with a bounded FIFO queue and a queue timeout.
+    Slots are handed straight to the next waiter on release, so a new
+    arrival can't overtake the queue.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, queue_timeout_s: float):
+        self.name = name
+        self.limit = max(1, limit)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout_s = queue_timeout_s
+        self._active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._mean_hold_s = 0.1  # EWMA of slot hold time, for Retry-After
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> float:
+        return self._mean_hold_s * (len(self._waiters) + 1) / self.limit
+
+    async def acquire(self):
+        if self._active < self.limit and not self._waiters:
+            self._active += 1
+            IN_FLIGHT.labels(self.name).inc()
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise Overloaded(self.name, "queue_full", self.retry_after())
+
+        wait_s = self.queue_timeout_s
+        left = deadline.remaining()
+        deadline_bound = left is not None and left < wait_s
+        if deadline_bound:
+            wait_s = max(0.0, left)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        QUEUE_DEPTH.labels(self.name).inc()
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), wait_s)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # the slot arrived as we gave up: pass it on
+            else:
+                waiter.cancel()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            if deadline_bound:
+                raise deadline.DeadlineExceeded(f"{self.name}.queue")
+            raise Overloaded(self.name, "queue_timeout", self.retry_after())
+        finally:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+            QUEUE_DEPTH.labels(self.name).dec()
+            QUEUE_WAIT.labels(self.name).observe(time.perf_counter() - started)
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # the slot moves over; _active is unchanged
+                return
+        self._active -= 1
+        IN_FLIGHT.labels(self.name).dec()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._mean_hold_s += 0.2 * (time.perf_counter() - started - self._mean_hold_s)
+            self.release()
+
+
+def _pool_config(name: str) -> tuple[int, int, float]:
+    limit, queue, timeout_ms = _POOL_DEFAULTS[name]
+    env = f"ML_BULKHEAD_{name.upper()}"
+    return (
+        int(os.getenv(env, str(limit))),
+        int(os.getenv(f"{env}_QUEUE", str(queue))),
+        float(os.getenv(f"{env}_TIMEOUT_MS", str(timeout_ms))) / 1000,
+    )
+
+
+bulkheads = {name: Bulkhead(name, *_pool_config(name)) for name in _POOL_DEFAULTS}
+
+
+@asynccontextmanager
+async def bulkhead(pool: str):
+    """Hold a slot of *pool* for the body of the block."""
+    if not ADMISSION_ENABLED:
+        yield
+        return
+    async with bulkheads[pool].slot():
+        yield
+
+
+# ──────────────────────────────────────────────
+# Per-user limits
+# ──────────────────────────────────────────────
+
+class UserLimiter:
+    """Per-user in-flight cap and token bucket (event-loop only, no locking)."""
+
+    def __init__(self, pool: str, max_in_flight: int, rate_per_min: float, burst: float):
+        self.pool = pool
+        self.max_in_flight = max_in_flight
+        self.rate_per_s = rate_per_min / 60
+        self.burst = max(1.0, burst)
+        self._in_flight: dict[str, int] = {}
+        self._buckets: OrderedDict[str, list[float]] = OrderedDict()  # user -> [tokens, updated]
+
+    def _take_token(self, user_id: str) -> Optional[float]:
+        """None when a token was taken, else seconds until one is available."""
+        if self.rate_per_s <= 0:
+            return None
+        now = time.monotonic()
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = self._buckets[user_id] = [self.burst, now]
+            while len(self._buckets) > _MAX_TRACKED_USERS:
+                self._buckets.popitem(last=False)
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate_per_s)
+            bucket[1] = now
+            self._buckets.move_to_end(user_id)
+        if bucket[0] < 1:
+            return (1 - bucket[0]) / self.rate_per_s
+        bucket[0] -= 1
+        return None
+
+    @asynccontextmanager
+    async def admit(self, user_id: str):
+        if not ADMISSION_ENABLED:
+            yield
+            return
+        running = self._in_flight.get(user_id, 0)
+        if self.max_in_flight > 0 and running >= self.max_in_flight:
+            raise Overloaded(self.pool, "user_concurrency", bulkheads[self.pool].retry_after())
+        wait_s = self._take_token(user_id)
+        if wait_s is not None:
+            raise Overloaded(self.pool, "user_rate", wait_s)
+        self._in_flight[user_id] = running + 1
+        try:
+            yield
+        finally:
+            left = self._in_flight[user_id] - 1
+            if left:
+                self._in_flight[user_id] = left
+            else:
+                del self._in_flight[user_id]
+
+
+user_limiter = UserLimiter(POOL_AGENT, USER_MAX_IN_FLIGHT, USER_RATE_PER_MIN, USER_BURST)
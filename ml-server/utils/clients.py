@@ -0,0 +1,52 @@
+"""
+Shared, lazily created upstream clients
+───────────────────────────────────────
+Heavy SDKs (langchain_openai, qdrant_client) are imported and their clients
+constructed on first use instead of at module import, so the app starts
+fast and still boots when Qdrant is unreachable.  Clients are reused
+across requests instead of being rebuilt per call.
+"""
+
+import os
+import threading
+
+_lock = threading.Lock()
+_qdrant_client = None
+_embeddings: dict = {}
+
+
+def get_qdrant_client():
+    """Return the process-wide QdrantClient (QDRANT_URL / QDRANT_API_KEY)."""
+    global _qdrant_client
+    if _qdrant_client is None:
+        with _lock:
+            if _qdrant_client is None:
+                from qdrant_client import QdrantClient
+                _qdrant_client = QdrantClient(
+                    url=os.getenv("QDRANT_URL"),
+                    api_key=os.getenv("QDRANT_API_KEY"),
+                )
+    return _qdrant_client
+
+
+def get_embeddings(model: str):
+    """Return a cached OpenAIEmbeddings instance for *model*."""
+    embedding = _embeddings.get(model)
+    if embedding is None:
+        with _lock:
+            embedding = _embeddings.get(model)
+            if embedding is None:
+                from langchain_openai import OpenAIEmbeddings
+                embedding = _embeddings[model] = OpenAIEmbeddings(model=model)
+    return embedding
+
+
+def set_qdrant_client(client):
+    """Replace the shared Qdrant client (e.g. QdrantClient(":memory:") in benchmarks)."""
+    global _qdrant_client
+    _qdrant_client = client
+
+
+def set_embeddings(model: str, embedding):
+    """Replace the shared embeddings object used for *model*."""
+    _embeddings[model] = embedding
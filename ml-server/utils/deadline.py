@@ -0,0 +1,253 @@
+"""
+Request deadlines and hedged upstream calls
+───────────────────────────────────────────
+  • DeadlineMiddleware — gives every request a deadline: the remaining budget
+                         in the `X-Request-Deadline-Ms` header (a caller
+                         forwarding its own deadline), else
+                         ML_REQUEST_DEADLINE_MS (default 30000), capped at
+                         ML_REQUEST_DEADLINE_MAX_MS.  It lives in a
+                         contextvar, so tasks spawned by the request inherit it.
+  • call / call_sync   — run one upstream call (embedding, Qdrant, …) within
+                         the remaining budget.  Idempotent reads are hedged:
+                         if the first attempt is still running after the
+                         stage's observed p95, a duplicate is sent and
+                         whichever finishes first wins.
+  • bounded / timeout  — bound a whole awaitable (the agent run), or get an
+                         httpx timeout clipped to the budget (Nominatim).
+
+Running out of budget raises DeadlineExceeded, an HTTPException(504), so the
+routers' `except HTTPException: raise` lets it through unchanged.
+
+Hedging (ML_HEDGING, default on) needs HEDGE_MIN_SAMPLES latencies for a
+stage before it kicks in, sends at most one duplicate per call and at most
+HEDGE_MAX_RATIO (5%) extra calls per stage, so a slow upstream isn't
+doubled in load.  Sync clients run in a thread; a losing thread attempt
+can't be interrupted and finishes in the background.
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import numpy as np
+from fastapi import HTTPException
+from prometheus_client import Counter
+
+T = TypeVar("T")
+
+DEADLINE_HEADER = "x-request-deadline-ms"
+DEFAULT_DEADLINE_MS = float(os.getenv("ML_REQUEST_DEADLINE_MS", "30000"))
+MAX_DEADLINE_MS = float(os.getenv("ML_REQUEST_DEADLINE_MAX_MS", "120000"))
+HEDGING_ENABLED = os.getenv("ML_HEDGING", "1") not in ("0", "false", "False")
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY_S = 0.01
+HEDGE_MAX_RATIO = float(os.getenv("ML_HEDGE_MAX_RATIO", "0.05"))
+_WINDOW = 200
+
+HEDGED = Counter(
+    "mlserver_hedged_requests_total",
+    "Upstream calls that sent a hedge, by which attempt answered first",
+    ["stage", "winner"],
+)
+DEADLINE_EXCEEDED = Counter(
+    "mlserver_deadline_exceeded_total",
+    "Calls abandoned because the request deadline ran out",
+    ["stage"],
+)
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(HTTPException):
+    def __init__(self, stage: str):
+        DEADLINE_EXCEEDED.labels(stage).inc()
+        super().__init__(status_code=504, detail=f"Request deadline exceeded during {stage}")
+
+
+# ──────────────────────────────────────────────
+# Deadline context
+# ──────────────────────────────────────────────
+
+def set_deadline(budget_s: Optional[float]) -> contextvars.Token:
+    """Start a deadline `budget_s` seconds from now (None clears it)."""
+    return _deadline.set(None if budget_s is None else time.monotonic() + budget_s)
+
+
+def reset_deadline(token: contextvars.Token):
+    _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left for the current request, or None without a deadline."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def timeout(cap: float, stage: str = "upstream") -> float:
+    """A per-call timeout: `cap`, clipped to the remaining budget."""
+    left = remaining()
+    if left is None:
+        return cap
+    if left <= 0:
+        raise DeadlineExceeded(stage)
+    return min(cap, left)
+
+
+def _parse_budget_ms(raw: Optional[bytes]) -> float:
+    try:
+        budget = float(raw) if raw else DEFAULT_DEADLINE_MS
+    except ValueError:
+        budget = DEFAULT_DEADLINE_MS
+    return min(max(budget, 0.0), MAX_DEADLINE_MS)
+
+
+class DeadlineMiddleware:
+    """Pure ASGI middleware: sets the request deadline from the header or the default."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        raw = next((v for k, v in scope.get("headers", ()) if k == DEADLINE_HEADER.encode()), None)
+        token = set_deadline(_parse_budget_ms(raw) / 1000)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            reset_deadline(token)
+
+
+# ──────────────────────────────────────────────
+# Observed latency per stage
+# ──────────────────────────────────────────────
+
+class _LatencyWindow:
+    """
+    Last _WINDOW successful attempt durations (p95 recomputed every 10
+    samples) plus the call / hedge counts behind the hedge budget.
+    """
+
+    def __init__(self):
+        self._samples: deque[float] = deque(maxlen=_WINDOW)
+        self._p95: Optional[float] = None
+        self._since = 0
+        self._calls = 0
+        self._hedges = 0
+        self._lock = threading.Lock()
+
+    def count_call(self):
+        with self._lock:
+            self._calls += 1
+            if self._calls > 10 * _WINDOW:  # decay so old traffic doesn't bank hedges
+                self._calls //= 2
+                self._hedges //= 2
+
+    def take_hedge(self) -> bool:
+        with self._lock:
+            if self._hedges + 1 > HEDGE_MAX_RATIO * self._calls:
+                return False
+            self._hedges += 1
+            return True
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+            self._since += 1
+            if len(self._samples) >= HEDGE_MIN_SAMPLES and (self._p95 is None or self._since >= 10):
+                self._p95 = float(np.percentile(self._samples, 95))
+                self._since = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        p95 = self._p95
+        return None if p95 is None else max(p95, HEDGE_MIN_DELAY_S)
+
+
+_windows: dict[str, _LatencyWindow] = {}
+_windows_lock = threading.Lock()
+
+
+def _window(stage: str) -> _LatencyWindow:
+    window = _windows.get(stage)
+    if window is None:
+        with _windows_lock:
+            window = _windows.setdefault(stage, _LatencyWindow())
+    return window
+
+
+# ──────────────────────────────────────────────
+# Bounded + hedged calls
+# ──────────────────────────────────────────────
+
+async def bounded(awaitable: Awaitable[T], stage: str = "request") -> T:
+    """Await `awaitable` within the remaining budget."""
+    left = remaining()
+    if left is None:
+        return await awaitable
+    if left <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded(stage)
+    try:
+        return await asyncio.wait_for(awaitable, left)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(stage)
+
+
+async def _timed(window: _LatencyWindow, awaitable: Awaitable[T]) -> T:
+    started = time.perf_counter()
+    result = await awaitable
+    window.observe(time.perf_counter() - started)
+    return result
+
+
+async def call(stage: str, factory: Callable[[], Awaitable[T]], hedge: bool = True) -> T:
+    """
+    Run `factory()` within the deadline.  With `hedge` (idempotent reads
+    only), a second `factory()` is started once the first attempt outlives
+    the stage's p95; the first successful result is returned.
+    """
+    window = _window(stage)
+    window.count_call()
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded(stage)
+    delay = window.hedge_delay() if hedge and HEDGING_ENABLED else None
+    if delay is None or (left is not None and delay >= left):
+        return await bounded(_timed(window, factory()), stage)
+
+    primary = asyncio.ensure_future(_timed(window, factory()))
+    attempts = [primary]
+    try:
+        done, _ = await asyncio.wait(attempts, timeout=delay)
+        if not done and window.take_hedge():
+            attempts.append(asyncio.ensure_future(_timed(window, factory())))
+        error: Optional[BaseException] = None
+        pending = set(attempts)
+        while pending:
+            left = remaining()
+            if left is not None and left <= 0:
+                raise DeadlineExceeded(stage)
+            done, pending = await asyncio.wait(pending, timeout=left, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                raise DeadlineExceeded(stage)
+            for task in done:
+                if task.exception() is None:
+                    if len(attempts) > 1:
+                        HEDGED.labels(stage, "primary" if task is primary else "hedge").inc()
+                    return task.result()
+                error = error or task.exception()
+        raise error
+    finally:
+        for task in attempts:
+            if not task.done():
+                task.cancel()
+
+
+async def call_sync(stage: str, fn: Callable[..., T], *args, hedge: bool = True, **kwargs) -> T:
+    """`call` for a blocking client method (run in a worker thread)."""
+    return await call(stage, lambda: asyncio.to_thread(fn, *args, **kwargs), hedge=hedge)
@@ -0,0 +1,156 @@
+"""
+Cross-worker cache invalidation
+───────────────────────────────
+The response, similarity, answer and rerank caches live in each worker's
+memory.  With ML_WORKERS > 1 an invalidation is applied by the worker that
+served it and published for the others:
+
+  • log        each one is a row (seq, pid, cache, op, keys) in a small
+               SQLite table under ML_SHARED_DIR
+  • counter    the newest seq is written to an 8-byte file next to it that
+               every worker memory-maps; a cache checks it (one read, no
+               syscall) before serving an entry
+  • replay     when the counter moved, the worker reads the rows it hasn't
+               seen and applies the ones other processes published to its
+               own caches, then serves
+
+Caches subscribe by name with an `apply(op, keys)` callback; ops are the
+cache's own ("clear", "events", ...).  Rows older than an hour are
+trimmed — workers poll on every lookup, so they are long replayed by then.
+
+Off with a single worker, where publish and poll do nothing.  CLIs that
+invalidate (python -m hotel.activity_index) publish when started with the
+server's ML_WORKERS.
+"""
+
+import fcntl
+import json
+import logging
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+from utils.shared_arrays import shared_dir, worker_count
+
+logger = logging.getLogger("invalidation")
+
+RETENTION_S = 3600
+_COUNTER = struct.Struct("<q")
+
+
+class InvalidationBus:
+    def __init__(self, root: Optional[str]):
+        self.enabled = root is not None
+        self._root = root
+        self._subscribers: dict[str, Callable[[str, list], None]] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        self._counter: Optional[mmap.mmap] = None
+        self._seen = 0
+        self._lock = threading.Lock()
+        self._opened = False
+
+    def subscribe(self, cache: str, apply: Callable[[str, list], None]):
+        self._subscribers[cache] = apply
+
+    # ── Storage ───────────────────────────────────────────────────────
+    def _open(self) -> bool:
+        """Open the log and map the counter on first use (after the worker forked)."""
+        if self._opened:
+            return self._conn is not None
+        self._opened = True
+        try:
+            os.makedirs(self._root, exist_ok=True)
+            conn = sqlite3.connect(
+                os.path.join(self._root, "invalidations.sqlite3"),
+                check_same_thread=False, timeout=5.0, isolation_level=None,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS invalidations ("
+                " seq INTEGER PRIMARY KEY AUTOINCREMENT, pid INTEGER NOT NULL, cache TEXT NOT NULL,"
+                " op TEXT NOT NULL, keys TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            with open(self._counter_path(), "a+b") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    if os.fstat(f.fileno()).st_size < _COUNTER.size:
+                        f.truncate(_COUNTER.size)
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+                self._counter = mmap.mmap(f.fileno(), _COUNTER.size, access=mmap.ACCESS_READ)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"⚠️  Cross-worker invalidation unavailable, caches invalidate per worker: {e}")
+            return False
+        self._conn = conn
+        # A new worker's caches are empty: nothing published before now applies to it
+        self._seen = self._current()
+        return True
+
+    def _counter_path(self) -> str:
+        return os.path.join(self._root, "invalidations.seq")
+
+    def _current(self) -> int:
+        return _COUNTER.unpack_from(self._counter, 0)[0]
+
+    # ── Publish / poll ────────────────────────────────────────────────
+    def publish(self, cache: str, op: str, keys: Iterable[str] = ()):
+        """Tell the other workers; the caller has already applied it locally."""
+        if not self.enabled:
+            return
+        keys = list(keys)
+        with self._lock:
+            if not self._open():
+                return
+            try:
+                now = time.time()
+                seq = self._conn.execute(
+                    "INSERT INTO invalidations (pid, cache, op, keys, created_at) VALUES (?, ?, ?, ?, ?) "
+                    "RETURNING seq",
+                    (os.getpid(), cache, op, json.dumps(keys), now),
+                ).fetchone()[0]
+                self._conn.execute("DELETE FROM invalidations WHERE created_at < ?", (now - RETENTION_S,))
+                with open(self._counter_path(), "r+b") as f:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                    try:
+                        if seq > self._current():
+                            os.pwrite(f.fileno(), _COUNTER.pack(seq), 0)
+                    finally:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+            except (sqlite3.Error, OSError) as e:
+                logger.warning(f"⚠️  Could not publish {cache} invalidation ({op}): {e}")
+
+    def poll(self):
+        """Apply invalidations other workers published since the last poll."""
+        if not self.enabled:
+            return
+        if self._counter is not None and self._current() <= self._seen:
+            return
+        with self._lock:
+            if not self._open() or self._current() <= self._seen:
+                return
+            try:
+                rows = self._conn.execute(
+                    "SELECT seq, pid, cache, op, keys FROM invalidations WHERE seq > ? ORDER BY seq",
+                    (self._seen,),
+                ).fetchall()
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️  Could not read invalidations: {e}")
+                return
+            pid = os.getpid()
+            for seq, origin, cache, op, keys in rows:
+                self._seen = max(self._seen, seq)
+                apply = self._subscribers.get(cache)
+                if origin == pid or apply is None:
+                    continue
+                try:
+                    apply(op, json.loads(keys))
+                except Exception as e:
+                    logger.warning(f"⚠️  Could not apply {cache} invalidation ({op}): {e}")
+
+
+invalidations = InvalidationBus(shared_dir() if worker_count() > 1 else None)
@@ -0,0 +1,36 @@
+"""
+Leveled, non-blocking logging
+─────────────────────────────
+Handlers that write to stdout block the event loop on slow pipes.  Every
+record instead goes through a QueueHandler; a QueueListener thread does
+the actual I/O.  Level comes from LOG_LEVEL (default INFO).
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+_listener = None
+
+
+def configure_logging():
+    """Route the root logger through a background queue (idempotent)."""
+    global _listener
+    if _listener is not None:
+        return
+
+    level = os.getenv("LOG_LEVEL", "INFO").upper()
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(name)s: %(message)s"))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
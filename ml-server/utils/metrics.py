@@ -0,0 +1,121 @@
+"""
+Latency instrumentation
+───────────────────────
+  • span(stage)       — times one pipeline stage (geocode, embedding, a Qdrant
+                        query, mem0, guardrails, agent run, MCP tool call …)
+                        into the `mlserver_stage_duration_seconds` histogram and,
+                        when OpenTelemetry is installed, opens a trace span.
+  • MetricsMiddleware — per-route request latency histogram.
+  • metrics_router    — GET /metrics in Prometheus text format (aggregated
+                        across workers when PROMETHEUS_MULTIPROC_DIR is set).
+
+Usage:
+    with span("qdrant.query", collection="events_vectors"):
+        client.query_points(...)
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+
+try:  # optional — traces are emitted only when an OTel SDK/exporter is configured
+    from opentelemetry import trace as _otel_trace
+    _tracer = _otel_trace.get_tracer("syncstay.ml-server")
+except ImportError:
+    _tracer = None
+
+_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+REQUEST_LATENCY = Histogram(
+    "mlserver_request_duration_seconds",
+    "HTTP request latency by route",
+    ["method", "route", "status"],
+    buckets=_BUCKETS,
+)
+
+STAGE_LATENCY = Histogram(
+    "mlserver_stage_duration_seconds",
+    "Latency of individual pipeline stages",
+    ["stage", "outcome"],
+    buckets=_BUCKETS,
+)
+
+STAGE_ERRORS = Counter(
+    "mlserver_stage_errors_total",
+    "Pipeline stages that raised",
+    ["stage"],
+)
+
+
+@contextmanager
+def span(stage: str, **attributes):
+    """Time a pipeline stage; works in both sync and async code."""
+    otel_cm = _tracer.start_as_current_span(stage, attributes=attributes) if _tracer else None
+    if otel_cm is not None:
+        otel_cm.__enter__()
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        STAGE_LATENCY.labels(stage, outcome).observe(time.perf_counter() - started)
+        if otel_cm is not None:
+            otel_cm.__exit__(None, None, None)
+
+
+def observe_stage(stage: str, seconds: float, outcome: str = "ok"):
+    """Record a stage duration measured elsewhere (e.g. across callbacks)."""
+    STAGE_LATENCY.labels(stage, outcome).observe(seconds)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: records latency labelled by the matched route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            # Unmatched paths share one label so scanners can't explode cardinality
+            path = getattr(route, "path", None) or "<unmatched>"
+            REQUEST_LATENCY.labels(scope["method"], path, str(status["code"])).observe(
+                time.perf_counter() - started
+            )
+
+
+metrics_router = APIRouter()
+
+
+@metrics_router.get("/metrics", include_in_schema=False)
+async def metrics():
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
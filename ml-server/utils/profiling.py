@@ -0,0 +1,412 @@
+"""
+On-demand profiling and allocation tracing (admin only)
+───────────────────────────────────────────────────────
+When /hotel/recommend or /agent/query turns slow in production, these
+endpoints show where the time and memory go without a redeploy.  They
+exist only when ML_ADMIN_TOKEN is set: otherwise neither the router nor
+the middleware is mounted, so there is nothing on the request path.
+Every call needs the `X-Admin-Token` header.
+
+  POST /admin/profile/start      {"seconds": 30} profiles a time window;
+                                 {"route": "/hotel/recommend", "requests": 20}
+                                 profiles the next 20 requests to that path
+                                 (capped at `seconds`, default 300)
+       "mode": "sample"          all threads sampled every interval_ms (5),
+                                 stacks counted — the default
+       "mode": "cprofile"        deterministic, event-loop thread only (to_thread
+                                 calls aren't seen), one request at a time
+  POST /admin/profile/stop       end the session early
+  GET  /admin/profile            the session's state and the last result
+  GET  /admin/profile/result     ?format=collapsed (sample: flamegraph.pl /
+                                 speedscope / inferno input), text (cprofile:
+                                 pstats by cumulative time) or prof (cprofile:
+                                 the .prof file for snakeviz / pstats)
+
+  POST /admin/tracemalloc/start  {"frames": 25} starts tracing and takes the
+                                 baseline snapshot
+  GET  /admin/tracemalloc/diff   growth since the baseline, largest first:
+                                 ?format=json (top `limit`) or collapsed
+                                 (bytes per allocation stack);
+                                 ?rebase=true makes this snapshot the baseline
+  POST /admin/tracemalloc/stop   stop tracing and free its memory
+
+Sampling costs a few percent of one core while it runs; cProfile slows the
+profiled code 2×+ and tracemalloc adds memory and time to every
+allocation, so stop them when done.  The asyncio loop runs the other
+requests' coroutines too, so a route session also sees whatever ran
+concurrently.  With ML_WORKERS > 1 each call reaches one worker.
+"""
+
+import asyncio
+import cProfile
+import hmac
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse, Response
+from pydantic import BaseModel, Field
+
+ADMIN_TOKEN = os.getenv("ML_ADMIN_TOKEN", "")
+PROFILING_ENABLED = bool(ADMIN_TOKEN)
+MAX_SECONDS = float(os.getenv("ML_PROFILE_MAX_SECONDS", "600"))
+_ROUTE_SECONDS = 300.0
+
+# Leaf frames of threads that are only waiting (left out unless include_idle)
+_IDLE_LEAVES = {
+    ("selectors.py", "select"), ("threading.py", "wait"), ("queue.py", "get"),
+    ("thread.py", "_worker"), ("threading.py", "_wait_for_tstate_lock"), ("handlers.py", "dequeue"),
+}
+_PATH_PREFIXES = sorted(
+    {p for p in sys.path if p and os.path.isdir(p)} | {os.getcwd()},
+    key=len, reverse=True,
+)
+
+
+def _short_path(path: str) -> str:
+    for prefix in _PATH_PREFIXES:
+        if path.startswith(prefix + os.sep):
+            return path[len(prefix) + 1:]
+    return path
+
+
+def _frame_name(code, lineno: int) -> str:
+    # py-spy's collapsed-stack frame format; ';' separates frames
+    return f"{code.co_name} ({_short_path(code.co_filename)}:{lineno})".replace(";", ":")
+
+
+# ──────────────────────────────────────────────
+# Profiling sessions
+# ──────────────────────────────────────────────
+
+class _Sampler:
+    """Samples every thread's stack from a background thread."""
+
+    def __init__(self, interval_s: float, include_idle: bool):
+        self.interval_s = interval_s
+        self.include_idle = include_idle
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self.gate = None  # callable: sample only while it returns True
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval_s):
+            if self.gate is not None and not self.gate():
+                continue
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                code = frame.f_code
+                if not self.include_idle and (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame.f_code, frame.f_lineno))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}").replace(";", ":"))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfileSession:
+    def __init__(self, mode: str, seconds: float, route: Optional[str], requests: Optional[int],
+                 interval_ms: float, include_idle: bool):
+        self.mode = mode
+        self.route = route
+        self.requests = requests
+        self.seconds = seconds
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self.profiled_requests = 0
+        self._in_flight = 0
+        self._busy = False  # cProfile: one request at a time
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._sampler: Optional[_Sampler] = None
+        self._profile: Optional[cProfile.Profile] = None
+        if mode == "sample":
+            self._sampler = _Sampler(interval_ms / 1000, include_idle)
+            if route is not None:
+                self._sampler.gate = lambda: self._in_flight > 0
+        else:
+            self._profile = cProfile.Profile()
+
+    def start(self, on_timeout):
+        if self._sampler is not None:
+            self._sampler.start()
+        elif self.route is None:
+            self._profile.enable()
+        self._timer = asyncio.get_running_loop().call_later(self.seconds, on_timeout)
+
+    def stop(self):
+        if self.finished is not None:
+            return
+        self.finished = time.time()
+        if self._timer is not None:
+            self._timer.cancel()
+        if self._sampler is not None:
+            self._sampler.stop()
+        elif self.route is None:
+            self._profile.disable()
+
+    async def profile_request(self, app, scope, receive, send) -> bool:
+        """Run a matching request under the session; False when it couldn't be profiled."""
+        if self._profile is not None:
+            if self._busy:
+                return False
+            self._busy = True
+            self._profile.enable()
+        self._in_flight += 1
+        try:
+            await app(scope, receive, send)
+        finally:
+            self._in_flight -= 1
+            if self._profile is not None:
+                self._profile.disable()
+                self._busy = False
+            self.profiled_requests += 1
+        return True
+
+    @property
+    def done(self) -> bool:
+        return self.requests is not None and self.profiled_requests >= self.requests
+
+    def status(self) -> dict:
+        end = self.finished or time.time()
+        report = {
+            "mode": self.mode,
+            "route": self.route,
+            "requests": self.requests,
+            "profiled_requests": self.profiled_requests,
+            "started_at": self.started,
+            "duration_s": round(end - self.started, 3),
+            "running": self.finished is None,
+        }
+        if self._sampler is not None:
+            report["samples"] = self._sampler.samples
+            report["stacks"] = len(self._sampler.stacks)
+        return report
+
+    # ── Output ────────────────────────────────────────────────────────
+    def collapsed(self) -> str:
+        if self._sampler is None:
+            raise HTTPException(status_code=422, detail="collapsed stacks need mode=sample")
+        return self._sampler.collapsed()
+
+    def text(self, limit: int) -> str:
+        if self._profile is None:
+            raise HTTPException(status_code=422, detail="text output needs mode=cprofile")
+        out = io.StringIO()
+        pstats.Stats(self._profile, stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+    def prof(self) -> bytes:
+        if self._profile is None:
+            raise HTTPException(status_code=422, detail="prof output needs mode=cprofile")
+        self._profile.create_stats()
+        return marshal.dumps(self._profile.stats)
+
+
+class Profiler:
+    """The process's single profiling session and the last finished one."""
+
+    def __init__(self):
+        self.session: Optional[ProfileSession] = None  # running
+        self.last: Optional[ProfileSession] = None
+
+    def start(self, session: ProfileSession):
+        if self.session is not None:
+            raise HTTPException(status_code=409, detail="A profiling session is already running")
+        self.session = session
+        self.last = session
+        session.start(self.stop)
+
+    def stop(self) -> Optional[ProfileSession]:
+        session, self.session = self.session, None
+        if session is not None:
+            session.stop()
+        return session
+
+
+profiler = Profiler()
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware: runs requests to the armed route under the session."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        session = profiler.session
+        if session is None or session.route is None or scope["type"] != "http" or scope["path"] != session.route:
+            return await self.app(scope, receive, send)
+        if not await session.profile_request(self.app, scope, receive, send):
+            return await self.app(scope, receive, send)
+        if session.done and profiler.session is session:
+            profiler.stop()
+
+
+# ──────────────────────────────────────────────
+# Endpoints
+# ──────────────────────────────────────────────
+
+def require_admin(x_admin_token: str = Header(default="")):
+    if not ADMIN_TOKEN or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+profiling_router = APIRouter(dependencies=[Depends(require_admin)], include_in_schema=False)
+
+
+class ProfileStartRequest(BaseModel):
+    mode: Literal["sample", "cprofile"] = "sample"
+    seconds: Optional[float] = Field(default=None, gt=0)
+    route: Optional[str] = None
+    requests: Optional[int] = Field(default=None, ge=1)
+    interval_ms: float = Field(default=5.0, ge=1.0, le=1000.0)
+    include_idle: bool = False
+
+
+class TracemallocStartRequest(BaseModel):
+    frames: int = Field(default=25, ge=1, le=100)
+
+
+@profiling_router.post("/profile/start")
+async def start_profile(request: ProfileStartRequest):
+    if request.route is None and request.seconds is None:
+        raise HTTPException(status_code=422, detail="Give seconds, or a route (and optionally requests)")
+    if request.requests is not None and request.route is None:
+        raise HTTPException(status_code=422, detail="requests needs a route")
+    seconds = min(request.seconds or _ROUTE_SECONDS, MAX_SECONDS)
+    session = ProfileSession(
+        request.mode, seconds, request.route, request.requests, request.interval_ms, request.include_idle,
+    )
+    profiler.start(session)
+    return session.status()
+
+
+@profiling_router.post("/profile/stop")
+async def stop_profile():
+    session = profiler.stop()
+    if session is None:
+        raise HTTPException(status_code=409, detail="No profiling session is running")
+    return session.status()
+
+
+@profiling_router.get("/profile")
+async def profile_status():
+    return {
+        "running": profiler.session.status() if profiler.session else None,
+        "last": profiler.last.status() if profiler.last else None,
+    }
+
+
+@profiling_router.get("/profile/result")
+async def profile_result(format: Literal["collapsed", "text", "prof"] = "collapsed", limit: int = 60):
+    session = profiler.last
+    if session is None:
+        raise HTTPException(status_code=404, detail="No profiling session yet")
+    if session.finished is None:
+        raise HTTPException(status_code=409, detail="The profiling session is still running")
+    if format == "prof":
+        return Response(
+            session.prof(), media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="ml-server-{int(session.started)}.prof"'},
+        )
+    return PlainTextResponse(session.collapsed() if format == "collapsed" else session.text(limit))
+
+
+# ── tracemalloc ───────────────────────────────────────────────────────
+
+_baseline: Optional[tracemalloc.Snapshot] = None
+
+
+def _snapshot() -> tracemalloc.Snapshot:
+    # The tracer's own bookkeeping isn't the application's memory
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+
+
+@profiling_router.post("/tracemalloc/start")
+async def start_tracemalloc(request: TracemallocStartRequest):
+    global _baseline
+    if tracemalloc.is_tracing():
+        raise HTTPException(status_code=409, detail="tracemalloc is already tracing")
+    tracemalloc.start(request.frames)
+    _baseline = await asyncio.to_thread(_snapshot)
+    return {"tracing": True, "frames": request.frames}
+
+
+@profiling_router.get("/tracemalloc/diff")
+async def tracemalloc_diff(
+    format: Literal["json", "collapsed"] = "json",
+    key: Literal["lineno", "traceback"] = "lineno",
+    limit: int = 30,
+    rebase: bool = False,
+):
+    global _baseline
+    if not tracemalloc.is_tracing() or _baseline is None:
+        raise HTTPException(status_code=409, detail="tracemalloc is not tracing; POST /admin/tracemalloc/start")
+    baseline = _baseline
+    snapshot = await asyncio.to_thread(_snapshot)
+    if rebase:
+        _baseline = snapshot
+    if format == "collapsed":
+        stats = await asyncio.to_thread(snapshot.compare_to, baseline, "traceback")
+        lines = [
+            ";".join(f"{_short_path(f.filename)}:{f.lineno}".replace(";", ":") for f in s.traceback) + f" {s.size_diff}"
+            for s in stats if s.size_diff > 0
+        ]
+        return PlainTextResponse("".join(f"{line}\n" for line in lines))
+
+    stats = await asyncio.to_thread(snapshot.compare_to, baseline, key)
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        "traced_bytes": current,
+        "peak_bytes": peak,
+        "growth_bytes": sum(s.size_diff for s in stats),
+        "top": [
+            {
+                "size_diff": s.size_diff,
+                "size": s.size,
+                "count_diff": s.count_diff,
+                "count": s.count,
+                "traceback": [f"{_short_path(f.filename)}:{f.lineno}" for f in s.traceback],
+            }
+            for s in stats[:limit]
+        ],
+    }
+
+
+@profiling_router.post("/tracemalloc/stop")
+async def stop_tracemalloc():
+    global _baseline
+    if not tracemalloc.is_tracing():
+        raise HTTPException(status_code=409, detail="tracemalloc is not tracing")
+    tracemalloc.stop()
+    _baseline = None
+    return {"tracing": False}
@@ -0,0 +1,37 @@
+"""
+Response shaping helpers
+────────────────────────
+Large list endpoints (/hotel/recommend, /event/fetch) build plain dicts and
+return them through ORJSONResponse instead of constructing pydantic models
+and going through FastAPI's jsonable_encoder.  Callers can shrink payloads
+with `?compact=true` or pick columns with `?fields=a,b,c`.
+"""
+
+from typing import Optional, Sequence
+
+from fastapi import HTTPException
+
+
+def parse_fields(
+    fields: Optional[str],
+    compact: bool,
+    allowed: Sequence[str],
+    compact_fields: Sequence[str],
+) -> Optional[tuple[str, ...]]:
+    """
+    Resolve the `fields` / `compact` query options to the tuple of keys to
+    emit per row, or None for the full (legacy) row.  Unknown field names
+    are rejected with 422 so typos don't silently return empty rows.
+    """
+    if fields:
+        requested = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+        unknown = [f for f in requested if f not in allowed]
+        if unknown:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Unknown fields {unknown}; allowed: {list(allowed)}",
+            )
+        return requested
+    if compact:
+        return tuple(compact_fields)
+    return None
@@ -0,0 +1,197 @@
+"""
+Shared, memory-mapped array snapshots for multi-worker serving
+──────────────────────────────────────────────────────────────
+With ML_WORKERS > 1, index.py starts several uvicorn worker processes.
+Read-mostly arrays (e.g. the per-event hotel candidate sets) are published
+once as a versioned snapshot of .npy files under ML_SHARED_DIR — /dev/shm
+by default, so the files live in shared memory — and every worker attaches
+them with np.load(mmap_mode="r"): the pages are shared, not copied.
+
+Single-writer refresh protocol, per snapshot name:
+  1. take an exclusive flock on the store's .writer.lock (one writer at a
+     time, across processes);
+  2. write the arrays + meta.json into <name>.v<N>.tmp<pid>/ and rename it
+     to <name>.v<N>/ (N is a nanosecond timestamp, so never reused);
+  3. atomically replace the pointer file <name>.current with "N";
+  4. delete versions older than the previous one.
+Readers only ever follow the pointer, so they see either the old or the
+new snapshot, never a partial one; a version deleted while mapped stays
+valid for the process that mapped it.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger("shared_arrays")
+
+
+def worker_count() -> int:
+    """Number of uvicorn worker processes (ML_WORKERS, default 1)."""
+    return max(1, int(os.getenv("ML_WORKERS", "1")))
+
+
+def shared_cache_enabled() -> bool:
+    """Shared snapshots are on by default only when running several workers."""
+    default = "1" if worker_count() > 1 else "0"
+    return os.getenv("ML_SHARED_CACHE", default) == "1"
+
+
+def shared_dir() -> str:
+    default = (
+        "/dev/shm/syncstay-ml" if os.path.isdir("/dev/shm")
+        else os.path.join(os.path.dirname(__file__), "..", "data", "shared")
+    )
+    return os.getenv("ML_SHARED_DIR", default)
+
+
+class Snapshot:
+    def __init__(self, name: str, version: int, arrays: dict[str, np.ndarray], meta: dict):
+        self.name = name
+        self.version = version
+        self.arrays = arrays
+        self.meta = meta
+
+
+def _load(path: str) -> np.ndarray:
+    try:
+        return np.load(path, mmap_mode="r", allow_pickle=False)
+    except ValueError:  # zero-length arrays can't be mapped
+        return np.load(path, allow_pickle=False)
+
+
+class SharedArrayStore:
+    # Snapshots kept mapped per process; older ones are unmapped once dropped
+    MAX_ATTACHED = 256
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._attached: OrderedDict[str, Snapshot] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, name: str, suffix: str) -> str:
+        return os.path.join(self.root, f"{name}{suffix}")
+
+    def _version(self, name: str) -> int:
+        try:
+            with open(self._path(name, ".current")) as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    @contextmanager
+    def _writer(self):
+        with open(os.path.join(self.root, ".writer.lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # ── Writer ────────────────────────────────────────────────────────
+
+    def publish(self, name: str, arrays: dict[str, np.ndarray], meta: Optional[dict] = None) -> int:
+        """Write a new version of *name* and switch readers over to it."""
+        with self._writer():
+            previous = self._version(name)
+            version = max(time.time_ns(), previous + 1)
+            final = self._path(name, f".v{version}")
+            tmp = f"{final}.tmp{os.getpid()}"
+            os.makedirs(tmp)
+            for key, array in arrays.items():
+                np.save(os.path.join(tmp, f"{key}.npy"), np.ascontiguousarray(array), allow_pickle=False)
+            with open(os.path.join(tmp, "meta.json"), "w") as f:
+                json.dump({**(meta or {}), "published_at": time.time()}, f)
+            os.rename(tmp, final)
+
+            pointer = self._path(name, ".current")
+            with open(f"{pointer}.tmp{os.getpid()}", "w") as f:
+                f.write(str(version))
+            os.replace(f"{pointer}.tmp{os.getpid()}", pointer)
+
+            self._remove_versions(name, keep=(previous, version))
+        return version
+
+    def _remove_versions(self, name: str, keep: tuple = ()):
+        prefix = f"{name}.v"
+        for entry in os.scandir(self.root):
+            if entry.name.startswith(prefix) and entry.is_dir():
+                suffix = entry.name[len(prefix):]
+                if not (suffix.isdigit() and int(suffix) in keep):
+                    shutil.rmtree(entry.path, ignore_errors=True)
+
+    def delete(self, name: str):
+        with self._writer():
+            try:
+                os.remove(self._path(name, ".current"))
+            except FileNotFoundError:
+                pass
+            self._remove_versions(name)
+        with self._lock:
+            self._attached.pop(name, None)
+
+    def gc(self, max_age_seconds: float):
+        """Drop snapshots whose pointer hasn't been republished within max_age."""
+        cutoff = time.time() - max_age_seconds
+        for entry in os.scandir(self.root):
+            if entry.name.endswith(".current") and entry.stat().st_mtime < cutoff:
+                self.delete(entry.name[: -len(".current")])
+
+    # ── Readers ───────────────────────────────────────────────────────
+
+    def attach(self, name: str) -> Optional[Snapshot]:
+        """Map the current version of *name* (zero-copy), or None if unpublished."""
+        for _ in range(2):  # the version may be swapped out between read and open
+            version = self._version(name)
+            if version == 0:
+                return None
+            with self._lock:
+                snapshot = self._attached.get(name)
+            if snapshot is not None and snapshot.version == version:
+                with self._lock:
+                    self._attached.move_to_end(name)
+                return snapshot
+            path = self._path(name, f".v{version}")
+            try:
+                with open(os.path.join(path, "meta.json")) as f:
+                    meta = json.load(f)
+                arrays = {
+                    entry.name[:-4]: _load(entry.path)
+                    for entry in os.scandir(path) if entry.name.endswith(".npy")
+                }
+            except FileNotFoundError:
+                continue
+            snapshot = Snapshot(name, version, arrays, meta)
+            with self._lock:
+                self._attached[name] = snapshot
+                self._attached.move_to_end(name)
+                while len(self._attached) > self.MAX_ATTACHED:
+                    self._attached.popitem(last=False)
+            return snapshot
+        return None
+
+
+_store: Optional[SharedArrayStore] = None
+_store_lock = threading.Lock()
+
+
+def get_shared_store() -> Optional[SharedArrayStore]:
+    """Process-wide store, or None when shared caching is disabled."""
+    global _store
+    if not shared_cache_enabled():
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SharedArrayStore(shared_dir())
+    return _store
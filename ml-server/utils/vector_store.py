@@ -0,0 +1,862 @@
+"""
+In-process vector search for single-node deployments
+────────────────────────────────────────────────────
+/event/fetch and Mode A searches call `query_points` on
+get_vector_store(), so collections that fit in RAM can be searched without
+a network hop to Qdrant:
+
+  VECTOR_STORE=qdrant   the shared QdrantClient (default)
+  VECTOR_STORE=local    a LocalVectorStore in front of it.  Collections in
+                        VECTOR_LOCAL_COLLECTIONS are searched in-process by
+                        brute force over a memory-mapped matrix.  Anything
+                        else — another collection, a filter condition it
+                        doesn't evaluate, a collection not synced yet — is
+                        passed to Qdrant unchanged
+
+Under VECTOR_LOCAL_DIR (data/vectors):
+
+  • snapshots     one versioned snapshot per collection, published with
+                  utils/shared_arrays.SharedArrayStore: point ids, JSON
+                  payloads and the vectors as float32, or int8 with a per-row
+                  scale when VECTOR_LOCAL_DTYPE=int8 (4× smaller, scores off
+                  by ~1e-2).  Cosine collections are stored normalised, so a
+                  score is one dot product; dot-product collections (hotel
+                  centroids) are stored as-is.  The files are mapped, so all
+                  uvicorn workers share the pages and a restart serves from
+                  disk straight away
+  • change log    changes.sqlite3 (WAL).  Points this server writes to Qdrant
+                  (POST /event/embedding, activity centroids) are appended
+                  too — deletes as tombstones (record_deletes) — and every
+                  process applies the entries newer than its snapshot on top
+                  of it, checking at most every VECTOR_LOCAL_POLL_MS (1000)
+                  per collection
+  • resync        a snapshot is rebuilt from a full Qdrant scroll when it is
+                  missing, every VECTOR_LOCAL_RESYNC_SECONDS (900), and once
+                  VECTOR_LOCAL_COMPACT_AT (1024) logged points sit on top of
+                  it.  One process does it (a lease in the change log); the
+                  others pick the new snapshot up.  Writes Qdrant gets from
+                  elsewhere — hotels_vectors comes from the Node backend, and
+                  so would its deleteVector — are seen at the next resync;
+                  until then a point deleted there is still served.
+                  `python -m utils.vector_store sync [collection ...]`
+                  picks them up at once
+
+Collections over VECTOR_LOCAL_MAX_POINTS (100000) points, or with named or
+non cosine / dot vectors, stay on Qdrant.  Filters: must / should /
+must_not over has_id and field conditions with match value / any / text or
+a (datetime) range — what /event/fetch and Mode A send.  Point ids are
+returned as strings.
+
+Metrics: mlserver_vector_search_total{collection,backend},
+mlserver_vector_local_points{collection} and
+mlserver_vector_sync_total{collection,outcome}.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Iterable, Optional, Sequence
+
+import numpy as np
+from prometheus_client import Counter, Gauge
+
+from utils.clients import get_qdrant_client
+from utils.metrics import span
+from utils.shared_arrays import SharedArrayStore
+
+logger = logging.getLogger("vector_store")
+
+LOCAL_ENABLED = os.getenv("VECTOR_STORE", "qdrant") == "local"
+LOCAL_COLLECTIONS = tuple(
+    name.strip() for name in os.getenv(
+        "VECTOR_LOCAL_COLLECTIONS",
+        "events_vectors,hotels_vectors,hotels_activity_vectors,hotels_activity_centroids",
+    ).split(",") if name.strip()
+)
+LOCAL_DIR = os.getenv("VECTOR_LOCAL_DIR", os.path.join(os.path.dirname(__file__), "..", "data", "vectors"))
+LOCAL_DTYPE = os.getenv("VECTOR_LOCAL_DTYPE", "float32")
+MAX_POINTS = int(os.getenv("VECTOR_LOCAL_MAX_POINTS", "100000"))
+POLL_INTERVAL_S = float(os.getenv("VECTOR_LOCAL_POLL_MS", "1000")) / 1000
+RESYNC_INTERVAL_S = float(os.getenv("VECTOR_LOCAL_RESYNC_SECONDS", "900"))
+COMPACT_AT = int(os.getenv("VECTOR_LOCAL_COMPACT_AT", "1024"))
+SYNC_CHECK_S = 30.0
+SYNC_RETRY_S = 60.0
+SYNC_LEASE_S = 600.0
+SCROLL_PAGE = 1024
+_INT8_CHUNK = 8192  # rows dequantised per matmul, bounds the float32 scratch
+_MASKS_KEPT = 64
+
+COSINE = "Cosine"
+DOT = "Dot"
+
+SEARCHES = Counter(
+    "mlserver_vector_search_total",
+    "Vector searches by collection and backend (local, qdrant)",
+    ["collection", "backend"],
+)
+LOCAL_POINTS = Gauge(
+    "mlserver_vector_local_points",
+    "Points searchable in-process per collection (snapshot + change log)",
+    ["collection"],
+    multiprocess_mode="max",
+)
+SYNCS = Counter(
+    "mlserver_vector_sync_total",
+    "Local snapshot rebuilds from Qdrant by outcome (done, skipped, failed)",
+    ["collection", "outcome"],
+)
+
+
+@dataclass(slots=True)
+class LocalPoint:
+    """A hit shaped like Qdrant's ScoredPoint."""
+    id: str
+    score: float
+    payload: Optional[dict] = None
+
+
+@dataclass(slots=True)
+class LocalQueryResponse:
+    points: list[LocalPoint]
+
+
+# ──────────────────────────────────────────────
+# Filters
+# ──────────────────────────────────────────────
+
+class UnsupportedFilter(Exception):
+    """A condition the local backend doesn't evaluate; the search goes to Qdrant."""
+
+
+_WORD = re.compile(r"\w+")
+
+
+def _field(payload: dict, key: str):
+    value = payload
+    for part in key.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _as_time(value) -> Optional[datetime]:
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _as_list(conditions) -> list:
+    if conditions is None:
+        return []
+    return conditions if isinstance(conditions, list) else [conditions]
+
+
+def _as_number(value) -> Optional[float]:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value)
+
+
+def _as_timestamp(value) -> Optional[float]:
+    value = _as_time(value)
+    return None if value is None else value.timestamp()
+
+
+def _numeric_column(values: list, convert: Callable) -> Optional[np.ndarray]:
+    """float64 column (NaN where missing) for vectorised ranges; None if a row holds a list."""
+    column = np.full(len(values), np.nan)
+    seen: dict = {}  # chunks of one event share their metadata
+    for i, value in enumerate(values):
+        if isinstance(value, list):
+            return None
+        if value is None or isinstance(value, dict):
+            continue
+        if value not in seen:
+            seen[value] = convert(value)
+        if seen[value] is not None:
+            column[i] = seen[value]
+    return column
+
+
+def _field_mask(condition, rows: "_Rows") -> np.ndarray:
+    """Mask for a FieldCondition with a match or a range."""
+    from qdrant_client import models
+
+    values = rows.column(condition.key)
+
+    def any_value(test: Callable[[object], bool]) -> np.ndarray:
+        return np.fromiter(
+            (any(test(v) for v in (value if isinstance(value, list) else (value,)) if v is not None) for value in values),
+            dtype=bool, count=len(values),
+        )
+
+    if condition.match is not None and condition.range is None:
+        match = condition.match
+        if isinstance(match, models.MatchValue):
+            return any_value(lambda v: v == match.value)
+        if isinstance(match, models.MatchAny):
+            options = set(match.any)
+            return any_value(lambda v: v in options)
+        if isinstance(match, models.MatchText):
+            words = set(_WORD.findall(match.text.lower()))
+            tokens = rows.derived(condition.key, "tokens", lambda column: [
+                frozenset(_WORD.findall(v.lower())) if isinstance(v, str) else frozenset() for v in column
+            ])
+            return np.fromiter((words <= t for t in tokens), dtype=bool, count=len(tokens))
+    elif condition.range is not None and condition.match is None:
+        r = condition.range
+        if isinstance(r, models.DatetimeRange):
+            kind, convert = "timestamp", _as_timestamp
+        elif isinstance(r, models.Range):
+            kind, convert = "number", _as_number
+        else:
+            raise UnsupportedFilter(type(r).__name__)
+        bounds = [(op, convert(b)) for op, b in (
+            (np.greater, r.gt), (np.greater_equal, r.gte), (np.less, r.lt), (np.less_equal, r.lte),
+        ) if b is not None]
+        column = rows.derived(condition.key, kind, lambda c: _numeric_column(c, convert))
+        if column is None:  # list-valued field: any element in range
+            def in_range(v) -> bool:
+                v = convert(v)
+                return v is not None and all(b is not None and op(v, b) for op, b in bounds)
+            return any_value(in_range)
+        mask = ~np.isnan(column)
+        for op, bound in bounds:
+            if bound is None:
+                return np.zeros(len(column), dtype=bool)
+            mask &= op(column, bound)
+        return mask
+    raise UnsupportedFilter(f"field condition on {condition.key}")
+
+
+def _mask(condition, rows: "_Rows") -> np.ndarray:
+    """Boolean mask of the rows matching a Qdrant Filter / condition."""
+    from qdrant_client import models
+
+    n = len(rows)
+    if isinstance(condition, models.Filter):
+        if condition.min_should is not None:
+            raise UnsupportedFilter("min_should")
+        mask = np.ones(n, dtype=bool)
+        for c in _as_list(condition.must):
+            mask &= _mask(c, rows)
+        should = _as_list(condition.should)
+        if should:
+            any_of = np.zeros(n, dtype=bool)
+            for c in should:
+                any_of |= _mask(c, rows)
+            mask &= any_of
+        for c in _as_list(condition.must_not):
+            mask &= ~_mask(c, rows)
+        return mask
+    if isinstance(condition, models.HasIdCondition):
+        mask = np.zeros(n, dtype=bool)
+        for point_id in condition.has_id:
+            i = rows.index.get(str(point_id))
+            if i is not None:
+                mask[i] = True
+        return mask
+    if isinstance(condition, models.FieldCondition):
+        return _field_mask(condition, rows)
+    raise UnsupportedFilter(type(condition).__name__)
+
+
+# ──────────────────────────────────────────────
+# Collection state: snapshot + change-log delta
+# ──────────────────────────────────────────────
+
+class _Rows:
+    """Ids and payloads of one block of points (a snapshot, or the delta on top)."""
+
+    def __init__(self, ids: Sequence[str], payload_of: Callable[[int], dict],
+                 all_payloads: Optional[Callable[[], list[dict]]] = None):
+        self.ids = ids
+        self._payload_of = payload_of
+        self._all_payloads = all_payloads or (lambda: [payload_of(i) for i in range(len(ids))])
+        self._payloads: Optional[list[dict]] = None
+        self._index: Optional[dict[str, int]] = None
+        self._columns: dict[str, list] = {}
+        self._derived: dict[tuple[str, str], object] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def index(self) -> dict[str, int]:
+        if self._index is None:
+            self._index = {point_id: i for i, point_id in enumerate(self.ids)}
+        return self._index
+
+    def payload(self, i: int) -> dict:
+        if self._payloads is not None:
+            return self._payloads[i]
+        return self._payload_of(i)
+
+    def column(self, key: str) -> list:
+        values = self._columns.get(key)
+        if values is None:
+            if self._payloads is None:
+                self._payloads = self._all_payloads()
+            values = self._columns[key] = [_field(p, key) for p in self._payloads]
+        return values
+
+    def derived(self, key: str, kind: str, build: Callable[[list], object]):
+        """A per-column structure (tokens, timestamps, …) built once per snapshot."""
+        value = self._derived.get((key, kind))
+        if value is None and (key, kind) not in self._derived:
+            value = self._derived[(key, kind)] = build(self.column(key))
+        return value
+
+
+def _snapshot_rows(arrays: dict) -> _Rows:
+    # The payload blob is comma-separated JSON objects: row i ends one byte
+    # before offsets[i + 1], and the whole blob parses as one JSON array
+    blob, offsets = arrays["payloads"], arrays["offsets"]
+    return _Rows(
+        arrays["ids"].tolist(),
+        lambda i: json.loads(bytes(blob[offsets[i]:offsets[i + 1] - 1])),
+        lambda: json.loads(b"[" + bytes(blob) + b"]"),
+    )
+
+
+class _State:
+    """One immutable view of a collection; searches read it without locking."""
+
+    def __init__(self, version: int, seq: int, meta: dict, arrays: dict,
+                 rows: _Rows, delta: Optional[dict[str, tuple[np.ndarray, dict]]] = None,
+                 deleted: frozenset = frozenset()):
+        self.version = version
+        self.seq = seq
+        self.meta = meta
+        self.distance = meta["distance"]
+        self.dim = int(meta["dim"])
+        self.arrays = arrays
+        self.vectors = arrays["vectors"]
+        self.scales = arrays.get("scales")
+        self.rows = rows
+        self.delta = delta or {}
+        self.deleted = deleted  # snapshot ids logged as deleted since
+        self.delta_rows = _Rows(list(self.delta), lambda i: self.delta[self.delta_rows.ids[i]][1])
+        self.delta_vectors = (
+            np.stack([vector for vector, _ in self.delta.values()]) if self.delta
+            else np.zeros((0, self.dim), dtype=np.float32)
+        )
+        self.hidden: Optional[np.ndarray] = None  # snapshot rows the delta replaces or deletes
+        if self.delta or self.deleted:
+            replaced = [rows.index[i] for i in (*self.delta, *self.deleted) if i in rows.index]
+            if replaced:
+                self.hidden = np.zeros(len(rows), dtype=bool)
+                self.hidden[replaced] = True
+        self._masks: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._masks_lock = threading.Lock()
+
+    @classmethod
+    def from_snapshot(cls, snapshot) -> "_State":
+        return cls(snapshot.version, int(snapshot.meta["seq"]), snapshot.meta, snapshot.arrays,
+                   _snapshot_rows(snapshot.arrays))
+
+    @property
+    def count(self) -> int:
+        hidden = 0 if self.hidden is None else int(self.hidden.sum())
+        return len(self.rows) - hidden + len(self.delta)
+
+    @property
+    def pending(self) -> int:
+        """Logged points and deletes on top of the snapshot."""
+        return len(self.delta) + len(self.deleted)
+
+    def with_changes(self, changes: list[tuple]) -> "_State":
+        """A new state with change-log rows (seq, id, vector bytes, payload JSON) applied.
+
+        A row with an empty vector is a tombstone: the point was deleted.
+        """
+        delta = dict(self.delta)
+        deleted = set(self.deleted)
+        seq = self.seq
+        for seq, point_id, vector, payload in changes:
+            if not vector:
+                delta.pop(point_id, None)
+                deleted.add(point_id)
+                continue
+            vector = np.frombuffer(vector, dtype=np.float32)
+            if vector.shape[0] != self.dim:
+                logger.warning(f"⚠️  Skipping logged point {point_id}: {vector.shape[0]}-d, collection is {self.dim}-d")
+                continue
+            if self.distance == COSINE:
+                vector = _normalise(vector[None, :])[0]
+            delta.pop(point_id, None)  # re-insert so the latest write wins the order too
+            delta[point_id] = (vector, json.loads(payload))
+            deleted.discard(point_id)
+        return _State(self.version, seq, self.meta, self.arrays, self.rows, delta, frozenset(deleted))
+
+    # ── Search ────────────────────────────────────────────────────────
+    def _filter_mask(self, query_filter) -> np.ndarray:
+        """Valid rows of snapshot + delta (the filter, minus replaced snapshot rows)."""
+        key = repr(query_filter)
+        with self._masks_lock:
+            mask = self._masks.get(key)
+            if mask is not None:
+                self._masks.move_to_end(key)
+                return mask
+        if query_filter is None:
+            mask = np.ones(len(self.rows) + len(self.delta), dtype=bool)
+        else:
+            mask = np.concatenate([_mask(query_filter, self.rows), _mask(query_filter, self.delta_rows)])
+        if self.hidden is not None:
+            mask[:len(self.rows)] &= ~self.hidden
+        with self._masks_lock:
+            self._masks[key] = mask
+            while len(self._masks) > _MASKS_KEPT:
+                self._masks.popitem(last=False)
+        return mask
+
+    def _scores(self, q: np.ndarray) -> np.ndarray:
+        if self.scales is None:
+            base = self.vectors @ q
+        else:
+            base = np.empty(len(self.rows), dtype=np.float32)
+            for start in range(0, len(self.rows), _INT8_CHUNK):
+                chunk = self.vectors[start:start + _INT8_CHUNK].astype(np.float32)
+                base[start:start + len(chunk)] = chunk @ q
+            base *= self.scales
+        return np.concatenate([base, self.delta_vectors @ q])
+
+    def search(self, query, limit: int, query_filter=None, with_payload=False) -> list[LocalPoint]:
+        q = np.asarray(query, dtype=np.float32).ravel()
+        if q.shape[0] != self.dim:
+            raise ValueError(f"query is {q.shape[0]}-d, collection is {self.dim}-d")
+        if self.distance == COSINE:
+            q = _normalise(q[None, :])[0]
+        valid = self._filter_mask(query_filter)
+        scores = np.where(valid, self._scores(q), -np.inf)
+        k = min(limit, int(valid.sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        n = len(self.rows)
+        points = []
+        for i in top.tolist():
+            rows, row = (self.rows, i) if i < n else (self.delta_rows, i - n)
+            points.append(LocalPoint(
+                id=rows.ids[row],
+                score=float(scores[i]),
+                payload=rows.payload(row) if with_payload else None,
+            ))
+        return points
+
+
+def _normalise(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return (matrix / np.where(norms > 0, norms, 1.0)).astype(np.float32)
+
+
+def _encode(ids: list[str], vectors: np.ndarray, payloads: list[dict], distance: str) -> dict[str, np.ndarray]:
+    """Snapshot arrays for a collection."""
+    if distance == COSINE:
+        vectors = _normalise(vectors)
+    arrays = {"ids": np.array(ids, dtype=str) if ids else np.zeros(0, dtype="<U1")}
+    if LOCAL_DTYPE == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127 if len(vectors) else np.zeros(0, dtype=np.float32)
+        scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+        arrays["vectors"] = np.round(vectors / scales[:, None]).astype(np.int8)
+        arrays["scales"] = scales
+    else:
+        arrays["vectors"] = vectors.astype(np.float32)
+    encoded = [json.dumps(p, separators=(",", ":")).encode("utf-8") for p in payloads]
+    arrays["offsets"] = np.concatenate([[0], np.cumsum([len(e) + 1 for e in encoded], dtype=np.int64)]).astype(np.int64)
+    arrays["payloads"] = np.frombuffer(b",".join(encoded), dtype=np.uint8)
+    return arrays
+
+
+# ──────────────────────────────────────────────
+# Change log
+# ──────────────────────────────────────────────
+
+class ChangeLog:
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS changes ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT, collection TEXT NOT NULL, point_id TEXT NOT NULL,"
+            " vector BLOB NOT NULL, payload TEXT NOT NULL, logged_at REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS changes_collection ON changes (collection, seq);"
+            "CREATE TABLE IF NOT EXISTS syncs ("
+            " collection TEXT PRIMARY KEY, synced_at REAL NOT NULL DEFAULT 0,"
+            " not_before REAL NOT NULL DEFAULT 0, claimed_at REAL);"
+        )
+        self._lock = threading.Lock()
+
+    def append(self, collection: str, points: list[tuple[str, bytes, str]]):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO changes (collection, point_id, vector, payload, logged_at) VALUES (?, ?, ?, ?, ?)",
+                [(collection, point_id, vector, payload, now) for point_id, vector, payload in points],
+            )
+
+    def since(self, collection: str, seq: int) -> list[tuple]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT seq, point_id, vector, payload FROM changes WHERE collection = ? AND seq > ? ORDER BY seq",
+                (collection, seq),
+            ).fetchall()
+
+    def last_seq(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+    def trim(self, collection: str, seq: int):
+        """Drop entries a snapshot at or past *seq* already contains."""
+        with self._lock:
+            self._conn.execute("DELETE FROM changes WHERE collection = ? AND seq <= ?", (collection, seq))
+
+    def claim_sync(self, collection: str, max_age_s: float) -> bool:
+        """Take the resync of *collection* if its snapshot is older than max_age_s and nobody holds it."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("INSERT OR IGNORE INTO syncs (collection) VALUES (?)", (collection,))
+            return self._conn.execute(
+                "UPDATE syncs SET claimed_at = ?1 WHERE collection = ?2"
+                " AND synced_at <= ?1 - ?3 AND not_before <= ?1 AND (claimed_at IS NULL OR claimed_at < ?1 - ?4)"
+                " RETURNING collection",
+                (now, collection, max_age_s, SYNC_LEASE_S),
+            ).fetchone() is not None
+
+    def finish_sync(self, collection: str, ok: bool):
+        now = time.time()
+        with self._lock:
+            if ok:
+                self._conn.execute(
+                    "UPDATE syncs SET synced_at = ?, not_before = 0, claimed_at = NULL WHERE collection = ?",
+                    (now, collection),
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE syncs SET not_before = ?, claimed_at = NULL WHERE collection = ?",
+                    (now + SYNC_RETRY_S, collection),
+                )
+
+
+# ──────────────────────────────────────────────
+# Local store
+# ──────────────────────────────────────────────
+
+class LocalCollection:
+    def __init__(self, name: str, snapshots: SharedArrayStore, changes: ChangeLog):
+        self.name = name
+        self._snapshots = snapshots
+        self._changes = changes
+        self._state: Optional[_State] = None
+        self._checked = float("-inf")
+        self._lock = threading.Lock()
+
+    def refresh(self, force: bool = False) -> Optional[_State]:
+        """The current state: the latest snapshot plus the change log after it."""
+        if not force and time.monotonic() - self._checked < POLL_INTERVAL_S:
+            return self._state
+        with self._lock:
+            if not force and time.monotonic() - self._checked < POLL_INTERVAL_S:
+                return self._state
+            self._checked = time.monotonic()
+            snapshot = self._snapshots.attach(self.name)
+            if snapshot is None:
+                self._state = None
+                return None
+            state = self._state
+            if state is None or state.version != snapshot.version:
+                state = _State.from_snapshot(snapshot)
+            changes = self._changes.since(self.name, state.seq)
+            if changes:
+                state = state.with_changes(changes)
+            self._state = state
+        LOCAL_POINTS.labels(self.name).set(state.count)
+        return state
+
+
+class LocalVectorStore:
+    """query_points / collection_exists over local collections, Qdrant for the rest."""
+
+    def __init__(self, root: str, collections: Iterable[str]):
+        self.root = root
+        self.names = tuple(collections)
+        self._snapshots: Optional[SharedArrayStore] = None
+        self._changes: Optional[ChangeLog] = None
+        self._collections: dict[str, LocalCollection] = {}
+        self._skipped: set[str] = set()  # too large / unsupported vectors: left on Qdrant
+        self._init_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def changes(self) -> ChangeLog:
+        if self._changes is None:
+            with self._init_lock:
+                if self._changes is None:
+                    self._snapshots = SharedArrayStore(os.path.join(self.root, "snapshots"))
+                    self._changes = ChangeLog(os.path.join(self.root, "changes.sqlite3"))
+        return self._changes
+
+    def collection(self, name: str) -> LocalCollection:
+        found = self._collections.get(name)
+        if found is None:
+            changes = self.changes
+            with self._init_lock:
+                found = self._collections.setdefault(name, LocalCollection(name, self._snapshots, changes))
+        return found
+
+    def _local(self, name: str) -> Optional[_State]:
+        if name not in self.names:
+            return None
+        try:
+            return self.collection(name).refresh()
+        except (sqlite3.Error, OSError, KeyError, ValueError) as e:
+            logger.warning(f"⚠️  Local {name} unavailable, searching Qdrant: {e}")
+            return None
+
+    # ── Qdrant-compatible reads ───────────────────────────────────────
+    def query_points(self, collection_name: str, query=None, query_filter=None, limit: int = 10,
+                     with_payload=False, **kwargs):
+        state = None if kwargs else self._local(collection_name)  # score_threshold, offset, … → Qdrant
+        if state is not None:
+            try:
+                points = state.search(query, limit, query_filter, bool(with_payload))
+            except UnsupportedFilter as e:
+                logger.debug(f"{collection_name}: {e} — searching Qdrant")
+            else:
+                SEARCHES.labels(collection_name, "local").inc()
+                return LocalQueryResponse(points)
+        SEARCHES.labels(collection_name, "qdrant").inc()
+        return get_qdrant_client().query_points(
+            collection_name, query=query, query_filter=query_filter, limit=limit,
+            with_payload=with_payload, **kwargs,
+        )
+
+    def collection_exists(self, collection_name: str) -> bool:
+        if self._local(collection_name) is not None:
+            return True
+        return get_qdrant_client().collection_exists(collection_name)
+
+    # ── Writes through this server ────────────────────────────────────
+    def record_points(self, collection: str, points: Sequence):
+        """Log points just upserted to Qdrant (PointStruct / Record: id, vector, payload)."""
+        if collection not in self.names or not points:
+            return
+        rows = []
+        for p in points:
+            if not isinstance(p.vector, list):
+                logger.warning(f"⚠️  Not logging {collection} point {p.id}: named or missing vector")
+                continue
+            rows.append((str(p.id), np.asarray(p.vector, dtype=np.float32).tobytes(),
+                         json.dumps(p.payload or {}, separators=(",", ":"))))
+        self.changes.append(collection, rows)
+        self.collection(collection).refresh(force=True)
+
+    def record_ids(self, collection: str, ids: Sequence[str]):
+        """Log points another client wrote to Qdrant (read back by id)."""
+        if collection not in self.names or not ids:
+            return
+        self.record_points(collection, get_qdrant_client().retrieve(
+            collection, ids=list(ids), with_payload=True, with_vectors=True,
+        ))
+
+    def record_deletes(self, collection: str, ids: Sequence):
+        """Log points just deleted from Qdrant, so no process serves them until its next snapshot."""
+        if collection not in self.names or not ids:
+            return
+        self.changes.append(collection, [(str(point_id), b"", "null") for point_id in ids])
+        self.collection(collection).refresh(force=True)
+
+    # ── Resync from Qdrant ────────────────────────────────────────────
+    def sync(self, name: str) -> Optional[int]:
+        """Rebuild *name*'s snapshot from a full scroll; its point count, or None if it stays on Qdrant."""
+        from qdrant_client import models
+
+        changes = self.changes
+        client = get_qdrant_client()
+        if not client.collection_exists(name):  # e.g. no activity ingested yet; checked again shortly
+            logger.debug(f"{name} doesn't exist in Qdrant yet")
+            return None
+        params = client.get_collection(name).config.params.vectors
+        if not isinstance(params, models.VectorParams) or params.distance.value not in (COSINE, DOT):
+            self._skip(name, "named or non cosine / dot vectors")
+            return None
+        seq = changes.last_seq()  # entries after this may or may not be in the scroll; replaying is harmless
+        previous = self._snapshots.attach(name)
+
+        ids, vectors, payloads = [], [], []
+        offset = None
+        with span("vectors.sync", collection=name):
+            while True:
+                points, offset = client.scroll(
+                    name, limit=SCROLL_PAGE, offset=offset, with_payload=True, with_vectors=True,
+                )
+                for p in points:
+                    ids.append(str(p.id))
+                    vectors.append(p.vector)
+                    payloads.append(p.payload or {})
+                if len(ids) > MAX_POINTS:
+                    self._skip(name, f"over VECTOR_LOCAL_MAX_POINTS ({MAX_POINTS})")
+                    return None
+                if offset is None:
+                    break
+            matrix = np.asarray(vectors, dtype=np.float32).reshape(len(ids), params.size)
+            self._snapshots.publish(name, _encode(ids, matrix, payloads, params.distance.value), {
+                "seq": seq, "distance": params.distance.value, "dim": params.size,
+                "dtype": LOCAL_DTYPE, "count": len(ids),
+            })
+        if previous is not None:
+            # Keep one snapshot's worth of entries for processes still on the previous one
+            changes.trim(name, int(previous.meta["seq"]))
+        self._skipped.discard(name)
+        self.collection(name).refresh(force=True)
+        SYNCS.labels(name, "done").inc()
+        logger.info(f"✅ Synced {len(ids)} {name} points for in-process search")
+        return len(ids)
+
+    def _skip(self, name: str, reason: str):
+        SYNCS.labels(name, "skipped").inc()
+        if name not in self._skipped:
+            logger.warning(f"⚠️  {name} stays on Qdrant: {reason}")
+        self._skipped.add(name)
+        self._snapshots.delete(name)
+
+    def _maybe_sync(self, name: str):
+        state = self._local(name)
+        due_now = (state is None and name not in self._skipped) or (state is not None and state.pending >= COMPACT_AT)
+        changes = self.changes
+        if not changes.claim_sync(name, 0.0 if due_now else RESYNC_INTERVAL_S):
+            return
+        ok = False
+        try:
+            ok = self.sync(name) is not None or name in self._skipped
+        except Exception as e:
+            SYNCS.labels(name, "failed").inc()
+            logger.warning(f"⚠️  Could not sync {name} from Qdrant: {e}")
+        finally:
+            changes.finish_sync(name, ok)
+
+    # ── Lifecycle ─────────────────────────────────────────────────────
+    def start(self):
+        """Start the resync loop on the running loop (app lifespan)."""
+        if self._task is not None:
+            return
+        try:
+            self.changes
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"⚠️  In-process vector search disabled — {self.root} unavailable: {e}")
+            self.names = ()
+            return
+        self._task = asyncio.create_task(self._run(), name="vector-sync")
+
+    async def close(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except (asyncio.CancelledError, Exception):
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            for name in self.names:
+                try:
+                    await asyncio.to_thread(self._maybe_sync, name)
+                except Exception as e:  # the change log itself failed; try again next round
+                    logger.warning(f"⚠️  Vector sync check for {name} failed: {e}")
+            await asyncio.sleep(SYNC_CHECK_S)
+
+    def stats(self) -> dict:
+        report = {}
+        for name in self.names:
+            state = self._local(name)
+            report[name] = (
+                {"backend": "local", "points": state.count, "pending_changes": state.pending,
+                 "dtype": state.meta.get("dtype"), "synced_at": state.meta.get("published_at")}
+                if state is not None else {"backend": "qdrant"}
+            )
+        return report
+
+
+local_vectors = LocalVectorStore(LOCAL_DIR, LOCAL_COLLECTIONS)
+_active: Optional[LocalVectorStore] = local_vectors if LOCAL_ENABLED else None
+
+
+def get_vector_store():
+    """What to call query_points on: the local store when VECTOR_STORE=local, else the Qdrant client."""
+    return _active if _active is not None else get_qdrant_client()
+
+
+def set_vector_store(store: Optional[LocalVectorStore]):
+    """Route searches through *store* (None: straight to Qdrant), e.g. in benchmarks."""
+    global _active
+    _active = store
+
+
+def tracks(collection: str) -> bool:
+    return _active is not None and collection in _active.names
+
+
+def record_points(collection: str, points: Sequence):
+    if tracks(collection):
+        _active.record_points(collection, points)
+
+
+def record_ids(collection: str, ids: Sequence[str]):
+    if tracks(collection):
+        _active.record_ids(collection, ids)
+
+
+def record_deletes(collection: str, ids: Sequence):
+    if tracks(collection):
+        _active.record_deletes(collection, ids)
+
+
+# ──────────────────────────────────────────────
+# CLI
+# ──────────────────────────────────────────────
+
+def main():
+    import argparse
+
+    from dotenv import load_dotenv
+
+    from utils.log import configure_logging
+
+    parser = argparse.ArgumentParser(description="Rebuild the in-process vector snapshots from Qdrant.")
+    parser.add_argument("command", choices=["sync", "stats"])
+    parser.add_argument("collections", nargs="*", help=f"Default: {', '.join(LOCAL_COLLECTIONS)}")
+    args = parser.parse_args()
+
+    load_dotenv()
+    configure_logging()
+
+    store = LocalVectorStore(LOCAL_DIR, args.collections or LOCAL_COLLECTIONS)
+    if args.command == "sync":
+        for name in store.names:
+            count = store.sync(name)
+            print(f"{name}: {'left on Qdrant' if count is None else f'{count} points'}")
+    print(json.dumps(store.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Startup warm-up + readiness
+───────────────────────────
+Routers import their heavy dependencies lazily, so the app binds its port
+almost immediately.  A background task started from the app lifespan then
+imports those modules and creates the shared clients in worker threads.
+
+`/health` answers as soon as the process is up (liveness); `/ready` only
+returns 200 once every warm-up step has succeeded.  Failed steps (e.g.
+Qdrant down) are retried periodically instead of crashing the app.
+"""
+
+import asyncio
+import importlib
+import logging
+import os
+import time
+from typing import Callable
+
+logger = logging.getLogger("warmup")
+
+
+def _import(*modules: str) -> Callable[[], None]:
+    def step():
+        for name in modules:
+            importlib.import_module(name)
+    return step
+
+
+def _embeddings():
+    from utils.clients import get_embeddings
+    get_embeddings("text-embedding-3-large")
+    get_embeddings("text-embedding-3-small")
+
+
+def _qdrant():
+    from utils.clients import get_qdrant_client
+    get_qdrant_client().get_collections()
+
+
+def _event_filter_indexes():
+    from event.embedding import ensure_filter_indexes
+    from utils.clients import get_qdrant_client
+    ensure_filter_indexes(get_qdrant_client())
+
+
+def _rerank_model():
+    from event.rerank import RERANK_ENABLED, event_reranker
+    if RERANK_ENABLED and event_reranker.available():
+        event_reranker.load()
+    elif RERANK_ENABLED:
+        logger.warning("⚠️  EVENT_RERANK=1 but sentence-transformers is not installed; /event/fetch keeps dense order")
+
+
+def _tokenizer():
+    from agent.prompt_budget import load_encoding
+    try:
+        load_encoding()
+    except Exception as e:  # offline: budgets fall back to ~4 chars/token
+        logger.warning(f"⚠️  tiktoken encoding unavailable, estimating prompt tokens: {e}")
+
+
+def _mem0():
+    from agent.query_resolver import get_memory
+    get_memory()
+
+
+# Ordered: later steps reuse modules imported by earlier ones
+WARMUP_STEPS: list[tuple[str, Callable[[], None]]] = [
+    ("event_modules", _import(
+        "bs4", "langchain_text_splitters", "langchain_qdrant", "langchain_core.documents",
+    )),
+    ("embeddings", _embeddings),
+    ("qdrant", _qdrant),
+    ("event_filter_indexes", _event_filter_indexes),
+    ("rerank_model", _rerank_model),
+    ("agent", _import("agents", "agent.query_resolver")),
+    ("mem0", _mem0),
+    ("tokenizer", _tokenizer),
+]
+
+
+class Readiness:
+    def __init__(self):
+        self.components: dict[str, dict] = {
+            name: {"ready": False, "error": None, "seconds": None} for name, _ in WARMUP_STEPS
+        }
+
+    @property
+    def ready(self) -> bool:
+        return all(c["ready"] for c in self.components.values())
+
+    def mark_all_ready(self):
+        for c in self.components.values():
+            c["ready"] = True
+
+    def report(self) -> dict:
+        return {"status": "ready" if self.ready else "warming", "components": self.components}
+
+
+readiness = Readiness()
+
+
+async def warm_up(retry_seconds: float = 15.0):
+    """Run every pending warm-up step, retrying failures until all succeed."""
+    while True:
+        for name, step in WARMUP_STEPS:
+            state = readiness.components[name]
+            if state["ready"]:
+                continue
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(step)
+            except Exception as e:
+                state["error"] = str(e)
+                logger.warning(f"Warm-up step '{name}' failed: {e}")
+                continue
+            state.update(ready=True, error=None, seconds=round(time.perf_counter() - started, 3))
+            logger.info(f"Warm-up step '{name}' done in {state['seconds']}s")
+
+        if readiness.ready:
+            logger.info("Warm-up complete — service ready")
+            return
+        await asyncio.sleep(retry_seconds)
+
+
+def warmup_enabled() -> bool:
+    return os.getenv("ML_WARMUP", "1") not in ("0", "false", "False")
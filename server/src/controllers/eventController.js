@@ -175,6 +175,8 @@ export const createEvent = asyncHandler(async (req, res) => {
             city: event.location.city || '',
             country: event.location.country || '',
             venue: event.location.venue || '',
+            latitude: event.location.coordinates?.latitude ?? null,
+            longitude: event.location.coordinates?.longitude ?? null,
           } : { city: '', country: '', venue: '' },
           customSlug: event.micrositeConfig?.customSlug || '',
         }),
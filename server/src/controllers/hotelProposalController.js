@@ -666,6 +666,8 @@ export const publishEventMicrosite = asyncHandler(async (req, res) => {
             city: event.location?.city || '',
             country: event.location?.country || '',
             venue: event.location?.venue || '',
+            latitude: event.location?.coordinates?.latitude ?? null,
+            longitude: event.location?.coordinates?.longitude ?? null,
           },
           customSlug: event.micrositeConfig?.customSlug || '',
         }),